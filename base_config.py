@@ -31,4 +31,13 @@ def _feature_set_modify (feature_set, str):
 class BaseConfig:
     def __init__ (self, router, name):
         self.router = router
-        self.name = ' '.join(name.strip().split()) if isinstance(name, str) else name
\ No newline at end of file
+        self.name = ' '.join(name.strip().split()) if isinstance(name, str) else name
+
+    def reconcile (self, router, apply=True):
+        '''
+        Compare the desired configuration of the object with the running config
+        and send only the missing and the 'no' commands. The plan is logged before
+        it is applied. Returns ReconcilePlan (see cisco_reconcile).
+        '''
+        from cisco_reconcile import cisco_reconcile
+        return cisco_reconcile(router, self, apply)
@@ -0,0 +1,139 @@
+# GNU GENERAL PUBLIC LICENSE
+# Autor: Aleksey Burger
+
+# Fixtures of the benchmark suite: the simulated router, the connected
+# RouterCisco and the recorder of the results written to JSON at the end.
+#   python -m pytest benchmarks [--bench-latency 0.001] [--bench-scale 0.1] [--bench-json FILE]
+
+import os
+import sys
+import json
+import time
+import platform
+import subprocess
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cisco_simulator import CiscoSimulator
+from router_cisco import RouterCisco
+
+RESULTS_VERSION = 1
+
+def pytest_addoption(parser):
+    group = parser.getgroup("bench", "RouterCisco benchmarks")
+    group.addoption("--bench-latency", type=float, default=0.0,
+                    help="seconds of the simulated device latency per command")
+    group.addoption("--bench-baud", type=int, default=0,
+                    help="bits/sec of the simulated console line (0 - no limit)")
+    group.addoption("--bench-scale", type=float, default=1.0,
+                    help="scale of the object counts (0.1 - quick run)")
+    group.addoption("--bench-pipeline-depth", type=int, default=1,
+                    help="RouterCisco.pipeline_depth")
+    group.addoption("--bench-json", default="bench_results.json",
+                    help="file of the results")
+
+class BenchRecorder:
+    '''
+    Results of the scenarios. measure() takes the deltas of the RouterCisco
+    counters and of the simulator statistics during the block.
+    '''
+    def __init__(self, config):
+        self.config = config
+        self.results = []
+
+    def scaled(self, count):
+        return max(1, int(count * self.config.getoption("--bench-scale")))
+
+    def measure(self, name, routers, simulator, count):
+        ''' routers - the router or list of routers (it may be extended in the block) '''
+        return _Measure(self, name, routers, simulator, count)
+
+    def record(self, name, count, seconds, **fields):
+        ''' result of the scenario without the router counters '''
+        result = {"name": name, "count": count, "seconds": round(seconds, 4)}
+        result.update(fields)
+        result["ms_per_object"] = round(seconds * 1000 / count, 3)
+        self.results.append(result)
+        return result
+
+    def meta(self):
+        try:
+            revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                      cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+        except OSError:
+            revision = ""
+        return {"version": RESULTS_VERSION, "revision": revision, "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(), "platform": platform.platform(),
+                "latency": self.config.getoption("--bench-latency"), "baud": self.config.getoption("--bench-baud"),
+                "scale": self.config.getoption("--bench-scale"),
+                "pipeline_depth": self.config.getoption("--bench-pipeline-depth")}
+
+    def write(self, filename):
+        with open(filename, "w") as file:
+            json.dump({"meta": self.meta(), "results": self.results}, file, indent=2)
+
+class _Measure:
+    def __init__(self, recorder, name, routers, simulator, count):
+        self.recorder = recorder
+        self.name = name
+        self.routers = routers if isinstance(routers, list) else [routers]
+        self.simulator = simulator
+        self.count = count
+
+    def _counters(self):
+        ret = {}
+        for router in self.routers:
+            for key, value in router.counters().items():
+                ret[key] = ret.get(key, 0) + value
+        return ret
+
+    def __enter__(self):
+        self.counters = self._counters()
+        self.device = dict(self.simulator.stats)
+        self.start = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, *args):
+        seconds = time.monotonic() - self.start
+        if exc_type is not None:
+            return
+        result = {"name": self.name, "count": self.count, "seconds": round(seconds, 4)}
+        for key, value in self._counters().items():
+            result[key] = round(value - self.counters.get(key, 0), 4)
+        result["device_commands"] = self.simulator.stats["commands"] - self.device["commands"]
+        result["ms_per_object"] = round(seconds * 1000 / self.count, 3)
+        self.recorder.results.append(result)
+
+@pytest.fixture(scope="session")
+def bench(request):
+    recorder = BenchRecorder(request.config)
+    yield recorder
+    recorder.write(request.config.getoption("--bench-json"))
+
+@pytest.fixture(scope="module")
+def simulator(request):
+    sim = CiscoSimulator("R1", password="cisco", latency=request.config.getoption("--bench-latency"),
+                         baud=request.config.getoption("--bench-baud"))
+    sim.start()
+    yield sim
+    sim.stop()
+
+def _connect(simulator, config):
+    router = RouterCisco("127.0.0.1", simulator.port, "cisco", simulator.password)
+    router.pipeline_depth = config.getoption("--bench-pipeline-depth")
+    router.start()
+    router.toExec()
+    router.enterWaitResponce("terminal length 0")
+    return router
+
+@pytest.fixture(scope="module")
+def connect(simulator, request):
+    ''' factory of the routers connected to the simulator '''
+    return lambda: _connect(simulator, request.config)
+
+@pytest.fixture(scope="module")
+def router(simulator, request):
+    router = _connect(simulator, request.config)
+    yield router
+    router.end()
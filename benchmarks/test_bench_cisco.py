@@ -0,0 +1,81 @@
+# GNU GENERAL PUBLIC LICENSE
+# Autor: Aleksey Burger
+
+# End-to-end scenarios of RouterCisco and the config classes against the
+# simulated router. The scenarios run in order on one router: the objects
+# created by the first ones are deleted by the teardown.
+
+from cisco_interface import CiscoInterface, cisco_get_all_interfaces
+from cisco_vrf import CiscoVrf, CiscoVrfAFamily, cisco_get_all_vrf
+from cisco_bgp import CiscoBgp, CiscoBgpVrf, CiscoBgpNeighbor, cisco_get_all_bgp
+from show_parser import cisco_show
+from dtu_definition import VRF_AFAMILY_IPV4_UNICAST
+
+LOOPBACKS = 1000
+NEIGHBORS = 500
+VRFS = 1000
+SESSIONS = 20
+
+# objects created by the scenarios and deleted by the teardown
+created = {}
+
+def test_session_start(bench, simulator, connect):
+    count = bench.scaled(SESSIONS)
+    routers = []
+    with bench.measure("session start", routers, simulator, count):
+        for i in range(count):
+            routers.append(connect())
+    for router in routers:
+        assert router.name == "R1"
+        router.end()
+
+def test_loopbacks(bench, simulator, router):
+    count = bench.scaled(LOOPBACKS)
+    loopbacks = []
+    with bench.measure("loopback create", router, simulator, count):
+        for i in range(count):
+            loopback = CiscoInterface(f"Loopback{i}")
+            loopback.modify(ipv4_address_mask=f"10.{i // 250}.{i % 250}.1/32", description=f"loopback {i}")
+            if not loopback.attach(router):
+                loopback.create(router)
+            loopbacks.append(loopback)
+    created["loopbacks"] = loopbacks
+    assert len([name for name in cisco_get_all_interfaces(router) if name.startswith("loopback")]) == count
+
+def test_bgp_neighbors(bench, simulator, router):
+    count = bench.scaled(NEIGHBORS)
+    bgp = CiscoBgp("65000")
+    bgp_vrf = CiscoBgpVrf("default")
+    bgp.add_vrf(bgp_vrf)
+    with bench.measure("bgp neighbors", router, simulator, count):
+        bgp.create(router)
+        for i in range(count):
+            bgp_vrf.add_neighbor(CiscoBgpNeighbor(f"172.16.{i // 250}.{i % 250 + 1}", 65001 + i))
+    created["bgp"] = bgp
+    assert cisco_get_all_bgp(router) == ["65000"]
+    assert len(cisco_show(router, "show ip bgp summary")) == count
+
+def test_vrfs(bench, simulator, router):
+    count = bench.scaled(VRFS)
+    vrfs = []
+    with bench.measure("vrf create", router, simulator, count):
+        for i in range(count):
+            vrf = CiscoVrf(f"VRF{i}", f"65000:{i}")
+            afamily = CiscoVrfAFamily(VRF_AFAMILY_IPV4_UNICAST)
+            afamily.add_import_target(f"65000:{i}")
+            afamily.add_export_target(f"65000:{i}")
+            vrf.add_afamily(afamily)
+            vrf.create(router)
+            vrfs.append(vrf)
+    created["vrfs"] = vrfs
+    assert len(cisco_get_all_vrf(router)) == count
+
+def test_teardown(bench, simulator, router):
+    objects = created.get("loopbacks", []) + created.get("vrfs", []) + [created[key] for key in ("bgp",) if key in created]
+    with bench.measure("teardown", router, simulator, max(1, len(objects))):
+        for obj in objects:
+            obj.delete()
+    router.cache_invalidate()
+    assert not [name for name in cisco_get_all_interfaces(router) if name.startswith("loopback")]
+    assert cisco_get_all_vrf(router) == []
+    assert cisco_get_all_bgp(router) == []
@@ -0,0 +1,107 @@
+# GNU GENERAL PUBLIC LICENSE
+# Autor: Aleksey Burger
+
+# Throughput of the terminal output processing of LinuxCli.readPrompt on
+# multi-MB outputs: TerminalNormalizer + ChunkBuffer against the per chunk
+# decode/regex/+= processing used before, and readPrompt on a stub channel.
+
+import re
+import time
+from terminal_stream import TerminalNormalizer, ChunkBuffer, strip_ansi
+from linux_cli import LinuxCli
+
+OUTPUT_MB = 8
+CHUNK = 10000
+PROMPT = b"root@box# "
+
+def _output(size, unicode=True):
+    ''' colored "ls -l" like output of about size bytes '''
+    name = "файл" if unicode else "file"
+    line = "-rw-r--r-- 1 root root 4096 Oct 18 12:00 \x1b[01;32m{0}{1}.log\x1b[0m \x1b]0;title\x07\x1b[K\r\n"
+    lines = []
+    length = 0
+    i = 0
+    while length < size:
+        text = line.format(name, i).encode("utf-8")
+        lines.append(text)
+        length += len(text)
+        i += 1
+    return b''.join(lines)
+
+def _chunks(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+def _baseline(chunks):
+    ''' readPrompt processing before TerminalNormalizer (ascii data only) '''
+    resp = ""
+    for data in chunks:
+        pattern = re.compile(r'\x1b\[[0-9?;]+[m|K|h]|\x1b\[K|\x1b\][^\x07]*\x07')
+        resp += pattern.sub('', data.decode("ascii"))
+    return resp
+
+def _normalize(chunks):
+    normalizer = TerminalNormalizer()
+    output = ChunkBuffer()
+    for data in chunks:
+        output.append(normalizer.feed(data))
+        output.tail(256)
+    output.append(normalizer.flush())
+    return output.text()
+
+class _StubChannel:
+    ''' paramiko channel stand-in which returns the output in chunks of the requested size '''
+    def __init__(self, data):
+        self.data = memoryview(data)
+        self.pos = 0
+
+    def recv_ready(self):
+        return self.pos < len(self.data)
+
+    def recv(self, size):
+        data = bytes(self.data[self.pos:self.pos + size])
+        self.pos += len(data)
+        return data
+
+    def send(self, data):
+        return len(data)
+
+def test_normalizer_split_chunks():
+    data = _output(200000)
+    expected = strip_ansi(data.decode("utf-8"))
+    for size in (3, 7, 4096, CHUNK):
+        assert _normalize(_chunks(data, size)) == expected
+
+def test_normalizer_throughput(bench):
+    size = max(1, int(OUTPUT_MB * bench.config.getoption("--bench-scale"))) * 1000000
+    data = _output(size, unicode=False)
+    chunks = _chunks(data, CHUNK)
+
+    start = time.monotonic()
+    before = _baseline(chunks)
+    seconds = time.monotonic() - start
+    bench.record("terminal baseline", len(chunks), seconds, bytes=len(data),
+                 mb_per_second=round(len(data) / seconds / 1e6, 2))
+
+    start = time.monotonic()
+    after = _normalize(chunks)
+    seconds = time.monotonic() - start
+    bench.record("terminal normalizer", len(chunks), seconds, bytes=len(data),
+                 mb_per_second=round(len(data) / seconds / 1e6, 2))
+    # the baseline leaves the sequences split between the chunks
+    assert after == strip_ansi(data.decode("ascii"))
+    assert len(before) >= len(after)
+
+def test_read_prompt_throughput(bench):
+    size = max(1, int(OUTPUT_MB * bench.config.getoption("--bench-scale"))) * 1000000
+    data = b"cat big.log\r\n" + _output(size) + PROMPT
+    cli = LinuxCli("127.0.0.1", "root", "x")
+    cli.metrics = None
+    cli.channel = _StubChannel(data)
+
+    start = time.monotonic()
+    resp = cli.readPrompt(prefix="cat big.log", clean=True)
+    seconds = time.monotonic() - start
+    bench.record("readPrompt", len(data) // cli.input_size + 1, seconds, bytes=len(data),
+                 mb_per_second=round(len(data) / seconds / 1e6, 2))
+    assert cli.mode == "exec" and cli.name == "box"
+    assert resp == strip_ansi(data.decode("utf-8"))[len("cat big.log\r\n"):]
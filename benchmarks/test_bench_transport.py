@@ -0,0 +1,93 @@
+# GNU GENERAL PUBLIC LICENSE
+# Autor: Aleksey Burger
+
+# Throughput of TelnetTransport against telnetlib.Telnet (when available) on a
+# local server which answers every command line with 'size' bytes of output and
+# the prompt, and of TelnetTransport.expect of the prompt on the multi-MB output
+# coming in small chunks (linear: the searched data is not rescanned).
+
+import time
+import socket
+import threading
+import warnings
+import pytest
+from telnet_transport import TelnetTransport
+from router_cisco import PATTERN_ANY_PROMPT
+
+OUTPUT_SIZE = 100000
+EXPECT_SIZE = 4000000
+COMMANDS = 20
+PROMPT = b"R1#"
+
+def _serve(sock, size, chunk):
+    line = b"GigabitEthernet1       10.0.0.1        YES NVRAM  up                    up      \r\n"
+    block = line * (size // len(line) + 1)
+    # some doubled IAC (data byte 255) to go through the IAC path
+    block = block[:size // 2] + bytes([255, 255]) + block[size // 2:]
+    conn, _ = sock.accept()
+    conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    with conn:
+        conn.sendall(bytes([255, 251, 1, 255, 251, 3]) + PROMPT)
+        buffer = b''
+        while True:
+            data = conn.recv(4096)
+            if not data:
+                return
+            buffer += data
+            while b'\n' in buffer:
+                line, buffer = buffer.split(b'\n', 1)
+                # option replies of the client
+                while line.startswith(b'\xff'):
+                    line = line[3:]
+                output = line + b'\r\n' + block + PROMPT
+                for pos in range(0, len(output), chunk):
+                    conn.sendall(output[pos:pos + chunk])
+
+def _server(size, chunk):
+    ''' port of the local server; the output is sent by chunks of the size '''
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(1)
+    thread = threading.Thread(target=_serve, args=(sock, size, chunk), daemon=True)
+    thread.start()
+    return sock.getsockname()[1]
+
+def _factories():
+    factories = [("TelnetTransport", TelnetTransport)]
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            import telnetlib
+        factories.append(("telnetlib", telnetlib.Telnet))
+    except ImportError:
+        pass
+    return factories
+
+def _run(factory, size, count, chunk, read):
+    tn = factory("127.0.0.1", _server(size, chunk))
+    tn.read_until(PROMPT)
+    total = 0
+    start = time.monotonic()
+    for i in range(count):
+        tn.write(b"show ip interface brief\n")
+        data = read(tn)
+        assert data.endswith(b"\r\n" + PROMPT)
+        total += len(data)
+    seconds = time.monotonic() - start
+    tn.close()
+    return total, seconds
+
+@pytest.mark.parametrize("name, factory", _factories())
+def test_read_until_throughput(bench, name, factory):
+    size = max(1000, int(OUTPUT_SIZE * bench.config.getoption("--bench-scale")))
+    total, seconds = _run(factory, size, COMMANDS, 65536, lambda tn: tn.read_until(PROMPT))
+    bench.record(f"{name} read_until", COMMANDS, seconds, bytes=total,
+                 mb_per_second=round(total / seconds / 1e6, 2))
+
+def test_expect_throughput(bench):
+    ''' the prompt pattern on the output coming in chunks of 1 KB '''
+    size = max(1000, int(EXPECT_SIZE * bench.config.getoption("--bench-scale")))
+    count = 5
+    total, seconds = _run(TelnetTransport, size, count, 1024, lambda tn: tn.expect([PATTERN_ANY_PROMPT], 60)[2])
+    bench.record("TelnetTransport expect", count, seconds, bytes=total,
+                 mb_per_second=round(total / seconds / 1e6, 2))
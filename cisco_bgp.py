@@ -7,6 +7,8 @@ from dtu_definition import BGP_AFAMILY_IPV4_UNICAST,BGP_AFAMILY_IPV6_UNICAST,BGP
 from cisco_interface import  CiscoInterface
 from cisco_vrf import  CiscoVrf
 from exception_dev import ExceptionDevice
+from show_parser import cisco_show
+from running_config import cisco_running_config
 import logging
 
 logger = logging.getLogger("dtulibLog")
@@ -325,7 +327,7 @@ class CiscoBgpVrf(BaseConfig):
         for af in self.af_list:
             af.__detach__()
         for neighbor in self.neighbor_list:
-            neighbor.__detach__()
+            neighbor.__detach__(self)
 
         self.upref = None
         self.router = None           
@@ -389,10 +391,11 @@ class CiscoBgp(BaseConfig):
         self.router = router
 
         self.router.toConfig()
-        self.router.enterWaitResponce(f"router bgp {self.name}", '(config-router)#')
+        with self.router.config_batch():
+            self.router.enterWaitResponce(f"router bgp {self.name}", '(config-router)#')
 
-        for vrf in self.vrf_list:
-            vrf.__apply__(self)
+            for vrf in self.vrf_list:
+                vrf.__apply__(self)
 
         self.router.toConfig()
 
@@ -414,18 +417,17 @@ class CiscoBgp(BaseConfig):
         info(f"router bgp {self.name} deleted")
 
 def cisco_get_all_bgp (router):
+    if getattr(router, "use_running_config", False):
+        return cisco_running_config(router).names("router bgp")
     bgp_list = []
-    router.toExec()
     try:
-        router.enterWaitResponce('show ip bgp summary')
+        table = cisco_show(router, 'show ip bgp summary')
     except ExceptionDevice:
         # bgp is not active
         return bgp_list
-    
 
-    match = re.findall(r'local AS number\s+(\d+)', router.resp, re.MULTILINE)
-    if match and len(match):
-        if int(match[0]):
-            bgp_list.append(match[0])
+    local_as = table.header.get('LocalAS')
+    if local_as:
+        bgp_list.append(str(local_as))
 
-    return bgp_list
\ No newline at end of file
+    return bgp_list
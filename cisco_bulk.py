@@ -0,0 +1,132 @@
+# GNU GENERAL PUBLIC LICENSE
+# Autor: Aleksey Burger
+
+import re
+import time
+import logging
+from exception_dev import ExceptionDevice
+
+logger = logging.getLogger("dtulibLog")
+def trace(format):
+    logger.debug(f'\n\x1b[1;94mCiscoBulk: {format}\x1b[0m')
+
+def error(format):
+    logger.error(f'\n\x1b[1;31mCiscoBulk: {format}\x1b[0m')
+
+def info(format):
+    logger.info(f'\n\x1b[1;92mCiscoBulk: {format}\x1b[0m')
+
+PATTERN_COPY_RATE = re.compile(r'(\d+) bytes copied in ([\d\.]+) secs \((\d+) bytes/sec\)')
+
+# bind addresses which the router can not pull the file from
+WILDCARD_HOSTS = ("", "0.0.0.0", "::")
+
+def cisco_render_commands(commands):
+    '''
+    Render captured (command, expect) list to configuration text
+    which is accepted by 'copy tftp: running-config'
+    '''
+    lines = [command for command, expect in commands]
+    return '\n'.join(lines + ['end']) + '\n'
+
+class BulkResult:
+    '''
+    Result of cisco_bulk_deploy: staged file, transfer rate and copy errors.
+    interactive_rate is bytes/sec of enterWaitResponce() calls on the same
+    router before the deployment (None if nothing was sent interactively).
+    '''
+    def __init__(self, router_name, filename, size, seconds, commands):
+        self.router_name = router_name
+        self.filename = filename
+        self.size = size
+        self.seconds = seconds
+        self.commands = commands
+        self.device_rate = None
+        self.interactive_rate = None
+        self.errors = []
+        self.output = None
+
+    @property
+    def bytes_per_sec(self):
+        if not self.seconds:
+            return None
+        return self.size / self.seconds
+
+    def __repr__(self):
+        ret = f"{self.router_name} {self.filename}: {self.commands} commands {self.size} bytes in {self.seconds:.2f}s"
+        if self.bytes_per_sec:
+            ret = ret + f" ({self.bytes_per_sec:.0f} bytes/sec"
+            if self.interactive_rate:
+                ret = ret + f", interactive {self.interactive_rate:.0f} bytes/sec"
+            ret = ret + ")"
+        if self.errors:
+            ret = ret + f" errors: {len(self.errors)}"
+        return ret
+
+def cisco_bulk_deploy(router, objects, server, host=None, filename=None):
+    '''
+    Apply config objects by one 'copy tftp: running-config' instead of typing
+    the commands. The commands of the objects are captured (objects' .create(router)
+    or callable(router) are called under router.config_capture()), rendered to file,
+    served by TftpServer 'server' and pulled by the router from 'host' address
+    (the server address if it is not given; a wildcard bind address raises Exception).
+    objects may also be the config text rendered offline (see router_recorder).
+    Returns BulkResult. ExceptionDevice is raised if the copy reports errors
+    and router.ignore_exception_syntax is not set.
+    '''
+    if not host:
+        host = server.host
+    if host in WILDCARD_HOSTS:
+        raise Exception(f"cisco_bulk_deploy: {router.name}: the tftp server is bound to '{host}',"
+                        " give the address the router reaches it by as 'host'")
+    if not filename:
+        filename = f"dtu-{router.name}.cfg"
+
+    interactive_rate = router.bytes_out / router.io_time if router.io_time else None
+
+    if isinstance(objects, str):
+        # config rendered offline (router_recorder.render_objects)
+        text = objects if objects.endswith('\n') else objects + '\n'
+        commands = [line for line in text.splitlines() if line.strip() and line.strip() != 'end']
+    else:
+        if not isinstance(objects, (list, tuple)):
+            objects = [objects]
+        with router.config_capture() as commands:
+            for obj in objects:
+                if callable(obj):
+                    obj(router)
+                else:
+                    obj.create(router)
+        text = cisco_render_commands(commands)
+    server.add_file(filename, text)
+    trace(f"{router.name} staged {filename}: {len(commands)} commands {len(text)} bytes")
+
+    router.toExec()
+    ignore_exception_syntax = router.ignore_exception_syntax
+    router.ignore_exception_syntax = True
+    start = time.monotonic()
+    try:
+        router.enterWaitResponce(f"copy tftp://{host}/{filename} running-config", "]?")
+        output = router.resp
+        router.enterWaitResponce("", f"{router.name}#")
+        output += router.resp
+    finally:
+        router.ignore_exception_syntax = ignore_exception_syntax
+        server.remove_file(filename)
+        router.cache_invalidate()
+
+    result = BulkResult(router.name, filename, len(text), time.monotonic() - start, len(commands))
+    result.interactive_rate = interactive_rate
+    result.output = output
+    match = PATTERN_COPY_RATE.search(output)
+    if match:
+        result.device_rate = int(match.group(3))
+    result.errors = [line.strip() for line in output.splitlines() if line.lstrip().startswith('%')]
+
+    if result.errors:
+        error(f"{result}")
+        if not router.ignore_exception_syntax:
+            raise ExceptionDevice("copy tftp error", output)
+    else:
+        info(f"{result}")
+    return result
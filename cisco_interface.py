@@ -8,6 +8,8 @@ from base_config import BaseConfig
 from exception_dev import ExceptionDevice
 import utils_ipv4
 from cisco_vrf import CiscoVrf
+from show_parser import cisco_show, get_template
+from running_config import cisco_running_config
 
 logger = logging.getLogger("dtulibLog")
 def trace(format):
@@ -25,6 +27,8 @@ def get_vrf_name (vrf_or_name):
     return vrf_or_name
 
 PROMPT_CFG = '(config-if)#'
+# show cache key of the interface names
+CACHE_INTERFACE_NAMES = "interface names"
 NON_PHYSICAL_IFACES = ["loopback", "bdi"]
 class CiscoInterface(BaseConfig):
     '''
@@ -168,9 +172,10 @@ class CiscoInterface(BaseConfig):
             error(f" Unexpected cfg feature {feature}")
 
     def __apply_features__ (self):
-        for feature in self.attr_list:
-            if hasattr(self, feature):
-                self.__apply_feature__(feature, getattr(self, feature))
+        with self.router.config_batch():
+            for feature in self.attr_list:
+                if hasattr(self, feature):
+                    self.__apply_feature__(feature, getattr(self, feature))
 
     def attach (self, router):
         '''
@@ -179,8 +184,10 @@ class CiscoInterface(BaseConfig):
         to change the interface configuration using the .modify method or delete/clear 
         the interface using the .delete method.
         '''
-        int_list = cisco_get_all_interfaces(router)
-        if self.name not in int_list:
+        if getattr(router, "use_running_config", False):
+            if not cisco_running_config(router).find("interface", self.name):
+                return False
+        elif self.name not in cisco_get_all_interfaces(router):
             return False
         self.router = router
         info(f" {self} attached")
@@ -204,6 +211,11 @@ class CiscoInterface(BaseConfig):
         # recreate interface and applay configured features
         self.router.enterWaitResponce(f"interface {self.name}",PROMPT_CFG)
         self.__apply_features__()
+        # the interface exists now: keep the cached names valid for the next attach/create
+        if hasattr(router, "cache_put"):
+            if self.name not in int_list:
+                int_list.append(self.name)
+            router.cache_put(CACHE_INTERFACE_NAMES, int_list, ("interface",))
         info(f" {self} created")
         return True
 
@@ -275,52 +287,25 @@ def cisco_get_all_interfaces (router):
     '''
     Returns the list of existing interfaces (from 'show ip interface brief')
     '''
-    router.enterExecCommand('show ip interface brief')
-    int_list = []
-
-    #remove show header
-    delimiter_pos = re.search(r'Interface\s+IP-Address.+(Protocol\r\n)', router.resp, re.MULTILINE)
-    if not delimiter_pos:
-        return int_list
-    body = router.resp[delimiter_pos.span()[1]:]
-    # remove prompt after the table
-    table_end_pos = re.search(f'^{router.name}#', body, re.MULTILINE)
-    if table_end_pos:
-        body = body[:table_end_pos.span()[0]]
-
-    for line in body.split('\r\n'):
-        match = re.findall(r'(\w+)', line)
-        if match and len(match):
-            int_list.append(match[0].lower())
-    return int_list
-
-
-def cisco_get_all_interfaces_params (router):
+    if getattr(router, "use_running_config", False):
+        return cisco_running_config(router).names("interface")
+    names = router.cache_get(CACHE_INTERFACE_NAMES) if hasattr(router, "cache_get") else None
+    if names is None:
+        names = cisco_show(router, 'show ip interface brief').column('Interface')
+        if hasattr(router, "cache_put"):
+            router.cache_put(CACHE_INTERFACE_NAMES, names, ("interface",))
+    return list(names)
+
+
+def cisco_get_all_interfaces_params (router, lines=None):
     """
     Requests and parses the output of 'show ip interface brief' from a RouterCisco object.
     :param router: RouterCisco instance
+    :param lines: optional iterable of output lines (e.g. router.iterExecCommand());
+        the output is streamed from the router if it is not given
     :return: List of dicts with keys: Interface, IP-Address, Status
     """
-    router.enterExecCommand("show ip interface brief")
-    lines = router.resp.splitlines()
-    if not lines:
-        return []
-    result = []
-    parsing = False
-    for line in lines:
-        if not parsing:
-            if line.strip().startswith('Interface'):
-                parsing = True
-            continue
-        # Now parsing data lines, skip the header itself
-        if '#' in line:
-            break
-        fields = re.split(r'\s{1,}', line.strip())
-        if len(fields) == 6:
-            iface = {
-                'Interface': fields[0].lower(),
-                'IP': fields[1],
-                'Status': fields[4],
-            }
-            result.append(iface)
-    return result
\ No newline at end of file
+    if lines is None:
+        lines = router.iterExecCommand("show ip interface brief")
+    table = get_template("show ip interface brief").parse(lines)
+    return [{'Interface': record['Interface'], 'IP': record['IP'], 'Status': record['Status']} for record in table]
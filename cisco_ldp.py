@@ -6,6 +6,7 @@ from base_config import BaseConfig
 from router_cisco import RouterCisco
 from cisco_interface import  CiscoInterface
 from exception_dev import ExceptionDevice
+from show_parser import cisco_show
 
 logger = logging.getLogger('dtulibLog')
 
@@ -96,4 +97,12 @@ class CiscoLdp(BaseConfig):
 
     def add_interface (self, *ldp_interface):
         for intf in ldp_interface:
-            self.intf_list.append(intf)
\ No newline at end of file
+            self.intf_list.append(intf)
+
+
+def cisco_get_mpls_forwarding (router):
+    '''
+    Returns records of 'show mpls forwarding-table': LocalLabel, OutLabel, Prefix,
+    BytesSwitched, OutInterface, NextHop
+    '''
+    return list(cisco_show(router, 'show mpls forwarding-table'))
@@ -7,6 +7,7 @@ from router_cisco import RouterCisco
 from cisco_interface import  CiscoInterface
 from dtu_definition import OSPF_INTF_NTYPE_P2P,OSPF_INTF_NTYPE_P2M, OSPF_INTF_NTYPE_BCAST, OSPF_INTF_NTYPE_NBCAST, OSPF_INTF_NTYPE_P2M_NBCAST
 from exception_dev import ExceptionDevice
+from show_parser import cisco_show
 
 logger = logging.getLogger("dtulibLog")
 
@@ -193,4 +194,10 @@ class CiscoOspf(BaseConfig):
         self.router.toConfig()
         self.router = None
 
-        
\ No newline at end of file
+
+def cisco_get_ospf_neighbors (router):
+    '''
+    Returns records of 'show ip ospf neighbor': NeighborId, Priority, State,
+    DeadTime, Address, Interface
+    '''
+    return list(cisco_show(router, 'show ip ospf neighbor'))
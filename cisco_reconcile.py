@@ -0,0 +1,299 @@
+# GNU GENERAL PUBLIC LICENSE
+# Autor: Aleksey Burger
+
+import copy
+import time
+import logging
+from router_recorder import record_objects
+from running_config import cisco_running_config
+
+logger = logging.getLogger("dtulibLog")
+def trace(format):
+    logger.debug(f'\n\x1b[1;94mReconcile: {format}\x1b[0m')
+
+def error(format):
+    logger.error(f'\n\x1b[1;31mReconcile: {format}\x1b[0m')
+
+def info(format):
+    logger.info(f'\n\x1b[1;92mReconcile: {format}\x1b[0m')
+
+# the lines written by the config classes in the sections of each type; the other running
+# lines (defaults such as negotiation auto, bgp router-id, ip proxy-arp) are not removed
+MANAGED_LINES = {
+    "interface": ("ip address", "ipv6 address", "ipv6 enable", "ip vrf forwarding", "vrf forwarding",
+                  "description", "mpls ip", "vlan-id dot1q", "ip ospf"),
+    "ip vrf": ("rd", "route-target"),
+    "router bgp": ("neighbor",),
+    "router ospf": ("passive-interface",),
+    "address-family": ("neighbor", "redistribute", "network"),
+}
+# lines of the neighbor are managed only if the objects define this neighbor
+KEYED_LINES = ("neighbor",)
+# changing these lines resets other lines of the section (e.g. ip address), so the section is re-sent
+RESET_LINES = ("ip vrf forwarding", "vrf forwarding")
+# single value lines: the desired line replaces the running one without 'no'
+REPLACED_LINES = ("description", "ip address", "rd")
+# the form shown by the running config
+ALIASES = {
+    "address-family ipv4 unicast": "address-family ipv4",
+    "address-family ipv6 unicast": "address-family ipv6",
+}
+
+def _key(line):
+    line = ' '.join(line.split()).lower()
+    return ALIASES.get(line, line)
+
+def _matches(line, prefix):
+    return line == prefix or line.startswith(prefix + ' ')
+
+class _DesiredSection:
+    '''
+    Desired state of the config section built from the recorded commands:
+    the lines and the subsections in order and the absent ('no ...') prefixes
+    '''
+    def __init__(self, header, prompt):
+        self.header = header
+        self.prompt = prompt
+        self.items = []
+        self.absent = []
+
+    def __repr__(self):
+        return f"_DesiredSection '{self.header}' {len(self.items)} items"
+
+    def section(self, header, prompt=None):
+        key = _key(header)
+        for item in self.items:
+            if isinstance(item, _DesiredSection) and _key(item.header) == key:
+                if prompt:
+                    item.prompt = prompt
+                return item
+        item = _DesiredSection(header, prompt)
+        self.items.append(item)
+        self._present(key)
+        return item
+
+    def _present(self, key):
+        self.absent = [prefix for prefix in self.absent if not _matches(key, _key(prefix))]
+
+    def _remove(self, target):
+        key = _key(target)
+        self.items = [item for item in self.items
+                      if not _matches(_key(item.header if isinstance(item, _DesiredSection) else item), key)]
+        if target not in self.absent:
+            self.absent.append(target)
+
+    def apply(self, command):
+        words = command.split()
+        if words[0] == "no":
+            self._remove(' '.join(words[1:]))
+        elif words[0] == "default":
+            target = ' '.join(words[1:])
+            if any(isinstance(item, _DesiredSection) and _key(item.header) == _key(target) for item in self.items):
+                self.section(target).items = []
+            else:
+                self._remove(target)
+        else:
+            key = _key(command)
+            self._present(key)
+            if not any(not isinstance(item, _DesiredSection) and _key(item) == key for item in self.items):
+                self.items.append(' '.join(words))
+
+def _prompt_suffix(prompt):
+    pos = prompt.find('(')
+    return prompt[pos:] if pos >= 0 else '#'
+
+def build_desired(records):
+    ''' desired section tree from the config commands recorded by RouterRecorder '''
+    root = _DesiredSection(None, "(config)#")
+    for record in records:
+        words = record.command.split()
+        if not record.config or not words or words[0] in ("exit", "end", "exit-address-family", "do"):
+            continue
+        if record.section and record.section[-1] == ' '.join(words) and record.section[:-1] == record.path[:len(record.section) - 1]:
+            # the command opens the section
+            parent = root
+            for header in record.section[:-1]:
+                parent = parent.section(header)
+            parent.section(record.section[-1], _prompt_suffix(record.prompt))
+            continue
+        section = root
+        for header in record.path:
+            section = section.section(header)
+        section.apply(record.command)
+    return root
+
+class ReconcilePlan:
+    '''
+    Commands which bring the running config to the desired state of the objects.
+        commands - (command, expect) pairs sent in config mode
+        sections - headers of the changed top level sections
+        applied  - True if the commands are sent to the router
+    '''
+    def __init__(self, router_name):
+        self.router_name = router_name
+        self.commands = []
+        self.sections = []
+        self.applied = False
+        self.seconds = 0.0
+
+    def __len__(self):
+        return len(self.commands)
+
+    def __repr__(self):
+        ret = f"{self.router_name} reconcile: {len(self.commands)} commands in {len(self.sections)} sections"
+        if self.applied:
+            ret = ret + f" applied in {self.seconds:.2f}s"
+        return ret
+
+    def text(self):
+        return '\n'.join([command for command, expect in self.commands])
+
+def _exit_command(section, parent_prompt):
+    if section.header.startswith("address-family"):
+        return ("exit-address-family", parent_prompt)
+    return ("exit", parent_prompt)
+
+def _render(section, parent_prompt):
+    ''' all commands of the section which does not exist '''
+    commands = [(section.header, section.prompt)]
+    for item in section.items:
+        if isinstance(item, _DesiredSection):
+            commands += _render(item, section.prompt)
+        else:
+            commands.append((item, section.prompt))
+    commands.append(_exit_command(section, parent_prompt))
+    return commands
+
+def _managed(header, key, desired_keys):
+    ''' True if the running line of the section is written by the config classes '''
+    for section_type, prefixes in MANAGED_LINES.items():
+        if _matches(_key(header), section_type):
+            break
+    else:
+        return False
+    for prefix in prefixes:
+        if _matches(key, prefix):
+            if prefix in KEYED_LINES:
+                keyed = ' '.join(key.split()[:2])
+                return any(_matches(desired, keyed) for desired in desired_keys)
+            return True
+    return False
+
+def _diff(section, running):
+    '''
+    Commands inside of the existing section which bring it to the desired state.
+    The running lines which match the absent ('no ...') prefixes of the objects are
+    removed, and so are the managed lines (see MANAGED_LINES) which are not desired
+    '''
+    running_items = {_key(child.line): child for child in running.children}
+    desired_keys = set([_key(item.header if isinstance(item, _DesiredSection) else item) for item in section.items])
+    replaced = [prefix for prefix in REPLACED_LINES if any(_matches(key, prefix) for key in desired_keys)]
+    reset = False
+
+    removes = []
+    for prefix in section.absent:
+        if any(_matches(key, _key(prefix)) for key in running_items):
+            removes.append((f"no {prefix}", section.prompt))
+            reset = reset or any(_key(prefix).startswith(line) for line in RESET_LINES)
+    for key, child in running_items.items():
+        if key in desired_keys or child.children or any(_matches(key, _key(prefix)) for prefix in section.absent):
+            continue
+        if any(_matches(key, prefix) for prefix in replaced) or not _managed(section.header, key, desired_keys):
+            continue
+        removes.append((f"no {child.line}", section.prompt))
+        reset = reset or any(key.startswith(prefix) for prefix in RESET_LINES)
+
+    adds = []
+    for item in section.items:
+        if not isinstance(item, _DesiredSection) and _key(item) not in running_items:
+            adds.append((item, section.prompt))
+            reset = reset or any(_key(item).startswith(prefix) for prefix in RESET_LINES)
+    if reset:
+        # re-send all lines of the section in order
+        adds = [(item, section.prompt) for item in section.items if not isinstance(item, _DesiredSection)]
+
+    return removes + adds + _diff_subsections(section, running_items)
+
+def _section_commands(section, running_items, parent_prompt):
+    ''' commands of the subsection: all of them if it does not exist, the difference otherwise '''
+    child = running_items.get(_key(section.header))
+    if child is None:
+        return _render(section, parent_prompt)
+    commands = _diff(section, child)
+    if commands:
+        commands = [(section.header, section.prompt)] + commands + [_exit_command(section, parent_prompt)]
+    return commands
+
+def _diff_subsections(section, running_items):
+    commands = []
+    for item in section.items:
+        if isinstance(item, _DesiredSection):
+            commands += _section_commands(item, running_items, section.prompt)
+    return commands
+
+def cisco_reconcile_plan(router, objects):
+    '''
+    Returns ReconcilePlan: the desired state is recorded from .create() of the
+    copies of the objects (see router_recorder) and compared with the running
+    config snapshot. Only the top level sections of the objects are compared;
+    inside them the 'no ...' lines of the objects and the managed lines which
+    are not desired are removed.
+    '''
+    if not isinstance(objects, (list, tuple)):
+        objects = [objects]
+    memo = {id(router): router}
+    for obj in objects:
+        if getattr(obj, "router", None) is not None:
+            memo[id(obj.router)] = obj.router
+    recorder = record_objects(copy.deepcopy(list(objects), memo), router.name)
+    desired = build_desired(recorder.config_records())
+
+    root = cisco_running_config(router).tree()
+    running_items = {_key(child.line): child for child in root.children}
+    plan = ReconcilePlan(router.name)
+    for item in desired.items:
+        if isinstance(item, _DesiredSection):
+            commands = _section_commands(item, running_items, desired.prompt)
+            if commands:
+                plan.sections.append(item.header)
+                plan.commands += commands
+        elif _key(item) not in running_items:
+            plan.sections.append(item)
+            plan.commands.append((item, desired.prompt))
+    for prefix in desired.absent:
+        key = _key(prefix)
+        if any(_matches(line, key) for line in running_items):
+            plan.sections.append(prefix)
+            plan.commands.append((f"no {prefix}", desired.prompt))
+    return plan
+
+def cisco_reconcile(router, objects, apply=True):
+    '''
+    Send only the difference between the desired objects and the running config.
+    The plan is logged before it is applied. The objects are attached to the router
+    (their .create() runs under router.config_capture(), nothing is sent twice).
+    Returns ReconcilePlan.
+    '''
+    if not isinstance(objects, (list, tuple)):
+        objects = [objects]
+    plan = cisco_reconcile_plan(router, objects)
+    info(f"{plan}")
+    if plan.commands:
+        info(f"{router.name} plan:\n{plan.text()}")
+    if not apply:
+        return plan
+
+    start = time.monotonic()
+    if plan.commands:
+        router.toConfig()
+        with router.config_batch():
+            for command, expect in plan.commands:
+                router.enterWaitResponce(command, expect)
+        router.toConfig()
+    with router.config_capture():
+        for obj in objects:
+            obj.create(router)
+    plan.applied = True
+    plan.seconds = time.monotonic() - start
+    info(f"{plan}")
+    return plan
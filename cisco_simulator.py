@@ -0,0 +1,806 @@
+# GNU GENERAL PUBLIC LICENSE
+# Autor: Aleksey Burger
+
+# Local Cisco IOS CLI simulator speaking telnet, for tests and benchmarks
+# without a device:
+#   python cisco_simulator.py [count] [base_port] [latency] [baud]
+
+import re
+import sys
+import time
+import socket
+import threading
+import logging
+from telnet_transport import TelnetFilter, RECV_SIZE
+from router_recorder import SUBMODES
+from running_config import ConfigSection, split_header
+from tftp_server import tftp_get, TFTP_PORT
+
+logger = logging.getLogger("dtulibLog")
+def trace(format):
+    logger.debug(f'\n\x1b[1;94mSimulator: {format}\x1b[0m')
+
+def error(format):
+    logger.error(f'\n\x1b[1;31mSimulator: {format}\x1b[0m')
+
+def info(format):
+    logger.info(f'\n\x1b[1;92mSimulator: {format}\x1b[0m')
+
+USER_MODE = "user"
+EXEC_MODE = "exec"
+CONFIG_MODE = "config"
+
+SIM_INTERFACES = ("GigabitEthernet1", "GigabitEthernet2", "GigabitEthernet3")
+# full names of the interface types (abbreviations are expanded to them) and the short names of 'show vrf'
+INTERFACE_TYPES = ("GigabitEthernet", "TenGigabitEthernet", "Loopback", "Tunnel", "Port-channel", "BDI", "Vlan")
+SHORT_TYPES = {"GigabitEthernet": "Gi", "TenGigabitEthernet": "Te", "Loopback": "Lo", "Tunnel": "Tu",
+               "Port-channel": "Po", "BDI": "BD", "Vlan": "Vl"}
+
+# first words of the commands accepted in the config submodes ('no'/'default' are not counted)
+VOCABULARY = {
+    "config": ("hostname", "interface", "ip", "ipv6", "router", "vrf", "mpls", "service", "logging",
+               "line", "banner", "username", "enable", "snmp-server", "ntp", "route-map", "access-list",
+               "boot", "clock", "aaa", "license", "control-plane", "crypto", "spanning-tree", "cdp",
+               "lldp", "archive", "bfd", "redundancy", "vlan", "key", "class-map", "policy-map",
+               "segment-routing", "l2vpn", "ethernet"),
+    "config-if": ("description", "ip", "ipv6", "shutdown", "mpls", "encapsulation", "vlan-id", "bandwidth",
+                  "mtu", "speed", "duplex", "negotiation", "load-interval", "service-policy", "bfd", "cdp",
+                  "channel-group", "vrf", "keepalive", "media-type", "carrier-delay", "xconnect", "service"),
+    "config-vrf": ("rd", "route-target", "description", "address-family", "import", "export", "vpn"),
+    "config-router": ("neighbor", "network", "bgp", "address-family", "redistribute", "router-id",
+                      "passive-interface", "area", "default-information", "maximum-paths", "timers",
+                      "auto-summary", "synchronization", "log-adjacency-changes", "distance", "mpls", "vrf"),
+    "config-router-af": ("neighbor", "network", "redistribute", "maximum-paths", "aggregate-address",
+                         "default-information", "bgp", "distance", "advertise", "import"),
+    "config-vrf-af": ("route-target", "import", "export", "maximum"),
+}
+VOCABULARY["config-subif"] = VOCABULARY["config-if"]
+# commands which need an argument
+INCOMPLETE = ("interface", "router", "ip", "ipv6", "vrf", "neighbor", "description", "rd", "network",
+              "address-family", "hostname", "route-target", "show", "copy", "ping", "terminal")
+# lines with a single value in the section: the new one replaces the old one in place
+SINGLE_VALUE = ("description", "ip address", "rd", "ip vrf forwarding", "vrf forwarding", "hostname",
+                "encapsulation", "vlan-id", "bandwidth", "mtu", "bgp router-id", "router-id",
+                "ip ospf cost", "ip ospf network")
+NEIGHBOR_SINGLE_VALUE = ("remote-as", "update-source", "description", "password")
+
+MSG_INVALID = "% Invalid input detected at '^' marker."
+MSG_INCOMPLETE = "% Incomplete command."
+MSG_CONFIG = "Enter configuration commands, one per line.  End with CNTL/Z."
+MORE = " --More-- "
+MORE_ERASE = "\b" * len(MORE) + " " * len(MORE) + "\b" * len(MORE)
+
+PATTERN_EOL = re.compile(rb'[\r\n\x1a\x03]')
+PATTERN_INTERFACE = re.compile(r'^([A-Za-z][A-Za-z\-]*)\s*(\d[\d/.:]*)$')
+PATTERN_TFTP = re.compile(r'^tftp://([^/]+)/(.+)$')
+
+def canonical_interface(name):
+    ''' full interface name as IOS shows it (lo100 -> Loopback100) or None '''
+    match = PATTERN_INTERFACE.match(name.strip())
+    if not match:
+        return None
+    prefix = match.group(1).lower()
+    for itype in INTERFACE_TYPES:
+        if itype.lower().startswith(prefix):
+            return itype + match.group(2)
+    return None
+
+def short_interface(name):
+    match = PATTERN_INTERFACE.match(name)
+    if match and match.group(1) in SHORT_TYPES:
+        return SHORT_TYPES[match.group(1)] + match.group(2)
+    return name
+
+def _matches(line, prefix):
+    return line == prefix or line.startswith(prefix + ' ')
+
+def _line_key(line):
+    ''' lines with the same key replace each other in the section '''
+    words = line.split()
+    if words[0] == "neighbor" and len(words) > 2 and words[2] in NEIGHBOR_SINGLE_VALUE:
+        return ' '.join(words[:3])
+    if words[-1] != "secondary":
+        for prefix in SINGLE_VALUE:
+            if _matches(line, prefix):
+                return prefix
+    return line
+
+def _keywords(words, keywords):
+    ''' True if the words are the keywords or their abbreviations (IOS style) '''
+    if len(words) < len(keywords):
+        return False
+    return all(keyword.startswith(word.lower()) for word, keyword in zip(words, keywords))
+
+class SimConfig:
+    '''
+    Configuration of the simulated router: ConfigSection tree changed by
+    the config commands. The show outputs are derived from it. The lines are
+    kept in the order of configuration (IOS sorts some of them).
+    '''
+
+    def __init__(self, hostname="Router", interfaces=SIM_INTERFACES):
+        self.hostname = hostname
+        self.root = ConfigSection("")
+        self.physical = set()
+        for name in interfaces:
+            self.section((f"interface {name}",))
+            self.physical.add(name)
+
+    def __repr__(self):
+        return f"SimConfig {self.hostname} {len(self.root.children)} lines"
+
+    def _child(self, parent, line):
+        if parent.parent is None:
+            stype, name = split_header(line)
+            if stype:
+                return parent.find(stype, name)
+        for child in parent.children:
+            if child.line == line:
+                return child
+        return None
+
+    def section(self, path):
+        ''' ConfigSection of the path of headers; the missing sections are created '''
+        section = self.root
+        for depth, header in enumerate(path):
+            child = self._child(section, header)
+            if child is None:
+                child = ConfigSection(header, section, depth)
+                section.add(child)
+            section = child
+        return section
+
+    def find(self, path):
+        section = self.root
+        for header in path:
+            section = self._child(section, header)
+            if section is None:
+                return None
+        return section
+
+    def apply(self, path, line):
+        ''' apply the config line in the section; returns the lines printed by IOS '''
+        section = self.section(path)
+        words = line.split()
+        if words[0] == "hostname" and not path:
+            self.hostname = words[1]
+            return []
+        if words[0] in ("no", "default"):
+            target = ' '.join(words[1:])
+            child = self._child(section, target)
+            if child is not None and (child.children or child.type):
+                if words[0] == "default" or (child.type == "interface" and child.line.split(None, 1)[1] in self.physical):
+                    child.children = []
+                    child._index = {}
+                else:
+                    section.remove(child)
+                return []
+            key = _line_key(target)
+            for child in list(section.children):
+                if _matches(child.line, target) or (key != target and _line_key(child.line) == key):
+                    section.remove(child)
+            return []
+
+        ret = []
+        key = _line_key(line)
+        if key in ("ip vrf forwarding", "vrf forwarding"):
+            addresses = [child for child in section.children if _matches(child.line, "ip address")]
+            for child in addresses:
+                section.remove(child)
+            if addresses:
+                ret.append(f"% Interface {section.line.split(None, 1)[1]} IPv4 disabled and address(es) removed due to enabling VRF {words[-1]}")
+        new = ConfigSection(line, section, len(path))
+        for pos, child in enumerate(section.children):
+            if not child.children and _line_key(child.line) == key:
+                section.children[pos] = new
+                return ret
+        section.add(new)
+        return ret
+
+    def interfaces(self):
+        return [section.line.split(None, 1)[1] for section in self.root.sections("interface")]
+
+    def running_config(self):
+        ''' lines of 'show running-config' '''
+        lines = ["!", "version 17.3", "!", f"hostname {self.hostname}", "!"]
+        for section in self.root.children:
+            lines.append(section.line)
+            children = section.children
+            if section.type == "interface" and not any(_matches(child.line, "ip address") or _matches(child.line, "ip unnumbered")
+                                                       for child in children):
+                pos = 0
+                while pos < len(children) and _line_key(children[pos].line) in ("description", "ip vrf forwarding", "vrf forwarding",
+                                                                              "encapsulation", "vlan-id"):
+                    pos += 1
+                lines += [child.text() for child in children[:pos]] + [" no ip address"] + [child.text() for child in children[pos:]]
+            else:
+                lines += [child.text() for child in children]
+            if children:
+                lines.append("!")
+        lines += ["!", "end"]
+        size = sum([len(line) + 1 for line in lines])
+        return ["Building configuration...", "", f"Current configuration : {size} bytes"] + lines
+
+    def ip_interface_brief(self):
+        lines = [f"{'Interface':<23}{'IP-Address':<16}OK? Method Status                Protocol"]
+        for section in self.root.sections("interface"):
+            name = section.line.split(None, 1)[1]
+            address, method = "unassigned", "unset"
+            for child in section.children:
+                words = child.line.split()
+                if words[:2] == ["ip", "address"] and len(words) > 2 and words[-1] != "secondary":
+                    address, method = words[2], "manual"
+            status, protocol = ("administratively down", "down") if "shutdown" in section else ("up", "up")
+            lines.append(f"{name:<22} {address:<15} YES {method:<6} {status:<21} {protocol}")
+        return lines
+
+    def vrf(self):
+        members = {}
+        for section in self.root.sections("interface"):
+            for child in section.children:
+                if _line_key(child.line) in ("ip vrf forwarding", "vrf forwarding"):
+                    members.setdefault(child.line.split()[-1], []).append(short_interface(section.line.split(None, 1)[1]))
+        lines = []
+        for section in self.root.sections("ip vrf") + self.root.sections("vrf definition"):
+            rd = "<not set>"
+            for child in section.children:
+                if child.line.startswith("rd "):
+                    rd = child.line.split()[1]
+            if section.type == "ip vrf":
+                protocols = "ipv4"
+            else:
+                protocols = ','.join([child.line.split()[1] for child in section.children
+                                      if child.line.startswith("address-family ")]) or "<not set>"
+            interfaces = members.get(section.name, [])
+            lines.append(f"  {section.name:<32} {rd:<21} {protocols:<11} {interfaces[0] if interfaces else ''}".rstrip())
+            lines += [' ' * 69 + name for name in interfaces[1:]]
+        if lines:
+            lines.insert(0, f"  {'Name':<33}{'Default RD':<22}{'Protocols':<12}Interfaces")
+        return lines
+
+    def router_id(self, section=None):
+        if section:
+            for child in section.children:
+                if child.line.startswith("bgp router-id "):
+                    return child.line.split()[2]
+        addresses = {}
+        for interface in self.root.sections("interface"):
+            for child in interface.children:
+                words = child.line.split()
+                if words[:2] == ["ip", "address"] and len(words) > 2:
+                    addresses.setdefault(interface.line.split()[1].startswith("Loopback"), []).append(words[2])
+        for loopback in (True, False):
+            if addresses.get(loopback):
+                return max(addresses[loopback], key=lambda address: [int(part) for part in address.split('.')])
+        return "0.0.0.0"
+
+    def ip_bgp_summary(self):
+        sections = self.root.sections("router bgp")
+        if not sections:
+            return ["% BGP not active"]
+        bgp = sections[0]
+        lines = [f"BGP router identifier {self.router_id(bgp)}, local AS number {bgp.name}",
+                 "BGP table version is 1, main routing table version 1", ""]
+        neighbors = []
+        for child in bgp.children:
+            words = child.line.split()
+            if words[0] == "neighbor" and words[2:3] == ["remote-as"]:
+                neighbors.append((words[1], words[3]))
+        if neighbors:
+            lines.append("Neighbor        V           AS MsgRcvd MsgSent   TblVer  InQ OutQ Up/Down  State/PfxRcd")
+            for neighbor, remote_as in neighbors:
+                lines.append(f"{neighbor:<15} 4 {remote_as:>12} {0:>7} {0:>7} {1:>8} {0:>4} {0:>4} {'never':<8} Idle")
+        return lines
+
+    def ip_ospf_neighbor(self):
+        if not self.root.sections("router ospf"):
+            return []
+        return ["", "Neighbor ID     Pri   State           Dead Time   Address         Interface"]
+
+class _Session:
+    '''
+    One telnet connection to the simulator: the line discipline, the modes
+    and the command interpreter. The configuration is shared by the sessions.
+    '''
+
+    def __init__(self, simulator, conn):
+        self.sim = simulator
+        self.conn = conn
+        self.filter = TelnetFilter()
+        self.buffer = b''
+        self.last_cr = False
+        self.mode = simulator.start_mode
+        self.stack = []
+        self.terminal_length = simulator.terminal_length
+        self.copy_url = None
+        self.password_wait = False
+
+    @property
+    def prompt(self):
+        name = self.sim.config.hostname
+        if self.mode == USER_MODE:
+            return f"{name}>"
+        if self.mode == EXEC_MODE:
+            return f"{name}#"
+        if self.stack:
+            return f"{name}({self.stack[-1][0]})#"
+        return f"{name}(config)#"
+
+    @property
+    def path(self):
+        return tuple([header for submode, header in self.stack])
+
+    def _recv(self):
+        data = self.conn.recv(RECV_SIZE)
+        if not data:
+            raise EOFError
+        self.sim.stats["bytes_in"] += len(data)
+        data, replies = self.filter.feed(data)
+        if replies:
+            self.conn.sendall(replies)
+        self.buffer += data
+
+    def _send(self, text):
+        data = text.encode("utf-8")
+        self.sim.stats["bytes_out"] += len(data)
+        baud = self.sim.baud
+        if not baud:
+            self.conn.sendall(data)
+            return
+        # 10 bits per byte on the serial line, sent in 10ms chunks
+        chunk = max(1, baud // 1000)
+        for pos in range(0, len(data), chunk):
+            time.sleep(len(data[pos:pos + chunk]) * 10 / baud)
+            self.conn.sendall(data[pos:pos + chunk])
+
+    def _readline(self):
+        ''' returns (line, end of line byte) '''
+        while True:
+            if self.last_cr and self.buffer:
+                if self.buffer[:1] in (b'\n', b'\0'):
+                    self.buffer = self.buffer[1:]
+                self.last_cr = False
+            match = PATTERN_EOL.search(self.buffer)
+            if match:
+                line = self.buffer[:match.start()]
+                self.buffer = self.buffer[match.end():]
+                self.last_cr = match.group() == b'\r'
+                return line.decode("utf-8", "replace"), match.group()
+            self._recv()
+
+    def _getkey(self):
+        while not self.buffer:
+            self._recv()
+        key = self.buffer[:1]
+        self.buffer = self.buffer[1:]
+        if key == b'\r' and self.buffer[:1] in (b'\n', b'\0'):
+            self.buffer = self.buffer[1:]
+        return key
+
+    def _page(self, lines):
+        ''' send the output lines with --More-- after every screen (terminal length) '''
+        screen = self.terminal_length - 1 if self.terminal_length > 1 else 0
+        if not screen or len(lines) <= screen:
+            self._send(''.join([line + "\r\n" for line in lines]))
+            return
+        pos, count = 0, screen
+        while pos < len(lines):
+            self._send(''.join([line + "\r\n" for line in lines[pos:pos + count]]))
+            pos += count
+            if pos >= len(lines):
+                break
+            self._send(MORE)
+            key = self._getkey()
+            self._send(MORE_ERASE)
+            if key == b' ':
+                count = screen
+            elif key in (b'\r', b'\n'):
+                count = 1
+            else:
+                break
+
+    def run(self):
+        try:
+            while True:
+                line, eol = self._readline()
+                self._line(line, eol)
+        except (EOFError, OSError):
+            pass
+        finally:
+            self.conn.close()
+            self.sim._closed(self)
+
+    def _line(self, line, eol):
+        if self.password_wait:
+            # the password is not echoed
+            self.password_wait = False
+            with self.sim.lock:
+                output = self._enable(line)
+            self._send("\r\n")
+            self._page(output)
+            self._send(self.prompt)
+            return
+
+        if self.sim.latency:
+            time.sleep(self.sim.latency)
+        with self.sim.lock:
+            if line.strip():
+                self.sim._count(line)
+            if self.copy_url is not None:
+                output = self._copy(line)
+            elif eol in (b'\x1a', b'\x03'):
+                output = self._command(line) if line.strip() and self.mode == CONFIG_MODE else []
+                if self.mode == CONFIG_MODE:
+                    self.mode = EXEC_MODE
+                    self.stack = []
+                line = line + "^Z" if eol == b'\x1a' else line + "^C"
+            else:
+                output = self._command(line)
+            if any(item.startswith('%') for item in output):
+                self.sim.stats["errors"] += 1
+
+        self._send(line + "\r\n")
+        if self.password_wait:
+            self._send("Password: ")
+            return
+        if self.copy_url is not None:
+            self._send("Destination filename [running-config]? ")
+            return
+        self._page(output)
+        self._send(self.prompt)
+
+    def _invalid(self, line, word=0):
+        ''' IOS error with the marker under the word of the line '''
+        words = line.split()
+        offset = len(line) - len(line.lstrip())
+        for pos in range(min(word, len(words))):
+            offset = line.index(words[pos], offset) + len(words[pos])
+        if word < len(words):
+            offset = line.index(words[word], offset)
+        return [' ' * (len(self.prompt) + offset) + '^', MSG_INVALID, ""]
+
+    def _command(self, line):
+        if not line.strip():
+            return []
+        if self.mode == CONFIG_MODE:
+            return self._config_command(line)
+        return self._exec_command(line)
+
+    def _exec_command(self, line, do=False):
+        words = line.split()
+        if len(words) == 1 and words[0] in INCOMPLETE:
+            return [MSG_INCOMPLETE]
+        if _keywords(words, ("show",)):
+            return self._show(line)
+        if _keywords(words, ("enable",)):
+            if self.mode == USER_MODE and self.sim.password:
+                self.password_wait = True
+                return []
+            self.mode = EXEC_MODE if self.mode == USER_MODE else self.mode
+            return []
+        if _keywords(words, ("terminal", "length")) and len(words) == 3 and words[2].isdigit():
+            self.terminal_length = int(words[2])
+            return []
+        if _keywords(words, ("terminal",)):
+            return []
+        if _keywords(words, ("ping",)):
+            return ["Type escape sequence to abort.",
+                    f"Sending 5, 100-byte ICMP Echos to {words[-1]}, timeout is 2 seconds:",
+                    "!!!!!", "Success rate is 100 percent (5/5), round-trip min/avg/max = 1/1/1 ms"]
+        if _keywords(words, ("exit",)) or _keywords(words, ("logout",)):
+            if not do:
+                self.mode = USER_MODE
+            return []
+        if self.mode == USER_MODE or do:
+            return self._invalid(line)
+        if _keywords(words, ("disable",)):
+            self.mode = USER_MODE
+            return []
+        if _keywords(words, ("configure",)) and (len(words) == 1 or _keywords(words[1:], ("terminal",))):
+            self.mode = CONFIG_MODE
+            self.stack = []
+            return [MSG_CONFIG]
+        if _keywords(words, ("write",)) or _keywords(words, ("copy", "running-config", "startup-config")):
+            return ["Building configuration...", "[OK]"]
+        if _keywords(words, ("copy",)) and len(words) == 3 and _keywords(words[2:], ("running-config",)):
+            match = PATTERN_TFTP.match(words[1])
+            if not match:
+                return self._invalid(line, 1)
+            self.copy_url = words[1]
+            return []
+        if _keywords(words, ("clear",)):
+            return []
+        return self._invalid(line)
+
+    def _show(self, line):
+        command, _, pipe = line.partition('|')
+        words = command.split()[1:]
+        if _keywords(words, ("ip", "interface", "brief")):
+            output = self.sim.config.ip_interface_brief()
+        elif _keywords(words, ("ip", "bgp", "summary")):
+            output = self.sim.config.ip_bgp_summary()
+        elif _keywords(words, ("ip", "ospf", "neighbor")):
+            output = self.sim.config.ip_ospf_neighbor()
+        elif _keywords(words, ("vrf",)) or _keywords(words, ("ip", "vrf")):
+            output = self.sim.config.vrf()
+        elif _keywords(words, ("running-config",)):
+            output = self.sim.config.running_config()
+        elif _keywords(words, ("version",)):
+            output = ["Cisco IOS XE Software, Version 17.03.01 (cisco_simulator)",
+                      f"{self.sim.config.hostname} uptime is {int(time.monotonic() - self.sim.start_time) // 60} minutes"]
+        else:
+            return self._invalid(line, 1)
+        if pipe.strip():
+            return self._pipe(pipe, output, line)
+        return output
+
+    def _pipe(self, pipe, output, line):
+        words = pipe.split(None, 1)
+        if len(words) < 2:
+            return [MSG_INCOMPLETE]
+        try:
+            regex = re.compile(words[1].strip())
+        except re.error:
+            return self._invalid(line, len(line.partition('|')[0].split()) + 2)
+        if _keywords(words[:1], ("include",)):
+            return [item for item in output if regex.search(item)]
+        if _keywords(words[:1], ("exclude",)):
+            return [item for item in output if not regex.search(item)]
+        if _keywords(words[:1], ("begin",)):
+            for pos, item in enumerate(output):
+                if regex.search(item):
+                    return output[pos:]
+            return []
+        if _keywords(words[:1], ("section",)):
+            # the top level lines with their sub-lines, if any of them matches
+            ret, block = [], []
+            for item in output + [""]:
+                if item.startswith(' ') and block:
+                    block.append(item)
+                    continue
+                if any(regex.search(blockline) for blockline in block):
+                    ret += block
+                block = [item] if item and not item.startswith('!') else []
+            return ret
+        return self._invalid(line, len(line.partition('|')[0].split()) + 1)
+
+    def _enable(self, password):
+        if password == self.sim.password:
+            self.mode = EXEC_MODE
+            return []
+        return ["% Bad passwords", ""]
+
+    def _expand(self, word):
+        ''' the keyword abbreviated to a unique prefix (int -> interface) '''
+        submodes = ["config"] + [submode for submode, header in self.stack]
+        keywords = set([keyword for submode in submodes for keyword in VOCABULARY.get(submode, ())])
+        if word in keywords:
+            return word
+        candidates = [keyword for keyword in keywords if keyword.startswith(word)]
+        return candidates[0] if len(candidates) == 1 else word
+
+    def _config_command(self, line):
+        words = line.split()
+        if words[0] == "end":
+            self.mode = EXEC_MODE
+            self.stack = []
+            return []
+        if words[0] == "exit":
+            if self.stack:
+                self.stack.pop()
+            else:
+                self.mode = EXEC_MODE
+            return []
+        if words[0] in ("exit-address-family", "exit-vrf"):
+            if self.stack and self.stack[-1][0].endswith("-af"):
+                self.stack.pop()
+                return []
+            return self._invalid(line)
+        if words[0] == "do":
+            return self._exec_command(' '.join(words[1:]), True) if len(words) > 1 else [MSG_INCOMPLETE]
+        first = 1 if words[0] in ("no", "default") else 0
+        if len(words) > first:
+            words[first] = self._expand(words[first])
+        command = ' '.join(words)
+
+        # the submode command is looked up in the current mode and in the parent modes as IOS does
+        for level in range(len(self.stack), -1, -1):
+            parent = self.stack[level - 1][0] if level else "config"
+            for mode, pattern, submode in SUBMODES:
+                if mode == parent and pattern.match(command):
+                    header = command
+                    if words[0] == "interface":
+                        name = canonical_interface(' '.join(words[1:]))
+                        if name is None:
+                            return self._invalid(line, 1)
+                        header = f"interface {name}"
+                    self.stack = self.stack[:level] + [(submode, header)]
+                    self.sim.config.section(self.path)
+                    return []
+
+        target = words[1:] if words[0] in ("no", "default") else words
+        if not target:
+            return [MSG_INCOMPLETE]
+        if len(target) == 1 and target[0] in INCOMPLETE:
+            return [MSG_INCOMPLETE]
+        for level in range(len(self.stack), -1, -1):
+            submode = self.stack[level - 1][0] if level else "config"
+            if target[0] in VOCABULARY.get(submode, ()):
+                self.stack = self.stack[:level]
+                if target[0] == "interface":
+                    name = canonical_interface(' '.join(target[1:]))
+                    if name is None:
+                        return self._invalid(line, len(words) - len(target) + 1)
+                    command = ' '.join(words[:len(words) - len(target)] + ["interface", name])
+                return self.sim.config.apply(self.path, command)
+        return self._invalid(line, len(words) - len(target))
+
+    def _copy(self, destination):
+        url = self.copy_url
+        self.copy_url = None
+        if destination.strip() and destination.strip() != "running-config":
+            return self._invalid(destination)
+        host, filename = PATTERN_TFTP.match(url).groups()
+        start = time.monotonic()
+        try:
+            data = tftp_get(host, filename, port=self.sim.tftp_port)
+        except Exception as inst:
+            return [f"%Error opening {url} ({inst})"]
+        lines = [f"Accessing {url}...", f"Loading {filename} from {host} (via GigabitEthernet1): !",
+                 f"[OK - {len(data)} bytes]", ""]
+
+        # the file is applied as typed in config mode
+        mode, stack = self.mode, self.stack
+        self.mode, self.stack = CONFIG_MODE, []
+        for item in data.decode("utf-8", "replace").splitlines():
+            if not item.strip() or item.strip().startswith('!'):
+                continue
+            if item.split()[0] == "end":
+                break
+            lines += [output for output in self._config_command(item) if output.startswith('%')]
+            if self.mode != CONFIG_MODE:
+                self.mode, self.stack = CONFIG_MODE, []
+        self.mode, self.stack = mode, stack
+
+        seconds = max(time.monotonic() - start, 0.001)
+        lines.append(f"{len(data)} bytes copied in {seconds:.3f} secs ({int(len(data) / seconds)} bytes/sec)")
+        return lines
+
+class CiscoSimulator:
+    '''
+    Telnet server which simulates the CLI of a Cisco IOS router for tests and
+    benchmarks without a device. It models the user/exec/config/config-deep
+    prompts, the enable password, '% Invalid input' errors, the show commands
+    derived from the applied config (show ip interface brief, show vrf,
+    show ip bgp summary, show ip ospf neighbor, show running-config with
+    '| include/exclude/begin/section'), --More-- paging and
+    'copy tftp://host/file running-config'.
+
+        latency         - seconds of delay before every command is processed
+        baud            - bits/sec of the simulated console line (10 bits per byte), 0 - no limit
+        terminal_length - initial terminal length of the sessions (0 - no paging)
+        start_mode      - mode of a new session: "user" or "exec"
+    '''
+
+    def __init__(self, name="Router", password="cisco", host="127.0.0.1", port=0, latency=0.0, baud=0,
+                 terminal_length=24, interfaces=SIM_INTERFACES, start_mode=USER_MODE, tftp_port=TFTP_PORT):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.latency = latency
+        self.baud = baud
+        self.terminal_length = terminal_length
+        self.start_mode = start_mode
+        self.tftp_port = tftp_port
+        self.config = SimConfig(name, interfaces)
+        self.lock = threading.Lock()
+        self.commands = []
+        self.keep_commands = False
+        self.stats = {"connections": 0, "commands": 0, "errors": 0, "bytes_in": 0, "bytes_out": 0}
+        self.start_time = time.monotonic()
+        self._sock = None
+        self._thread = None
+        self._sessions = []
+        self._running = False
+
+    def __repr__(self):
+        return f"CiscoSimulator {self.config.hostname} {self.host}:{self.port}"
+
+    @property
+    def name(self):
+        return self.config.hostname
+
+    def start(self):
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((self.host, self.port))
+        # port 0 selects free port
+        self.port = self._sock.getsockname()[1]
+        self._sock.listen(16)
+        self._sock.settimeout(0.5)
+        self._running = True
+        self._thread = threading.Thread(target=self._serve, name=f"simulator-{self.port}", daemon=True)
+        self._thread.start()
+        info(f"{self} started")
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        if self._sock:
+            self._sock.close()
+            self._sock = None
+        for session in list(self._sessions):
+            try:
+                session.conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        info(f"{self} stopped {self.stats}")
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _serve(self):
+        while self._running:
+            try:
+                conn, peer = self._sock.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            session = _Session(self, conn)
+            with self.lock:
+                self._sessions.append(session)
+                self.stats["connections"] += 1
+            trace(f"{self} connection from {peer}")
+            threading.Thread(target=session.run, name=f"simulator-{self.port}-session", daemon=True).start()
+
+    def _closed(self, session):
+        with self.lock:
+            if session in self._sessions:
+                self._sessions.remove(session)
+
+    def _count(self, line):
+        self.stats["commands"] += 1
+        if self.keep_commands:
+            self.commands.append(line)
+
+    def running_config(self):
+        ''' text of 'show running-config' of the simulated router '''
+        with self.lock:
+            return '\n'.join(self.config.running_config()) + '\n'
+
+def start_simulators(count, base_port=0, name="R", **kwargs):
+    '''
+    Start count simulators named R1, R2 ... on consecutive ports from base_port
+    (free ports if base_port is 0), like the console ports of a terminal server
+    '''
+    simulators = []
+    for i in range(count):
+        simulators.append(CiscoSimulator(f"{name}{i + 1}", port=base_port + i if base_port else 0, **kwargs).start())
+    return simulators
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    base_port = int(sys.argv[2]) if len(sys.argv) > 2 else 30001
+    latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.0
+    baud = int(sys.argv[4]) if len(sys.argv) > 4 else 0
+    simulators = start_simulators(count, base_port, latency=latency, baud=baud, host="0.0.0.0")
+    for simulator in simulators:
+        print(f"{simulator}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        for simulator in simulators:
+            simulator.stop()
+
+if __name__ == "__main__":
+    main()
@@ -2,12 +2,13 @@
 # Autor: Aleksey Burger
 
 import logging
-import re
 from base_config import BaseConfig
 from dtu_definition import VRF_AFAMILY_IPV4_UNICAST, VRF_AFAMILY_IPV6_UNICAST
 from router_cisco import RouterCisco
 from router_cisco import CONFIG_MODE
 from exception_dev import ExceptionDevice
+from show_parser import cisco_show
+from running_config import cisco_running_config
 
 logger = logging.getLogger("dtulibLog")
 
@@ -113,8 +114,9 @@ class CiscoVrf(BaseConfig):
 
         self.router.toConfig()
 
-        for af in self.af_list:
-            af.__apply__(self)
+        with self.router.config_batch():
+            for af in self.af_list:
+                af.__apply__(self)
 
         info(f"{self} created")
         return True
@@ -146,21 +148,7 @@ class CiscoVrf(BaseConfig):
     
 
 def cisco_get_all_vrf (router):
-    router.enterExecCommand('show vrf')
-    vrf_list = []
-
-    #remove show header
-    delimiter_pos = re.search(r'Name\s+Default RD\s+Protocols\s+(Interfaces\r\n)', router.resp, re.MULTILINE)
-    if not delimiter_pos:
-        return vrf_list
-    body = router.resp[delimiter_pos.span()[1]:]
-    # remove prompt after the table
-    table_end_pos = re.search(f'^{router.name}#', body, re.MULTILINE)
-    if table_end_pos:
-        body = body[:table_end_pos.span()[0]]
-
-    for line in body.split('\r\n'):
-        match = re.findall(r'(\w+)', line)
-        if match and len(match):
-            vrf_list.append(match[0])
-    return vrf_list
\ No newline at end of file
+    if getattr(router, "use_running_config", False):
+        snapshot = cisco_running_config(router)
+        return snapshot.names("ip vrf") + snapshot.names("vrf definition")
+    return cisco_show(router, 'show vrf').column('Name')
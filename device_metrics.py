@@ -0,0 +1,262 @@
+# GNU GENERAL PUBLIC LICENSE
+# Autor: Aleksey Burger
+
+import json
+import time
+from bisect import bisect_left
+
+# upper bounds (seconds) of the latency histogram buckets; the last bucket is +Inf
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# the verbs above the limit are counted as OTHER_VERB, so a run with unusual
+# commands does not grow the metrics without limit
+MAX_VERBS = 200
+OTHER_VERB = "<other>"
+PASSWORD_VERB = "<password>"
+PROMPT_VERB = "<prompt>"
+
+METRIC_PREFIX = "dtulib"
+
+def command_verb(command):
+    '''
+    Verb of the command: the first word ("do" is skipped); "no"/"default" are
+    kept with the next word, e.g. "no shutdown", "show", "interface"
+    '''
+    words = command.split(None, 3)
+    if words and words[0] == "do":
+        words = words[1:]
+    if not words:
+        return PROMPT_VERB
+    if words[0] in ("no", "default") and len(words) > 1:
+        return f"{words[0]} {words[1]}"
+    return words[0]
+
+class Histogram:
+    ''' Fixed bucket histogram: observe() is one bisect and a few additions '''
+
+    __slots__ = ("bounds", "counts", "count", "sum", "max")
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        ''' upper bound of the bucket of the q quantile (max for the last bucket) '''
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        total = 0
+        for index, count in enumerate(self.counts):
+            total += count
+            if total >= rank and count:
+                return self.bounds[index] if index < len(self.bounds) else self.max
+        return self.max
+
+    def cumulative(self):
+        ''' (le, count) pairs as Prometheus buckets '''
+        ret = []
+        total = 0
+        for index, count in enumerate(self.counts):
+            total += count
+            ret.append((self.bounds[index] if index < len(self.bounds) else "+Inf", total))
+        return ret
+
+    def as_dict(self):
+        return {"count": self.count, "sum": round(self.sum, 6), "max": round(self.max, 6),
+                "p50": self.quantile(0.5), "p90": self.quantile(0.9), "p99": self.quantile(0.99),
+                "buckets": [[le, count] for le, count in self.cumulative()]}
+
+class VerbMetrics:
+    ''' Metrics of the commands of one verb '''
+
+    def __init__(self):
+        self.commands = 0
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.retries = 0
+        self.ttfb = Histogram()
+        self.ttp = Histogram()
+
+    def as_dict(self):
+        return {"commands": self.commands, "bytes_out": self.bytes_out, "bytes_in": self.bytes_in,
+                "retries": self.retries, "ttfb": self.ttfb.as_dict(), "ttp": self.ttp.as_dict()}
+
+class DeviceMetrics:
+    '''
+    Latency metrics of one device session, filled by RouterCisco and LinuxCli:
+        verbs       - per command verb: commands, bytes out/in, retries, histograms
+                      of time to the first byte (ttfb) and time to the prompt (ttp)
+        prompt      - waitPrompt: calls, <cr> probes, retries (probes after the first
+                      one), failures and the histogram of the wait time
+        transitions - mode changes "exec->config": count, steps (mode commands sent,
+                      more than one if the mode is changed in several steps or repeated)
+                      and the histogram of the time
+    '''
+
+    def __init__(self, device="", kind="cisco"):
+        self.device = device
+        self.kind = kind
+        self.reset()
+
+    def __repr__(self):
+        return f"DeviceMetrics {self.device} {sum(verb.commands for verb in self.verbs.values())} commands"
+
+    def reset(self):
+        self.started = time.time()
+        self.verbs = {}
+        self.prompt_waits = Histogram()
+        self.prompt_probes = 0
+        self.prompt_retries = 0
+        self.prompt_failures = 0
+        self.transitions = {}
+
+    def _verb(self, verb):
+        metrics = self.verbs.get(verb)
+        if metrics is None:
+            if len(self.verbs) >= MAX_VERBS:
+                verb = OTHER_VERB
+                metrics = self.verbs.get(verb)
+            if metrics is None:
+                metrics = self.verbs[verb] = VerbMetrics()
+        return metrics
+
+    def command(self, verb, ttfb, ttp, bytes_out, bytes_in, retries=0):
+        ''' one command; ttfb is None if it is not observed (pipelined commands) '''
+        metrics = self._verb(verb)
+        metrics.commands += 1
+        metrics.bytes_out += bytes_out
+        metrics.bytes_in += bytes_in
+        metrics.retries += retries
+        if ttfb is not None:
+            metrics.ttfb.observe(ttfb)
+        metrics.ttp.observe(ttp)
+
+    def prompt(self, seconds, probes, found):
+        self.prompt_waits.observe(seconds)
+        self.prompt_probes += probes
+        self.prompt_retries += max(0, probes - 1)
+        if not found:
+            self.prompt_failures += 1
+
+    def transition(self, source, target, seconds, steps=1):
+        key = f"{source}->{target}"
+        entry = self.transitions.get(key)
+        if entry is None:
+            entry = self.transitions[key] = {"count": 0, "steps": 0, "time": Histogram()}
+        entry["count"] += 1
+        entry["steps"] += steps
+        entry["time"].observe(seconds)
+
+    def as_dict(self):
+        return {"device": self.device, "kind": self.kind, "started": self.started,
+                "verbs": {verb: metrics.as_dict() for verb, metrics in sorted(self.verbs.items())},
+                "prompt": {"waits": self.prompt_waits.as_dict(), "probes": self.prompt_probes,
+                           "retries": self.prompt_retries, "failures": self.prompt_failures},
+                "transitions": {key: {"count": entry["count"], "steps": entry["steps"],
+                                      "time": entry["time"].as_dict()}
+                                for key, entry in sorted(self.transitions.items())}}
+
+def _metrics_list(devices):
+    ''' DeviceMetrics of the devices: DeviceMetrics, RouterCisco/LinuxCli or a list of them '''
+    if not isinstance(devices, (list, tuple)):
+        devices = [devices]
+    ret = []
+    for device in devices:
+        metrics = device if isinstance(device, DeviceMetrics) else getattr(device, "metrics", None)
+        if metrics is not None:
+            ret.append(metrics)
+    return ret
+
+def metrics_json(devices, indent=2):
+    ''' JSON text of the metrics of the devices '''
+    return json.dumps({"time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                       "devices": [metrics.as_dict() for metrics in _metrics_list(devices)]}, indent=indent)
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(labels):
+    return '{' + ','.join(f'{key}="{_label(value)}"' for key, value in labels.items()) + '}'
+
+class _PromWriter:
+    def __init__(self):
+        self.lines = []
+        self.declared = set()
+
+    def declare(self, name, mtype, text):
+        if name not in self.declared:
+            self.declared.add(name)
+            self.lines.append(f"# HELP {name} {text}")
+            self.lines.append(f"# TYPE {name} {mtype}")
+
+    def sample(self, name, labels, value):
+        self.lines.append(f"{name}{_labels(labels)} {value}")
+
+    def histogram(self, name, labels, histogram, text):
+        self.declare(name, "histogram", text)
+        for le, count in histogram.cumulative():
+            self.sample(f"{name}_bucket", dict(labels, le=le), count)
+        self.sample(f"{name}_sum", labels, round(histogram.sum, 6))
+        self.sample(f"{name}_count", labels, histogram.count)
+
+    def counter(self, name, labels, value, text):
+        self.declare(name, "counter", text)
+        self.sample(name, labels, value)
+
+def metrics_prometheus(devices, prefix=METRIC_PREFIX):
+    ''' Prometheus text exposition format of the metrics of the devices '''
+    out = _PromWriter()
+    all_metrics = _metrics_list(devices)
+    # the samples of one metric must be together: metric by metric, device by device
+    for name, field, text in (("commands_total", "commands", "commands sent"),
+                              ("bytes_out_total", "bytes_out", "bytes sent"),
+                              ("bytes_in_total", "bytes_in", "bytes received"),
+                              ("command_retries_total", "retries", "command retries")):
+        for metrics in all_metrics:
+            for verb, verb_metrics in sorted(metrics.verbs.items()):
+                out.counter(f"{prefix}_{name}", {"device": metrics.device, "verb": verb},
+                            getattr(verb_metrics, field), text)
+    for name, field, text in (("command_ttfb_seconds", "ttfb", "time from the command to the first byte"),
+                              ("command_ttp_seconds", "ttp", "time from the command to the prompt")):
+        for metrics in all_metrics:
+            for verb, verb_metrics in sorted(metrics.verbs.items()):
+                out.histogram(f"{prefix}_{name}", {"device": metrics.device, "verb": verb},
+                              getattr(verb_metrics, field), text)
+    for metrics in all_metrics:
+        out.histogram(f"{prefix}_prompt_wait_seconds", {"device": metrics.device}, metrics.prompt_waits,
+                      "waitPrompt time")
+    for name, field, text in (("prompt_probes_total", "prompt_probes", "<cr> probes of waitPrompt"),
+                              ("prompt_retries_total", "prompt_retries", "repeated <cr> probes of waitPrompt"),
+                              ("prompt_failures_total", "prompt_failures", "waitPrompt calls without prompt")):
+        for metrics in all_metrics:
+            out.counter(f"{prefix}_{name}", {"device": metrics.device}, getattr(metrics, field), text)
+    for name, field, text in (("mode_transitions_total", "count", "mode transitions"),
+                              ("mode_transition_steps_total", "steps", "mode commands of the mode transitions")):
+        for metrics in all_metrics:
+            for key, entry in sorted(metrics.transitions.items()):
+                source, target = key.split("->")
+                out.counter(f"{prefix}_{name}", {"device": metrics.device, "from": source, "to": target},
+                            entry[field], text)
+    for metrics in all_metrics:
+        for key, entry in sorted(metrics.transitions.items()):
+            source, target = key.split("->")
+            out.histogram(f"{prefix}_mode_transition_seconds",
+                          {"device": metrics.device, "from": source, "to": target}, entry["time"],
+                          "time of the mode transitions")
+    return '\n'.join(out.lines) + '\n'
+
+def write_metrics(path, devices):
+    ''' Write the metrics to the file: Prometheus text if it ends with .prom, JSON otherwise '''
+    text = metrics_prometheus(devices) if path.endswith(".prom") else metrics_json(devices)
+    with open(path, "w") as file:
+        file.write(text)
@@ -5,25 +5,36 @@ import paramiko
 import time
 import re
 import pdb
+import select
 import logging
+from session_transcript import TranscriptWriter, RecordingChannel, ReplayChannel
+from device_metrics import DeviceMetrics, command_verb, PROMPT_VERB
+import linux_sftp
+from terminal_stream import TerminalNormalizer, ChunkBuffer, strip_ansi
 
+# The arguments are formatted only when the record is emitted: trace("connected %s", name)
 logger = logging.getLogger("dtulibLog")
 
-def trace(format):
-    logger.debug(f'Linux:{format}')
-    pass
+def trace(format, *args):
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug('Linux:' + format, *args)
 
-def info(format):
-    logger.info(f'Linux:{format}')
+def info(format, *args):
+    if logger.isEnabledFor(logging.INFO):
+        logger.info('Linux:' + format, *args)
 
 device_logger = logging.getLogger("deviceLog")
-def device_log(format):
-    device_logger.info(f'{format}')
+def device_log(format, *args, device=None):
+    if device_logger.isEnabledFor(logging.INFO):
+        device_logger.info(format, *args, extra={"device": device})
 
 NONE_MODE = "none"
 EXEC_MODE = "exec"
 MODES = [EXEC_MODE]
 
+# the end of the output checked for the prompt
+PROMPT_TAIL = 256
+
 # catch router name from the prompt:
 PATTERN_PROMPT = re.compile(r'\s*\w+@(.*)#$')
 
@@ -56,10 +67,80 @@ def strPrefixRem(string, prefix):
 
 PATTERN_MORE = re.compile(r'.*--More--\s*$')
 
+# exec_batch: channels in flight and the longest select wait (stderr data does not wake select)
+EXEC_CONCURRENCY = 8
+EXEC_POLL = 0.1
+EXEC_RECV_SIZE = 32768
+
+class ExecResult:
+    '''
+    Result of the command run by exec_command/exec_batch: stdout and stderr text,
+    exit_status (-1 if the command has ended without status, None if it has not
+    ended before the timeout) and seconds from the start to the exit
+    '''
+
+    def __init__(self, command):
+        self.command = command
+        self.stdout = ""
+        self.stderr = ""
+        self.exit_status = None
+        self.seconds = None
+
+    def __repr__(self):
+        return f"ExecResult '{self.command}' exit {self.exit_status} {len(self.stdout)}/{len(self.stderr)} chars"
+
+    @property
+    def ok(self):
+        return self.exit_status == 0
+
+class _ExecChannel:
+    ''' exec_batch state of one command '''
+
+    def __init__(self, index, command, channel):
+        self.index = index
+        self.result = ExecResult(command)
+        self.channel = channel
+        self.stdout = []
+        self.stderr = []
+        self.bytes_in = 0
+        self.start = time.monotonic()
+        self.first = None
+
+    def fileno(self):
+        return self.channel.fileno()
+
+    def drain(self):
+        channel = self.channel
+        while channel.recv_ready():
+            self._received(self.stdout, channel.recv(EXEC_RECV_SIZE))
+        while channel.recv_stderr_ready():
+            self._received(self.stderr, channel.recv_stderr(EXEC_RECV_SIZE))
+
+    def _received(self, chunks, data):
+        if data:
+            if self.first is None:
+                self.first = time.monotonic()
+            self.bytes_in += len(data)
+            chunks.append(data)
+
+    def done(self):
+        ''' all the data is received: the exit status is sent after the data '''
+        return self.channel.exit_status_ready() or (self.channel.closed and not self.channel.recv_ready())
+
+    def finish(self, ended):
+        result = self.result
+        result.stdout = b''.join(self.stdout).decode("utf-8", "replace")
+        result.stderr = b''.join(self.stderr).decode("utf-8", "replace")
+        result.exit_status = self.channel.recv_exit_status() if ended else None
+        result.seconds = time.monotonic() - self.start
+        self.channel.close()
+        return result
+
 class LinuxCli:
 
-    def __init__(self, ipAddress, user, password, name=None):
+    def __init__(self, ipAddress, user, password, name=None, port=22):
         self.ipAddress = ipAddress
+        self.port = port
         self.user = user
         self.password = password
         self.mode = NONE_MODE
@@ -68,45 +149,112 @@ class LinuxCli:
         self.resp = None
 
         self.input_size = 10000
+        # compression of the ssh connection (set before startSSH; it helps sftp of text logs)
+        self.compress = False
+        # readPrompt ends when the prompt is at the end of the output, if no data comes
+        # during wait_count * wait_time seconds or at read_timeout seconds if it is set
+        # (None - no deadline: long commands such as ping -c 100 are read to the prompt)
         self.wait_count = 20
         self.wait_time  = 1
+        self.read_timeout = None
+        # checkReady polling interval for the channels without fileno (ReplayChannel)
+        self.poll_interval = 0.01
+        # checkReady waits of the current readPrompt
+        self.ready_waits = 0
+
+        # per command verb latency histograms of readPrompt (see device_metrics); None - not collected
+        self.metrics = DeviceMetrics(ipAddress, "linux")
+
+        # TranscriptWriter of the session and the transcript played by startSSH() instead of ssh
+        self.transcript = None
+        self.replay_path = None
+        self.replay_speed = None
+        self.replay_strict = True
+
+    def startSSH(self, shell=True):
+        ''' Connect; shell=False - without the interactive shell, only exec_command/exec_batch '''
+        self.channel = None
+        if self.replay_path:
+            self.client = None
+            self.channel = ReplayChannel(self.replay_path, self.replay_speed, self.replay_strict)
+            self.waitPrompt()
+            return True
 
-    def startSSH(self):
         self.client = paramiko.SSHClient()
         self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
 
         try:
-            trace(f"Connecting {self.ipAddress}...")
-            self.client.connect(hostname=self.ipAddress, username=self.user, password=self.password, look_for_keys=False, allow_agent=False)
+            trace("Connecting %s...", self.ipAddress)
+            self.client.connect(hostname=self.ipAddress, port=self.port, username=self.user, password=self.password, look_for_keys=False, allow_agent=False, compress=self.compress)
 
-            trace("Start shell..")
-            self.channel = self.client.invoke_shell(width=80, height=100)
-
-            self.waitPrompt()
+            if shell:
+                self.startShell()
         except Exception as e:
             logger.error(f"Exception {type(e)}: {e}")
             return False
         return True
 
-    def end(self):
-        self.channel.close()
-        self.client.close()
+    def startShell(self):
+        ''' Open the interactive shell channel on the connected ssh client and wait for the prompt '''
+        trace("Start shell..")
+        self.channel = self.client.invoke_shell(width=80, height=100)
+        if self.transcript is not None:
+            self.channel = RecordingChannel(self.channel, self.transcript)
 
-    def checkReady(self):
+        self.waitPrompt()
 
-        repeat = self.wait_count
-        while repeat != 0 and not self.channel.recv_ready():
-            trace(f"checkReady WAIT ... {repeat}")
-            time.sleep(self.wait_time)
-            repeat -= 1
+    def end(self):
+        if self.channel is not None:
+            self.channel.close()
+        if self.client is not None:
+            self.client.close()
+        if self.transcript is not None:
+            self.transcript.close()
+            self.transcript = None
+
+    def record(self, path):
+        ''' Write the transcript of the shell session to the file until end() (call before startSSH) '''
+        self.transcript = TranscriptWriter(path, self.name or "", self.ipAddress, self.port, "ssh")
+        return self.transcript
+
+    def replay(self, path, speed=None, strict=True):
+        ''' startSSH() plays the recorded transcript instead of connecting (see RouterCisco.replay) '''
+        self.replay_path = path
+        self.replay_speed = speed
+        self.replay_strict = strict
+
+    def checkReady(self, timeout=None):
+        '''
+        Wait up to timeout seconds (default wait_count * wait_time) for the channel data.
+        The channel is waited by select, so it returns as soon as the data arrives.
+        '''
+        if self.channel.recv_ready():
+            return True
+        if timeout is None:
+            timeout = self.wait_count * self.wait_time
+        trace("checkReady WAIT ... %.3f", timeout)
+        self.ready_waits += 1
+        if hasattr(self.channel, "fileno"):
+            select.select([self.channel], [], [], timeout)
+        else:
+            deadline = time.monotonic() + timeout
+            while not self.channel.recv_ready() and time.monotonic() < deadline:
+                time.sleep(self.poll_interval)
 
         return self.channel.recv_ready()
 
+    def _isPrompt(self, resp):
+        ''' the last line of the output is the cli prompt '''
+        line = resp[resp.rfind('\n') + 1:].strip()
+        if not line.endswith('#'):
+            return False
+        if self.name:
+            return line.endswith(f"{self.name}#")
+        return PATTERN_PROMPT.search(line) is not None
+
     def binaryToAscii(self, binary):
-        ascii = binary.decode("ascii")
-        pattern = re.compile(r'\x1b\[[0-9?]+[m|K|h]')
-        #re.compile(r'\x1b\[\d+m')
-        return pattern.sub('', ascii)        
+        ''' text of the complete output without the escape sequences (readPrompt uses TerminalNormalizer) '''
+        return strip_ansi(binary.decode("utf-8", "replace"))
 
     def readPrompt(self, prefix=None, clean=False):
         
@@ -117,39 +265,66 @@ class LinuxCli:
             return tmp
 
         self.resp = ""
+        # the chunks are decoded and cleaned as they come and joined once at the end
+        normalizer = TerminalNormalizer()
+        output = ChunkBuffer()
         echo = True
+        start = time.monotonic()
+        first = None
+        bytes_in = 0
+        self.ready_waits = 0
+        deadline = start + self.read_timeout if self.read_timeout else None
         # buffer is empty
         #try:
 
-        while  self.checkReady():
+        while True:
+            timeout = self.wait_count * self.wait_time
+            if deadline is not None:
+                timeout = min(timeout, deadline - time.monotonic())
+            if timeout <= 0 or not self.checkReady(timeout):
+                break
             trace("readPrompt IS READY - READ")
-            resp = self.binaryToAscii(self.channel.recv(self.input_size))
+            data = self.channel.recv(self.input_size)
+            if first is None:
+                first = time.monotonic()
+            bytes_in += len(data)
+            resp = normalizer.feed(data)
 
             # remove the command from the input buffer
-            if echo:
+            if echo and resp:
                 echo = False
                 resp = strPrefixRem(resp, prefix)
 
-            self.resp += resp
+            output.append(resp)
+            tail = output.tail(PROMPT_TAIL)
 
             # send backspace if --More-- prompt is faced
-            if PATTERN_MORE.search(resp):
+            if PATTERN_MORE.search(tail):
                 trace("readPrompt MORE FOUND")
                 self.channel.send(" ")
+                continue
 
             # it looks to be cli prompt - done
-            name = self.name if self.name else ""
-            cli_prompt = fr'{name}#\s$'
-            if re.search(cli_prompt, resp):
+            if self._isPrompt(tail):
                 break
 
-        self.mode, name = paraseResponce(self.resp)
+        output.append(normalizer.flush())
+        self.resp = output.text()
+        tail = output.tail(PROMPT_TAIL).strip()
+        self.mode, name = paraseResponce(tail[tail.rfind('\n') + 1:])
         if not self.name and self.mode in MODES and name:
             self.name = name.strip()
-            trace(f"connected {self.name}")
+            trace("connected %s", self.name)
 
-        trace(f"readPrompt SUCCESS {len(self.resp)} bytes")
-        device_log(self.resp)
+        if self.metrics is not None:
+            if self.name:
+                self.metrics.device = self.name
+            self.metrics.command(command_verb(prefix) if prefix else PROMPT_VERB,
+                                 first - start if first is not None else None, time.monotonic() - start,
+                                 len(prefix) + 1 if prefix else 0, bytes_in, self.ready_waits)
+
+        trace("readPrompt SUCCESS %s bytes", len(self.resp))
+        device_log("%s", self.resp, device=self.name or self.ipAddress)
         return self.resp
 
         # except Exception as e:
@@ -162,11 +337,11 @@ class LinuxCli:
             resp = self.readPrompt(clean=True)
 
             if self.mode in MODES:
-                trace(f"waitPrompt: MODE: {self.mode}")
+                trace("waitPrompt: MODE: %s", self.mode)
                 return
             
-            trace(f"waitPrompt: UNEXPECTED MODE: {self.mode}")
-            trace(f"SEND <cr>")
+            trace("waitPrompt: UNEXPECTED MODE: %s", self.mode)
+            trace("SEND <cr>")
 
             self.channel.send('\n')
 
@@ -176,9 +351,11 @@ class LinuxCli:
 
         # try:
 
-        trace(f"enterWaitResponce SENT '{command}'")
+        trace("enterWaitResponce SENT '%s'", command)
+        if self.transcript is not None:
+            self.transcript.command(command, expect)
         self.channel.send(command + "\n")
-        device_log(command + "\n")
+        device_log("%s", command + "\n", device=self.name or self.ipAddress)
 
         self.resp = None
         self.readPrompt(prefix=command)
@@ -189,6 +366,89 @@ class LinuxCli:
         # except Exception as e:
         #     print(f"Exception  write {type(e)}) {e}") # the exception instance
 
+    def _openExec(self, index, command):
+        if self.client is None or self.client.get_transport() is None:
+            raise Exception(f"{self.ipAddress}: exec channels need the ssh connection (startSSH)")
+        trace("exec_command '%s'", command)
+        device_log("EXEC: %s", command, device=self.name or self.ipAddress)
+        channel = self.client.get_transport().open_session()
+        channel.exec_command(command)
+        return _ExecChannel(index, command, channel)
+
+    def exec_command(self, command, timeout=None):
+        ''' Run the command on a new exec channel of the ssh connection; returns ExecResult '''
+        return self.exec_batch([command], 1, timeout)[0]
+
+    def exec_batch(self, commands, concurrency=EXEC_CONCURRENCY, timeout=None):
+        '''
+        Run the commands on the exec channels of the one ssh connection, up to concurrency
+        at once, and return the list of ExecResult in the order of the commands. The output
+        of all the channels is read by one select loop. At timeout seconds the commands which
+        are not ended yet are closed (their exit_status is None).
+        '''
+        results = [None] * len(commands)
+        pending = list(enumerate(commands))
+        running = []
+        deadline = time.monotonic() + timeout if timeout else None
+        try:
+            while pending or running:
+                while pending and len(running) < concurrency:
+                    running.append(self._openExec(*pending.pop(0)))
+
+                wait = EXEC_POLL
+                if deadline is not None:
+                    wait = min(wait, deadline - time.monotonic())
+                    if wait <= 0:
+                        break
+                select.select(running, [], [], wait)
+
+                for execChannel in list(running):
+                    execChannel.drain()
+                    if execChannel.done():
+                        execChannel.drain()
+                        self._execDone(execChannel, results, True)
+                        running.remove(execChannel)
+        finally:
+            for execChannel in running:
+                execChannel.drain()
+                self._execDone(execChannel, results, False)
+        return results
+
+    def _execDone(self, execChannel, results, ended):
+        result = execChannel.finish(ended)
+        results[execChannel.index] = result
+        trace("%s", result)
+        device_log("EXEC RESULT: %s\n%s%s", result, result.stdout, result.stderr, device=self.name or self.ipAddress)
+        if self.metrics is not None:
+            self.metrics.command(command_verb(result.command),
+                                 execChannel.first - execChannel.start if execChannel.first is not None else None,
+                                 result.seconds, len(result.command), execChannel.bytes_in)
+
+    def _sshClient(self):
+        if self.client is None or self.client.get_transport() is None:
+            raise Exception(f"{self.ipAddress}: sftp needs the ssh connection (startSSH)")
+        return self.client
+
+    def put(self, local, remote, resume=True):
+        ''' Copy the local file to the host by SFTP; returns TransferResult '''
+        return self.transfer([(linux_sftp.PUT, local, remote)], 1, resume)[0]
+
+    def get(self, remote, local, resume=True):
+        ''' Copy the remote file from the host by SFTP; returns TransferResult '''
+        return self.transfer([(linux_sftp.GET, remote, local)], 1, resume)[0]
+
+    def transfer(self, jobs, concurrency=linux_sftp.SFTP_CONCURRENCY, resume=True):
+        '''
+        Run the transfers ("put"/"get", source, target) on up to concurrency SFTP sessions
+        at once; returns list of TransferResult (see linux_sftp)
+        '''
+        return linux_sftp.transfer_files(self._sshClient(), jobs, concurrency, resume)
+
+    def sync_dir(self, local_dir, remote_dir, direction=linux_sftp.GET, concurrency=linux_sftp.SFTP_CONCURRENCY,
+                 resume=True):
+        ''' Copy the directory tree from the host ("get") or to the host ("put") '''
+        return linux_sftp.sync_dir(self._sshClient(), local_dir, remote_dir, direction, concurrency, resume)
+
     def toConfig(self):
 
         while self.mode != CONFIG_MODE:
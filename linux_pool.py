@@ -0,0 +1,248 @@
+# GNU GENERAL PUBLIC LICENSE
+# Autor: Aleksey Burger
+
+import time
+import threading
+import logging
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from linux_cli import LinuxCli
+
+logger = logging.getLogger("dtulibLog")
+def trace(format, *args):
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug('\n\x1b[1;94mLinuxPool: ' + format + '\x1b[0m', *args)
+
+def error(format, *args):
+    logger.error('\n\x1b[1;31mLinuxPool: ' + format + '\x1b[0m', *args)
+
+def info(format, *args):
+    if logger.isEnabledFor(logging.INFO):
+        logger.info('\n\x1b[1;92mLinuxPool: ' + format + '\x1b[0m', *args)
+
+STAT_NAMES = ("leases", "connects", "reconnects", "failures", "shells",
+              "handshake_wait", "connect_time", "wait_time", "lease_time")
+
+class _Host:
+    def __init__(self, key, user, password):
+        self.key = key
+        self.user = user
+        self.password = password
+        self.cli = None
+        # connect and the shell lease are exclusive, exec channels are shared
+        self.connect_lock = threading.Lock()
+        self.shell_lock = threading.Lock()
+        self.last_used = 0.0
+        self.stats = dict.fromkeys(STAT_NAMES, 0)
+
+class HostResult:
+    '''
+    Result of the callable run on one host by LinuxPool.run():
+        host    - (ipAddress, port)
+        result  - value returned by the callable (None if it is failed)
+        error   - exception raised by the connect or the callable
+        wait    - seconds spent waiting for the connection (handshake slot and connect)
+        seconds - execution time of the callable
+    '''
+    def __init__(self, host):
+        self.host = host
+        self.result = None
+        self.error = None
+        self.wait = 0.0
+        self.seconds = 0.0
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        ret = f"{self.host[0]}:{self.host[1]} {self.seconds:.2f}s"
+        if self.wait:
+            ret = ret + f" (wait {self.wait:.2f}s)"
+        if self.error is not None:
+            ret = ret + f" FAILED: {type(self.error).__name__}: {self.error}"
+        return ret
+
+class LinuxPool:
+    '''
+    Pool of authenticated ssh connections of LinuxCli hosts keyed by (ipAddress, port).
+    The connection is opened once (startSSH(shell=False)) and kept alive by the ssh
+    keepalive of the transport every 'keepalive' seconds; a connection which is not
+    active is reconnected transparently at the next lease. At most max_handshakes
+    connects (key exchange and authentication) run at once.
+        lease_exec() - the connected LinuxCli for exec_command/exec_batch, shared by
+                       the callers (the exec channels are independent)
+        lease_shell() - the LinuxCli with the interactive shell, exclusive
+        run()        - the callable on many hosts on the thread pool
+    '''
+
+    def __init__(self, user, password, keepalive=30, max_handshakes=10, factory=LinuxCli):
+        self.user = user
+        self.password = password
+        self.keepalive = keepalive
+        self.factory = factory
+        self.hosts = {}
+        self._lock = threading.Lock()
+        self._handshakes = threading.BoundedSemaphore(max_handshakes)
+
+    def __repr__(self):
+        return f"LinuxPool hosts:{len(self.hosts)}"
+
+    def _host(self, ipAddress, port, user, password):
+        key = (ipAddress, port)
+        with self._lock:
+            host = self.hosts.get(key)
+            if not host:
+                host = _Host(key, user or self.user, password or self.password)
+                self.hosts[key] = host
+            return host
+
+    @staticmethod
+    def _active(cli):
+        transport = cli.client.get_transport() if cli.client is not None else None
+        return transport is not None and transport.is_active()
+
+    def _connect(self, host):
+        ''' connected LinuxCli of the host; the connection is opened if it is not active '''
+        with host.connect_lock:
+            if host.cli is not None and self._active(host.cli):
+                return host.cli
+            if host.cli is not None:
+                host.stats["reconnects"] += 1
+                try:
+                    host.cli.end()
+                except Exception:
+                    pass
+                host.cli = None
+            queued = time.monotonic()
+            with self._handshakes:
+                start = time.monotonic()
+                host.stats["handshake_wait"] += start - queued
+                cli = self.factory(host.key[0], host.user, host.password, port=host.key[1])
+                if not cli.startSSH(shell=False):
+                    host.stats["failures"] += 1
+                    raise Exception(f"{host.key[0]}:{host.key[1]}: ssh connect failed")
+            host.stats["connects"] += 1
+            host.stats["connect_time"] += time.monotonic() - start
+            if self.keepalive:
+                cli.client.get_transport().set_keepalive(self.keepalive)
+            host.cli = cli
+            info("%s:%s connected", host.key[0], host.key[1])
+            return cli
+
+    def connect(self, hosts, port=22, max_workers=32):
+        '''
+        Open the connections of the hosts (ipAddress or (ipAddress, port)) in parallel.
+        Returns list of HostResult, the result is the connected LinuxCli.
+        '''
+        return self.run(hosts, lambda cli: cli, port, max_workers)
+
+    @contextmanager
+    def _lease(self, ipAddress, port, user, password):
+        host = self._host(ipAddress, port, user, password)
+        queued = time.monotonic()
+        cli = self._connect(host)
+        start = time.monotonic()
+        host.stats["wait_time"] += start - queued
+        host.stats["leases"] += 1
+        try:
+            yield host, cli
+        finally:
+            host.last_used = time.monotonic()
+            host.stats["lease_time"] += host.last_used - start
+
+    @contextmanager
+    def lease_exec(self, ipAddress, port=22, user=None, password=None):
+        '''
+        Lease the connected LinuxCli for exec_command/exec_batch:
+            with pool.lease_exec(HOST) as cli:
+                print(cli.exec_command("uptime").stdout)
+        '''
+        with self._lease(ipAddress, port, user, password) as (host, cli):
+            yield cli
+
+    @contextmanager
+    def lease_shell(self, ipAddress, port=22, user=None, password=None):
+        '''
+        Lease the LinuxCli with the interactive shell exclusively. The shell channel
+        is opened at the first lease and kept for the next ones.
+        '''
+        host = self._host(ipAddress, port, user, password)
+        queued = time.monotonic()
+        with host.shell_lock:
+            host.stats["wait_time"] += time.monotonic() - queued
+            with self._lease(ipAddress, port, user, password) as (host, cli):
+                if cli.channel is None or cli.channel.closed:
+                    cli.startShell()
+                    host.stats["shells"] += 1
+                yield cli
+
+    def run(self, hosts, func, port=22, max_workers=32, shell=False):
+        '''
+        Call func(cli) for every host (ipAddress or (ipAddress, port)) on the thread pool
+        and return list of HostResult in the order of hosts. cli is leased by lease_exec()
+        or by lease_shell() if shell is True. Exceptions do not stop the other hosts.
+        '''
+        hosts = [host if isinstance(host, tuple) else (host, port) for host in hosts]
+        lease = self.lease_shell if shell else self.lease_exec
+
+        def worker(key):
+            result = HostResult(key)
+            queued = time.monotonic()
+            try:
+                with lease(*key) as cli:
+                    start = time.monotonic()
+                    result.wait = start - queued
+                    try:
+                        result.result = func(cli)
+                    finally:
+                        result.seconds = time.monotonic() - start
+            except Exception as inst:
+                result.error = inst
+                error("%s:%s: %s: %s", key[0], key[1], type(inst).__name__, inst)
+            trace("%s", result)
+            return result
+
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="linux-pool") as executor:
+            results = list(executor.map(worker, hosts))
+
+        failed = len([result for result in results if not result.ok])
+        info("%s hosts in %.2fs, failed %s", len(results), time.monotonic() - start, failed)
+        return results
+
+    def stats(self):
+        '''
+        Returns dict {(ipAddress, port): stats} and 'total' item. The stats are:
+        leases, connects, reconnects, failures, shells (shell channels opened),
+        handshake_wait (waiting for the handshake slot), connect_time, wait_time
+        (waiting for the leased connection or shell), lease_time
+        '''
+        with self._lock:
+            hosts = list(self.hosts.values())
+        ret = {host.key: dict(host.stats) for host in hosts}
+        total = dict.fromkeys(STAT_NAMES, 0)
+        for stats in ret.values():
+            for name in STAT_NAMES:
+                total[name] += stats[name]
+        ret["total"] = total
+        return ret
+
+    def close(self):
+        with self._lock:
+            hosts = list(self.hosts.values())
+            self.hosts = {}
+        for host in hosts:
+            with host.connect_lock:
+                if host.cli is not None:
+                    try:
+                        host.cli.end()
+                    except Exception:
+                        pass
+                    host.cli = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,266 @@
+# GNU GENERAL PUBLIC LICENSE
+# Autor: Aleksey Burger
+
+import os
+import stat
+import time
+import queue
+import errno
+import posixpath
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger("dtulibLog")
+def trace(format, *args):
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug('\n\x1b[1;94mSftp: ' + format + '\x1b[0m', *args)
+
+def error(format, *args):
+    logger.error('\n\x1b[1;31mSftp: ' + format + '\x1b[0m', *args)
+
+def info(format, *args):
+    if logger.isEnabledFor(logging.INFO):
+        logger.info('\n\x1b[1;92mSftp: ' + format + '\x1b[0m', *args)
+
+PUT = "put"
+GET = "get"
+
+# files are copied by blocks of COPY_SIZE; the sftp requests of the block are pipelined
+COPY_SIZE = 1024 * 1024
+SFTP_CONCURRENCY = 4
+# bytes before the resume offset compared in the source and the target: the transfer is
+# resumed only if the target is a partial copy of this source
+RESUME_CHECK_SIZE = 64 * 1024
+
+class TransferResult:
+    '''
+    Result of one file transfer:
+        direction - PUT or GET
+        source, target - paths (local and remote or remote and local)
+        size      - size of the source
+        offset    - the transfer is resumed from the offset (0 - from the start)
+        bytes     - bytes transferred
+        skipped   - the target has the same size and mtime
+        error     - exception of the failed transfer
+    '''
+
+    def __init__(self, direction, source, target):
+        self.direction = direction
+        self.source = source
+        self.target = target
+        self.size = 0
+        self.offset = 0
+        self.bytes = 0
+        self.skipped = False
+        self.error = None
+        self.seconds = 0.0
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    @property
+    def rate(self):
+        ''' bytes per second '''
+        return self.bytes / self.seconds if self.seconds else 0.0
+
+    def __repr__(self):
+        ret = f"{self.direction} {self.source} -> {self.target} {self.bytes}/{self.size} bytes {self.seconds:.2f}s"
+        if self.skipped:
+            ret = ret + " skipped"
+        elif self.offset:
+            ret = ret + f" resumed at {self.offset}"
+        if self.error is not None:
+            ret = ret + f" FAILED: {type(self.error).__name__}: {self.error}"
+        return ret
+
+def resume_offset(source_size, source_mtime, target_size, target_mtime, resume=True):
+    '''
+    Offset to start the copy from: None - the target is the same (size and mtime in
+    seconds), the target size - the target may be the shorter part of the source (resume,
+    checked by _same_prefix), 0 - the whole file
+    '''
+    if target_size is None:
+        return 0
+    if target_size == source_size and int(target_mtime) == int(source_mtime):
+        return None
+    if resume and 0 < target_size < source_size:
+        return target_size
+    return 0
+
+def _remote_stat(sftp, path):
+    try:
+        return sftp.stat(path)
+    except IOError as inst:
+        if inst.errno == errno.ENOENT:
+            return None
+        raise
+
+def _same_prefix(source, target, offset):
+    ''' the last RESUME_CHECK_SIZE bytes before offset are equal in both files '''
+    size = min(RESUME_CHECK_SIZE, offset)
+    source.seek(offset - size)
+    target.seek(offset - size)
+    return source.read(size) == target.read(size)
+
+def _resume(source, target, offset, result):
+    ''' position both files at offset or at 0 (the target is truncated) if the target is not a partial copy '''
+    if offset and not _same_prefix(source, target, offset):
+        trace("%s is not a partial copy of %s: copy from the start", result.target, result.source)
+        offset = 0
+        target.truncate(0)
+    result.offset = offset
+    source.seek(offset)
+    target.seek(offset)
+
+def _copy(source, target, result):
+    while True:
+        data = source.read(COPY_SIZE)
+        if not data:
+            break
+        target.write(data)
+        result.bytes += len(data)
+
+def put_file(sftp, local, remote, resume=True):
+    ''' Copy the local file to the host by the SFTPClient; returns TransferResult '''
+    result = TransferResult(PUT, local, remote)
+    start = time.monotonic()
+    st = os.stat(local)
+    result.size = st.st_size
+    rst = _remote_stat(sftp, remote)
+    offset = resume_offset(st.st_size, st.st_mtime, rst.st_size if rst else None, rst.st_mtime if rst else 0, resume)
+    if offset is None:
+        result.skipped = True
+    else:
+        with open(local, "rb") as source, sftp.open(remote, "r+b" if offset else "wb") as target:
+            _resume(source, target, offset, result)
+            # the writes are not waited for one by one: the statuses are checked at close
+            target.set_pipelined(True)
+            _copy(source, target, result)
+        sftp.utime(remote, (st.st_atime, st.st_mtime))
+    result.seconds = time.monotonic() - start
+    return result
+
+def get_file(sftp, remote, local, resume=True):
+    ''' Copy the remote file to the local one by the SFTPClient; returns TransferResult '''
+    result = TransferResult(GET, remote, local)
+    start = time.monotonic()
+    rst = sftp.stat(remote)
+    result.size = rst.st_size
+    st = os.stat(local) if os.path.exists(local) else None
+    offset = resume_offset(rst.st_size, rst.st_mtime, st.st_size if st else None, st.st_mtime if st else 0, resume)
+    if offset is None:
+        result.skipped = True
+    else:
+        with sftp.open(remote, "rb") as source, open(local, "r+b" if offset else "wb") as target:
+            _resume(source, target, offset, result)
+            # read requests of the rest of the file are sent ahead
+            source.prefetch(rst.st_size)
+            _copy(source, target, result)
+        os.utime(local, (rst.st_atime, rst.st_mtime))
+    result.seconds = time.monotonic() - start
+    return result
+
+def transfer_files(client, jobs, concurrency=SFTP_CONCURRENCY, resume=True):
+    '''
+    Run the transfers (direction, source, target) on up to concurrency SFTP sessions
+    of the paramiko SSHClient at once. Returns list of TransferResult in the order of
+    jobs; a failed transfer does not stop the others.
+    '''
+    sessions = queue.SimpleQueue()
+    opened = []
+    for i in range(max(1, min(concurrency, len(jobs)))):
+        sftp = client.open_sftp()
+        opened.append(sftp)
+        sessions.put(sftp)
+
+    def worker(job):
+        direction, source, target = job
+        sftp = sessions.get()
+        try:
+            if direction == PUT:
+                result = put_file(sftp, source, target, resume)
+            else:
+                result = get_file(sftp, source, target, resume)
+        except Exception as inst:
+            result = TransferResult(direction, source, target)
+            result.error = inst
+            error("%s %s -> %s: %s: %s", direction, source, target, type(inst).__name__, inst)
+        finally:
+            sessions.put(sftp)
+        trace("%s", result)
+        return result
+
+    start = time.monotonic()
+    try:
+        with ThreadPoolExecutor(max_workers=len(opened), thread_name_prefix="sftp") as executor:
+            results = list(executor.map(worker, jobs))
+    finally:
+        for sftp in opened:
+            sftp.close()
+    seconds = time.monotonic() - start
+    total = sum([result.bytes for result in results])
+    info("%s files %s bytes in %.2fs (%.1f MB/s), skipped %s, failed %s", len(results), total, seconds,
+         total / seconds / 1e6 if seconds else 0, len([result for result in results if result.skipped]),
+         len([result for result in results if not result.ok]))
+    return results
+
+def _remote_walk(sftp, directory):
+    ''' (relative directories, relative files) of the remote tree '''
+    dirs = []
+    files = []
+    pending = [""]
+    while pending:
+        relative = pending.pop()
+        for attr in sftp.listdir_attr(posixpath.join(directory, relative) if relative else directory):
+            path = posixpath.join(relative, attr.filename) if relative else attr.filename
+            if stat.S_ISDIR(attr.st_mode):
+                dirs.append(path)
+                pending.append(path)
+            elif stat.S_ISREG(attr.st_mode):
+                files.append(path)
+    return dirs, files
+
+def _local_walk(directory):
+    dirs = []
+    files = []
+    for root, names, filenames in os.walk(directory):
+        relative = os.path.relpath(root, directory)
+        relative = "" if relative == "." else relative
+        dirs.extend([os.path.join(relative, name) for name in names])
+        files.extend([os.path.join(relative, name) for name in filenames])
+    return dirs, files
+
+def _remote_makedirs(sftp, directory):
+    if _remote_stat(sftp, directory) is not None:
+        return
+    parent = posixpath.dirname(directory.rstrip("/"))
+    if parent and parent != directory:
+        _remote_makedirs(sftp, parent)
+    sftp.mkdir(directory)
+
+def sync_dir(client, local_dir, remote_dir, direction=GET, concurrency=SFTP_CONCURRENCY, resume=True):
+    '''
+    Copy the directory tree: GET - remote_dir to local_dir, PUT - local_dir to remote_dir.
+    The files of the same size and mtime are skipped, the shorter ones are resumed.
+    Returns list of TransferResult.
+    '''
+    sftp = client.open_sftp()
+    try:
+        if direction == GET:
+            dirs, files = _remote_walk(sftp, remote_dir)
+            os.makedirs(local_dir, exist_ok=True)
+            for path in dirs:
+                os.makedirs(os.path.join(local_dir, *path.split("/")), exist_ok=True)
+            jobs = [(GET, posixpath.join(remote_dir, path), os.path.join(local_dir, *path.split("/")))
+                    for path in files]
+        else:
+            dirs, files = _local_walk(local_dir)
+            _remote_makedirs(sftp, remote_dir)
+            for path in dirs:
+                _remote_makedirs(sftp, posixpath.join(remote_dir, *path.split(os.sep)))
+            jobs = [(PUT, os.path.join(local_dir, path), posixpath.join(remote_dir, *path.split(os.sep)))
+                    for path in files]
+    finally:
+        sftp.close()
+    return transfer_files(client, jobs, concurrency, resume)
@@ -0,0 +1,133 @@
+# GNU GENERAL PUBLIC LICENSE
+# Autor: Aleksey Burger
+
+import re
+
+PATTERN_ERROR = re.compile(rb'^\%', re.MULTILINE)
+
+class Responce:
+    '''
+    Router responce to one command. It keeps the raw bytes and decodes them lazily.
+    The line-offset index is built once; the body (between the command echo and the
+    trailing prompt) is available as memoryview slice without copy. Views derived
+    from the responce (e.g. parsed tables) are cached with .cached().
+    '''
+
+    def __init__(self, raw, command=None):
+        self.raw = bytes(raw)
+        self.command = command
+        self._text = None
+        self._index = None
+        self._lines = None
+        self._body_lines = None
+        self._cache = {}
+
+    def __repr__(self):
+        return f"Responce '{self.command}' {len(self.raw)} bytes"
+
+    def __str__(self):
+        return self.text
+
+    def __len__(self):
+        return len(self.raw)
+
+    def __contains__(self, item):
+        if isinstance(item, str):
+            item = item.encode("utf-8")
+        return item in self.raw
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = self.raw.decode("utf-8", "replace")
+        return self._text
+
+    @property
+    def line_index(self):
+        ''' offsets of the line starts '''
+        if self._index is None:
+            index = [0]
+            raw = self.raw
+            pos = raw.find(b'\n')
+            while pos >= 0:
+                index.append(pos + 1)
+                pos = raw.find(b'\n', pos + 1)
+            if index[-1] == len(raw) and len(index) > 1:
+                index.pop()
+            self._index = index
+        return self._index
+
+    def line_count(self):
+        return len(self.line_index) if self.raw else 0
+
+    def _line_span(self, i):
+        index = self.line_index
+        start = index[i]
+        end = index[i + 1] if i + 1 < len(index) else len(self.raw)
+        return start, end
+
+    def line(self, i):
+        ''' decoded line i without end of line '''
+        if i < 0:
+            i += self.line_count()
+        start, end = self._line_span(i)
+        return self.raw[start:end].decode("utf-8", "replace").rstrip('\r\n')
+
+    def lines(self):
+        if self._lines is None:
+            self._lines = [self.line(i) for i in range(self.line_count())]
+        return self._lines
+
+    def last_line(self):
+        ''' the last line - usually the router prompt '''
+        if not self.raw:
+            return ''
+        return self.line(-1)
+
+    @property
+    def body_span(self):
+        '''
+        (start, end) offsets of the body: the command echo line and the trailing
+        prompt line (the last line without end of line) are excluded
+        '''
+        count = self.line_count()
+        if not count:
+            return 0, 0
+        first = 0
+        if self.command and count > 1 and self.command.strip() and self.command.strip() in self.line(0):
+            first = 1
+        last = count
+        if not self.raw.endswith(b'\n') and last > first:
+            last -= 1
+        index = self.line_index
+        start = index[first] if first < count else len(self.raw)
+        end = index[last] if last < count else len(self.raw)
+        return start, end
+
+    @property
+    def body(self):
+        ''' memoryview of the body bytes '''
+        start, end = self.body_span
+        return memoryview(self.raw)[start:end]
+
+    def body_lines(self):
+        ''' decoded lines of the body '''
+        if self._body_lines is None:
+            body = bytes(self.body).decode("utf-8", "replace")
+            self._body_lines = [line.rstrip('\r') for line in body.split('\n')]
+            if self._body_lines and not self._body_lines[-1]:
+                self._body_lines.pop()
+        return self._body_lines
+
+    def has_error(self):
+        ''' True if any line starts with '%' '''
+        return PATTERN_ERROR.search(self.raw) is not None
+
+    def cached(self, key, func):
+        '''
+        Return the view derived from the responce by func(self); it is computed once
+            interfaces = router.response.cached("interfaces", parse_interfaces)
+        '''
+        if key not in self._cache:
+            self._cache[key] = func(self)
+        return self._cache[key]
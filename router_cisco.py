@@ -1,27 +1,36 @@
 # GNU GENERAL PUBLIC LICENSE
 # Autor: Aleksey Burger
 
-import telnetlib
 import time
 import re
+import codecs
 import logging
+from contextlib import contextmanager
 from curses import ascii
 from exception_dev import ExceptionDevice
+from responce import Responce
+from telnet_transport import TelnetTransport
+from session_transcript import TranscriptWriter, ReplayTransport
+from device_metrics import DeviceMetrics, command_verb, PASSWORD_VERB
 
 # Configure section "dtulib" in [dtutest]/loggin.conf to manage logging for this module
+# The arguments are formatted only when the record is emitted: trace("RCV: %s", responce)
 logger = logging.getLogger("dtulibLog")
-def trace(format):
-    logger.debug(f'\n\x1b[1;94mCisco: {format}\x1b[0m')
+def trace(format, *args):
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug('\n\x1b[1;94mCisco: ' + format + '\x1b[0m', *args)
 
-def error(format):
-    logger.error(f'\n\x1b[1;31mCisco: {format}\x1b[0m')
+def error(format, *args):
+    logger.error('\n\x1b[1;31mCisco: ' + format + '\x1b[0m', *args)
 
-def info(format):
-    logger.info(f'\n\x1b[1;92mCisco: {format}\x1b[0m')
+def info(format, *args):
+    if logger.isEnabledFor(logging.INFO):
+        logger.info('\n\x1b[1;92mCisco: ' + format + '\x1b[0m', *args)
 
 device_logger = logging.getLogger("deviceLog")
-def device_log(format):
-    device_logger.info(f'{format}')
+def device_log(format, *args, device=None):
+    if device_logger.isEnabledFor(logging.INFO):
+        device_logger.info(format, *args, extra={"device": device})
 
 NONE_MODE = "none"
 EXEC_MODE = "exec"
@@ -30,6 +39,13 @@ CONFIG_MODE = "config"
 CONFIG_DEEP_MODE = "config-deep"
 MODES = [USER_MODE, EXEC_MODE, CONFIG_MODE, CONFIG_DEEP_MODE]
 
+# prompt line of any router at the end of buffer: "name>", "name#" or "name(config-xxx)#"
+PATTERN_ANY_PROMPT = re.compile(rb'(?:^|[\r\n])[^\r\n]*[\w\)][#>] ?$')
+# exec commands which do not change the state shown by the cached show commands
+EXEC_READ_ONLY = ("show", "terminal", "ping", "traceroute", "configure", "enable", "disable", "exit", "end")
+# 'terminal length N' command (abbreviated, with 'do' in config modes)
+PATTERN_TERMINAL_LENGTH = re.compile(r'^\s*(?:do\s+)?term(?:i|in|ina|inal)?\s+len(?:g|gt|gth)?\s+(\d+)\s*$')
+
 def paraseResponce(string) -> (str, str) :
     """
         It gets router responce as parameter 'string', extracts last char that
@@ -78,16 +94,77 @@ class RouterCisco:
         self.password = password
         self.mode = NONE_MODE
         self.repeat = 10
-        self.resp = None
+        self.response = None
+
+        # waitPrompt: overall deadline and the time to wait for a prompt after one <cr>
+        self.prompt_timeout = 10
+        self.probe_timeout = 1
+        self.last_probe_time = None
+        self.wait_prompt_time = 0.0
+        # prompts of the written <cr> probes and exit/Ctrl-Z which are not read yet
+        self.pending_prompts = 0
+        self._prompt_re = None
+        self._prompt_name = None
+        # terminal length sent in this session (None - device default, long outputs are paged by --More--)
+        self.terminal_length = None
+
+        # mode is updated from the prompt at the end of every response. If trust_mode
+        # is True, toConfig/toExec use it and probe the device only when it is unknown
+        self.trust_mode = False
+        self.mode_valid = False
+
+        # config_session: commands in flight. config_batch() queues commands if it is above 1
+        self.pipeline_depth = 1
+        self.session_errors = []
+        self._batch = None
+
+        # interactive path counters: commands and bytes sent/received, round trips (writes
+        # with nothing in flight, prompt probes included) and time spent waiting for responces
+        self.commands_sent = 0
+        self.round_trips = 0
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.io_time = 0.0
+        # per command verb latency histograms, prompt waits and mode transitions
+        # (see device_metrics); None - not collected
+        self.metrics = DeviceMetrics(ipAddress, "cisco")
+
+        # parsed show results cached by command for show_cache_ttl seconds (0 - no cache).
+        # Commands sent in config modes invalidate the entries of their section, exec
+        # commands other than EXEC_READ_ONLY (e.g. 'clear ip bgp *') invalidate all of them
+        self.show_cache_ttl = 0
+        self.show_cache = {}
+        self.cache_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+        self._section = None
+        # attach/is_exist/cisco_get_all_* answer from the running config snapshot
+        self.use_running_config = False
+
+        # transport class (ReplayTransport in replay mode) and TranscriptWriter of the session
+        self.transport_factory = TelnetTransport
+        self.transcript = None
 
         self.name = "<unknown>"
         self.ignore_exception_connection = False
         self.ignore_exception_syntax  = False
 
+    @property
+    def resp(self):
+        ''' text of the last responce (compatibility with code which works with strings) '''
+        if self.response is None:
+            return None
+        return self.response.text
+
+    @resp.setter
+    def resp(self, value):
+        self.response = Responce(value.encode("utf-8")) if value is not None else None
+
     def start(self):
         
         try:
-            self.tn = telnetlib.Telnet(self.ipAddress, self.port)
+            self.tn = self.transport_factory(self.ipAddress, self.port)
+            self.tn.transcript = self.transcript
+            self.pending_prompts = 0
+            self.terminal_length = None
             self.waitPrompt()
             self.toExec()
 
@@ -99,43 +176,125 @@ class RouterCisco:
 
     def end(self):
             self.tn.close()
+            if self.transcript is not None:
+                self.transcript.close()
+                self.transcript = None
+
+    def record(self, path):
+        '''
+        Write the transcript of the session to the file (JSON lines with the sent and
+        received bytes, the commands and the timestamps) from now on until end()
+        '''
+        self.transcript = TranscriptWriter(path, self.name, self.ipAddress, self.port, "telnet")
+        if getattr(self, "tn", None) is not None:
+            self.tn.transcript = self.transcript
+        return self.transcript
+
+    def replay(self, path, speed=None, strict=True):
+        '''
+        The next start() plays the recorded transcript instead of connecting to the device:
+        speed=None - at full speed, 1.0 - at the original timing. With strict=True a command
+        which differs from the recorded one raises ReplayError.
+        '''
+        self.transport_factory = lambda host, port: ReplayTransport(path, speed, strict)
+
+    def _prompt_pattern(self):
+        '''
+        Return compiled prompt pattern of this router. The pattern is compiled once
+        per router name; prompt of any router is matched while the name is unknown.
+        '''
+        if self._prompt_re is None or self._prompt_name != self.name:
+            if self.name in ("<unknown>", "<noname>", ""):
+                self._prompt_re = PATTERN_ANY_PROMPT
+            else:
+                name = re.escape(self.name.encode("utf-8"))
+                self._prompt_re = re.compile(rb'(?:^|[\r\n])' + name + rb'(?:\([\w\-]+\))?[#>] ?$')
+            self._prompt_name = self.name
+        return self._prompt_re
 
     def waitPrompt(self) -> bool:
         ''' 
         Wait for prompt and define mode and name of router. Return True if prompt is found, False if not
         self.mode is set to one of MODES or NONE_MODE if prompt is not found
         self.name is set to router name if prompt is found or <unknown> if not
+        The read returns as soon as the prompt line arrives. The <cr> probe is repeated
+        only if nothing is recognized during self.probe_timeout, up to self.repeat times
+        or until self.prompt_timeout is expired. The prompts of the late probes and
+        exit/Ctrl-Z (pending_prompts) are read out before return, so they are not taken
+        by the next command. The prompts which are not read until self.prompt_timeout
+        are not expected any more (pending_prompts is reset).
         '''
 
         repeat = self.repeat
+        start = time.monotonic()
+        deadline = start + self.prompt_timeout
+        pattern = self._prompt_pattern()
+        probes = 0
 
         while repeat != 0:
+            timeout = min(self.probe_timeout, deadline - time.monotonic())
+            if timeout <= 0:
+                break
             try:
                 # clean input buffer
-                while self.tn.read_very_eager() != b'':
-                    pass
+                while True:
+                    data = self.tn.read_very_eager()
+                    if not data:
+                        break
+                    self.bytes_in += len(data)
+                    self._pending_read(data, pattern)
 
                 # enter empty line - server will return with prompt
-                trace(f"waitPrompt send <cr>")
+                trace("waitPrompt send <cr>")
+                probe_start = time.monotonic()
                 self.tn.write(b'\r')
-                time.sleep(1)
-
-                # read server responce and analyze it
-                trace(f"waitPrompt read")
-                respBin = self.tn.read_eager()
+                probes += 1
+                self.pending_prompts += 1
+                self.round_trips += 1
+                self.bytes_out += 1
+
+                # read server responce until the prompt line and analyze it
+                index, _, respBin = self.tn.expect([pattern], timeout)
+                self.bytes_in += len(respBin)
+                if index >= 0:
+                    self.pending_prompts -= 1
+                    # the prompt may belong to a late probe or exit: read up to the last one
+                    while self.pending_prompts > 0 and deadline > time.monotonic():
+                        found, _, data = self.tn.expect([pattern], deadline - time.monotonic())
+                        self.bytes_in += len(data)
+                        if found < 0:
+                            # the probes were swallowed (--More--, confirm dialog): not wait for them again
+                            self.pending_prompts = 0
+                            break
+                        self.pending_prompts -= 1
+                        respBin = data
+                self.last_probe_time = time.monotonic() - probe_start
+                trace("waitPrompt probe %.3fs read: bin: %s", self.last_probe_time, respBin)
+
+                if index < 0:
+                    # nothing is recognized: fall back to prompt of any router and probe again
+                    trace("waitPrompt no prompt. Try to repeat %s", repeat)
+                    pattern = PATTERN_ANY_PROMPT
+                    repeat -= 1
+                    continue
 
-                resp = ''.join([ c for c in respBin.decode("utf-8") if c.isprintable() ])
-                trace(f"waitPrompt read: bin: {respBin} decode: {resp}")
+                lines = respBin.decode("utf-8", "replace").splitlines()
+                resp = ''.join([ c for c in lines[-1] if c.isprintable() ]) if lines else ''
 
                 self.mode, self.name = paraseResponce(resp)
+                self.mode_valid = self.mode != NONE_MODE
                 # if self.mode not in [USER_MODE, EXEC_MODE] or not self.name.strip():
                 if self.mode == NONE_MODE or not self.name.strip():
-                    trace(f"waitPrompt unexpected mode {self.mode}. Try to repeat {repeat}")
+                    trace("waitPrompt unexpected mode %s. Try to repeat %s", self.mode, repeat)
                     repeat -= 1
                     continue
 
                 # succes
-                trace(f"waitPrompt succ. name: `{self.name}` mode {self.mode}")
+                trace("waitPrompt succ. name: `%s` mode %s", self.name, self.mode)
+                self.wait_prompt_time += time.monotonic() - start
+                if self.metrics is not None:
+                    self.metrics.device = self.name
+                    self.metrics.prompt(time.monotonic() - start, probes, True)
                 return True
 
             except Exception as inst:
@@ -145,25 +304,117 @@ class RouterCisco:
                 error(error_text)    # the exception instance
                 repeat -= 1
 
+        self.mode_valid = False
+        self.pending_prompts = 0
+        self.wait_prompt_time += time.monotonic() - start
+        if self.metrics is not None:
+            self.metrics.prompt(time.monotonic() - start, probes, False)
         return False
 
+    def _write_command(self, data, verb):
+        '''
+        Write the command which leads to unknown mode (exit, Ctrl-Z) and read its responce
+        up to the prompt of the router in any mode, so a late prompt is not taken by the next read
+        '''
+        start = time.monotonic()
+        self.tn.write(data)
+        self.commands_sent += 1
+        self.round_trips += 1
+        self.bytes_out += len(data)
+        self.pending_prompts += 1
+        index, _, respBin = self.tn.expect([self._prompt_pattern()], self.probe_timeout)
+        self.bytes_in += len(respBin)
+        if index >= 0:
+            self.pending_prompts -= 1
+        self._observe(verb, start, len(data), len(respBin))
+
+    def _pending_read(self, data, pattern):
+        ''' count the pending prompts found in the data read out of the buffer '''
+        if self.pending_prompts:
+            found = len([line for line in data.splitlines() if pattern.search(line)])
+            self.pending_prompts = max(0, self.pending_prompts - found)
+
+    def _observe(self, verb, start, bytes_out, bytes_in):
+        ''' add the command written at start and answered now to the metrics '''
+        if self.metrics is None:
+            return
+        end = time.monotonic()
+        first = self.tn.first_byte_time
+        ttfb = first - start if first is not None and first >= start else None
+        self.metrics.command(verb, ttfb, end - start, bytes_out, bytes_in)
+
+    def _verb(self, command):
+        return PASSWORD_VERB if command == self.password else command_verb(command)
+
+    def _transition(self, source, start, steps):
+        ''' add the mode change from source to the current mode to the metrics '''
+        if self.metrics is not None and source is not None and source != self.mode:
+            self.metrics.transition(source, self.mode, time.monotonic() - start, steps)
+
+    def counters(self):
+        ''' interactive path counters as dict '''
+        return {"commands": self.commands_sent, "round_trips": self.round_trips,
+                "bytes_out": self.bytes_out, "bytes_in": self.bytes_in,
+                "io_time": self.io_time, "wait_prompt_time": self.wait_prompt_time}
+
+    def reset_counters(self):
+        self.commands_sent = 0
+        self.round_trips = 0
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.io_time = 0.0
+        self.wait_prompt_time = 0.0
+
+    def _update_mode(self, prompt_line):
+        '''
+        Define mode from the prompt - the last line of the responce. The mode is
+        marked as not valid if the responce is not finished with the router prompt.
+        '''
+        mode, name = paraseResponce(prompt_line) if prompt_line else (NONE_MODE, "")
+        if mode == NONE_MODE or name != self.name:
+            self.mode_valid = False
+            return
+        if mode != self.mode:
+            trace("mode %s -> %s", self.mode, mode)
+        self.mode = mode
+        self.mode_valid = True
+
+    def _is_mode_trusted(self, verify):
+        return self.trust_mode and self.mode_valid and not verify
+
     def toUser(self):
 
         repeat = self.repeat
         if self.mode == NONE_MODE and not self.waitPrompt():
             error("Connection closed!")
             return
+        source = self.mode
+        start = time.monotonic()
         while self.mode != USER_MODE and repeat != 0:
-            self.tn.write(b"exit\n")
+            self._write_command(b"exit\n", "exit")
             self.waitPrompt()
             repeat -= 1
+        self._transition(source, start, self.repeat - repeat)
 
-    def toExec(self):
+    def toExec(self, verify=False):
+        '''
+        Go to exec mode. If trust_mode is set, the device is probed only if the
+        tracked mode is unknown or verify is True.
+        '''
         repeat = self.repeat
+        source = None
+        start = time.monotonic()
+        steps = 0
         while repeat:
-            self.waitPrompt()
+            if not self._is_mode_trusted(verify):
+                self.waitPrompt()
+            verify = False
+            if source is None:
+                source = self.mode
             if self.mode == EXEC_MODE:
+                self._transition(source, start, steps)
                 return
+            steps += 1
             if self.mode == USER_MODE:
                 if len(self.password):
                     self.enterWaitResponce("ena", "assword:")
@@ -172,45 +423,150 @@ class RouterCisco:
                     self.enterWaitResponce("ena", self.name+"#")
                 continue
             if self.mode in [CONFIG_MODE, CONFIG_DEEP_MODE]:
-                self.tn.write(ascii.ctrl('z').encode('utf-8'))
+                if self.trust_mode:
+                    self._enterWaitResponce("end", self.name+"#")
+                else:
+                    self._write_command(ascii.ctrl('z').encode('utf-8'), "^Z")
                 continue
             repeat -= 1
         raise Exception(f"{self.name}:Can't get Exec mode")
 
-    def toConfig(self):
+    def toConfig(self, verify=False):
+        '''
+        Go to config mode. If trust_mode is set, the device is probed only if the
+        tracked mode is unknown or verify is True.
+        '''
         repeat = self.repeat
+        source = None
+        start = time.monotonic()
+        steps = 0
         while repeat:
-            self.waitPrompt()
+            if not self._is_mode_trusted(verify):
+                self.waitPrompt()
+            verify = False
+            if source is None:
+                source = self.mode
             if self.mode == CONFIG_MODE:
+                self._transition(source, start, steps)
                 return
+            steps += 1
             if self.mode == CONFIG_DEEP_MODE:
-                self.tn.write(b"exit\n")
+                if self.trust_mode:
+                    self._enterWaitResponce("exit", ")#")
+                else:
+                    self._write_command(b"exit\n", "exit")
                 continue
             if self.mode == USER_MODE:
                 self.toExec()
                 continue
             if self.mode == EXEC_MODE:
-                self.enterWaitResponce("config term", "(config)#")
+                self._enterWaitResponce("config term", "(config)#")
                 continue
             repeat -= 1
         raise Exception(f"{self.name}: Can't get Config mode")
 
+    def no_paging(self):
+        ''' send 'terminal length 0' once per session, so long outputs are not paged by --More-- '''
+        if self.terminal_length != 0:
+            self.enterExecCommand("terminal length 0")
+
+    def cache_get(self, key):
+        ''' cached value of the key or None if it is absent or expired '''
+        entry = self.show_cache.get(key)
+        if entry and time.monotonic() - entry[0] < self.show_cache_ttl:
+            self.cache_stats["hits"] += 1
+            return entry[1]
+        self.cache_stats["misses"] += 1
+        return None
+
+    def cache_put(self, key, value, scope=None):
+        '''
+        Cache the value. scope is the tuple of config section prefixes (e.g. ("interface",))
+        which invalidate the value; None - any config command invalidates it
+        '''
+        if self.show_cache_ttl:
+            self.show_cache[key] = (time.monotonic(), value, scope)
+
+    def cache_invalidate(self, section=None):
+        '''
+        Drop the entries of the config section (all entries if section is None).
+        The values with .invalidate(section) (e.g. RunningConfig) are notified instead
+        '''
+        for key, (stamp, value, scope) in list(self.show_cache.items()):
+            if section is None or scope is None or any(section.startswith(prefix) for prefix in scope):
+                if hasattr(value, "invalidate"):
+                    value.invalidate(section)
+                else:
+                    del self.show_cache[key]
+                self.cache_stats["invalidations"] += 1
+
+    def _invalidate_exec(self, words):
+        ''' Drop the whole cache by exec command which is not EXEC_READ_ONLY (abbreviations too) '''
+        if not words or not self.show_cache:
+            return
+        verb = words[0].lower()
+        if len(verb) > 1 and any(known.startswith(verb) for known in EXEC_READ_ONLY):
+            return
+        self.cache_invalidate()
+
+    def _invalidate_section(self, command, top_level):
+        '''
+        Invalidate cache by config command. The section is the command itself in
+        the global config mode and in the deeper modes if it starts a global section
+        (interface, router, vrf definition), otherwise the last global command
+        '''
+        words = command.split()
+        if words[:1] == ["do"]:
+            self._invalidate_exec(words[1:])
+            return
+        if not words or words[0] in ("exit", "end"):
+            return
+        if words[0] in ("no", "default"):
+            words = words[1:]
+        switch = words[:1] in (["interface"], ["router"]) or words[:2] == ["vrf", "definition"]
+        if top_level or switch or self._section is None:
+            self._section = ' '.join(words)
+        if self.show_cache:
+            self.cache_invalidate(self._section)
+
+    def _default_expect(self):
+        if self.mode == USER_MODE:
+            return f'{self.name}>'
+        return f'{self.name}#'
 
     def enterWaitResponce(self, command, expect=None):
-            """ enterWaitResponce(command, expect)  sent command and wait expected respoce """
+            """ enterWaitResponce(command, expect)  sent command and wait expected respoce
+                returns Responce (also available as self.response, text as self.resp) """
+            if self._batch is not None and self.mode in [CONFIG_MODE, CONFIG_DEEP_MODE]:
+                self._batch.append((command, expect))
+                return
+            return self._enterWaitResponce(command, expect)
+
+    def _enterWaitResponce(self, command, expect=None):
+            """ send command bypassing config_batch/config_capture """
             if not expect:
-                expect = f'{self.name}'
-                if self.mode == USER_MODE:
-                    expect = expect + ">"
-                else:
-                    expect = expect + "#"
-            device_log(f"{self.name} ENTER: {command} EXPECT: {expect} MODE: {self.mode}")
+                expect = self._default_expect()
+            device_log("%s ENTER: %s EXPECT: %s MODE: %s", self.name, command, expect, self.mode, device=self.name)
+            if self.mode in [CONFIG_MODE, CONFIG_DEEP_MODE]:
+                self._invalidate_section(command, self.mode == CONFIG_MODE)
+            elif self.show_cache:
+                self._invalidate_exec(command.split())
+            if self.transcript is not None:
+                self.transcript.command(command, expect)
             try:
-                command += "\n"
-                trace(f"SEND: {command}  EXPEXT:{expect}")
-                self.tn.write(command.encode("utf-8"))
-                self.resp = self.tn.read_until(expect.encode("utf-8")).decode("utf-8")
-                trace(f"RCV: {self.resp}")
+                trace("SEND: %s  EXPEXT:%s", command, expect)
+                start = time.monotonic()
+                self.tn.write((command + "\n").encode("utf-8"))
+                respBin = self.tn.read_until(expect.encode("utf-8"))
+                self.io_time += time.monotonic() - start
+                self.commands_sent += 1
+                self.round_trips += 1
+                self.bytes_out += len(command) + 1
+                self.bytes_in += len(respBin)
+                self._observe(self._verb(command), start, len(command) + 1, len(respBin))
+                self.response = Responce(respBin, command)
+                trace("RCV: %s", self.response)
+                self._update_mode(self.response.last_line())
             except Exception as inst:
                 error_text = "write error: " + str(type(inst))
                 if not self.ignore_exception_connection:
@@ -218,10 +574,129 @@ class RouterCisco:
                 error(error_text)    # the exception instance
                 return
               
-            device_log(f"RESPONCE: {self.resp}")
-            invalid_input = re.findall(r'^\%',self.resp,re.MULTILINE)
-            if len(invalid_input) and not self.ignore_exception_syntax:
-                raise ExceptionDevice("syntax error", self.resp)
+            device_log("RESPONCE: %s", self.response, device=self.name)
+            if self.response.has_error():
+                if not self.ignore_exception_syntax:
+                    raise ExceptionDevice("syntax error", self.resp)
+                return self.response
+            length = PATTERN_TERMINAL_LENGTH.match(command)
+            if length:
+                self.terminal_length = int(length.group(1))
+            return self.response
+
+    def config_session(self, commands, depth=None, stop_on_error=False):
+            """Send config commands pipelined and return the list of Responce objects.
+
+            Up to `depth` commands (default self.pipeline_depth) are written before
+            the responce of the oldest one is read. The output is split into per-command
+            responces by the expected prompts, so a '%' error is attributed to the
+            command that caused it. The errors are stored in self.session_errors as
+            (index, command, responce) and the first one raises ExceptionDevice.
+
+            Args:
+                commands (list): (command, expect) pairs. The current prompt is expected
+                    if expect is None.
+                depth (int, optional): Maximum number of commands in flight.
+                stop_on_error (bool): Stop sending after the first error. The commands
+                    which are in flight yet are read out.
+            """
+            depth = max(depth or self.pipeline_depth, 1)
+            commands = [(command, expect or self._default_expect()) for command, expect in commands]
+            responces = []
+            written = []
+            self.session_errors = []
+            sent = 0
+            stop = False
+            top_level = self.mode != CONFIG_DEEP_MODE
+            start = time.monotonic()
+            try:
+                while len(responces) < sent or (not stop and sent < len(commands)):
+                    while not stop and sent < len(commands) and sent - len(responces) < depth:
+                        command, expect = commands[sent]
+                        device_log("%s ENTER: %s EXPECT: %s MODE: %s", self.name, command, expect, self.mode,
+                                   device=self.name)
+                        trace("SEND: %s  EXPEXT:%s IN FLIGHT: %s", command, expect, sent - len(responces))
+                        self._invalidate_section(command, top_level)
+                        top_level = expect.endswith("(config)#")
+                        if self.transcript is not None:
+                            self.transcript.command(command, expect)
+                        if sent == len(responces):
+                            self.round_trips += 1
+                        written.append(time.monotonic())
+                        self.tn.write((command + "\n").encode("utf-8"))
+                        self.commands_sent += 1
+                        self.bytes_out += len(command) + 1
+                        sent += 1
+
+                    command, expect = commands[len(responces)]
+                    respBin = self.tn.read_until(expect.encode("utf-8"))
+                    self.bytes_in += len(respBin)
+                    if self.metrics is not None:
+                        # the first byte of a pipelined command is not observed
+                        ttfb = None
+                        if sent == len(responces) + 1 and self.tn.first_byte_time is not None:
+                            ttfb = self.tn.first_byte_time - written[-1]
+                        self.metrics.command(self._verb(command), ttfb, time.monotonic() - written[len(responces)],
+                                             len(command) + 1, len(respBin))
+                    resp = Responce(respBin, command)
+                    trace("RCV: %s", resp)
+                    device_log("RESPONCE: %s", resp, device=self.name)
+                    if resp.has_error():
+                        self.session_errors.append((len(responces), command, resp))
+                        stop = stop_on_error
+                    responces.append(resp)
+            except Exception as inst:
+                error_text = "write error: " + str(type(inst))
+                if not self.ignore_exception_connection:
+                    raise Exception(error_text)
+                error(error_text)    # the exception instance
+                return responces
+            finally:
+                self.io_time += time.monotonic() - start
+
+            self.response = Responce(b''.join([resp.raw for resp in responces]))
+            if responces:
+                self._update_mode(responces[-1].last_line())
+            if self.session_errors and not self.ignore_exception_syntax:
+                index, command, resp = self.session_errors[0]
+                failed = ', '.join([f"'{error[1]}'" for error in self.session_errors])
+                raise ExceptionDevice(f"syntax error in {failed}", str(resp))
+            return responces
+
+    @contextmanager
+    def config_batch(self, stop_on_error=False):
+            """Queue enterWaitResponce() calls and send them by config_session() at exit.
+
+            The batch is used only when self.pipeline_depth is above 1, otherwise the
+            commands are sent one by one as usual. The block must only emit config
+            commands: the responces are not available before the batch is sent.
+            """
+            if self._batch is not None or self.pipeline_depth < 2:
+                yield
+                return
+            self._batch = []
+            try:
+                yield
+                batch = self._batch
+            finally:
+                self._batch = None
+            self.config_session(batch, stop_on_error=stop_on_error)
+
+    @contextmanager
+    def config_capture(self):
+            """Capture config commands instead of sending them to the router.
+
+            Yields the list which collects (command, expect) of every enterWaitResponce()
+            call issued in config modes. Exec commands (e.g. 'show' of the config objects)
+            and mode changes are still executed on the router.
+            """
+            if self._batch is not None:
+                raise Exception(f"{self.name}: config batch is active yet")
+            self._batch = []
+            try:
+                yield self._batch
+            finally:
+                self._batch = None
 
     def enterExecCommand(self, command):
             """Execute an exec-mode command from any mode.
@@ -234,17 +709,87 @@ class RouterCisco:
                 command (str): The exec mode command to execute (e.g. 'show ip int br').
                 expect (str, optional): Explicit expected prompt. If not provided,
                     the default logic of enterWaitResponce() is used.
+            Returns Responce of the command.
             """
 
             # Ensure we know the current mode if it's not set yet
             if self.mode == EXEC_MODE:
-                self.enterWaitResponce(command, '#')
+                return self.enterWaitResponce(command, '#')
             elif self.mode in [CONFIG_MODE, CONFIG_DEEP_MODE]:
-                self.enterWaitResponce(f"do {command}", ')#')
+                return self._enterWaitResponce(f"do {command}", ')#')
             else:
                 # Go to EXEC (enable) and run the command
                 self.toExec()
-                self.enterWaitResponce(command, '#')
+                return self.enterWaitResponce(command, '#')
 
+    def iterExecCommand(self, command, skip_echo=True):
+            """Execute an exec-mode command and yield the lines of the output as they arrive.
 
+            The output is decoded incrementally and only the unfinished line is kept in
+            memory, so huge outputs (e.g. 'show ip bgp', 'show running-config') are
+            processed while they are read. The iteration is finished when the router
+            prompt is detected at the end of the data; self.response is not filled.
+            If the consumer stops the iteration early, the rest of the output is read
+            out up to the prompt. Lines starting with '%' raise ExceptionDevice after
+            the prompt is reached (unless ignore_exception_syntax is set).
 
+            Args:
+                command (str): The exec mode command to execute (e.g. 'show ip bgp').
+                skip_echo (bool): Do not yield the first line - the command echo.
+            """
+            if self.mode in [CONFIG_MODE, CONFIG_DEEP_MODE]:
+                command = f"do {command}"
+            elif self.mode != EXEC_MODE:
+                self.toExec()
+            prompt = self._prompt_pattern()
+            decoder = codecs.getincrementaldecoder("utf-8")("replace")
+
+            device_log("%s ENTER: %s STREAM MODE: %s", self.name, command, self.mode, device=self.name)
+            trace("SEND: %s  STREAM", command)
+            if self.transcript is not None:
+                self.transcript.command(command)
+            self.tn.write((command + "\n").encode("utf-8"))
+            self.commands_sent += 1
+            self.round_trips += 1
+            self.bytes_out += len(command) + 1
+            self.response = None
+            bytes_in = self.bytes_in
+
+            start = self.tn.write_time
+            pending = ''
+            echo = skip_echo
+            errors = []
+            done = False
+            try:
+                while not done:
+                    data = self.tn.read_some()
+                    if not data:
+                        raise EOFError("telnet connection closed")
+                    self.bytes_in += len(data)
+                    lines = (pending + decoder.decode(data)).split('\n')
+                    pending = lines.pop()
+                    done = prompt.search(pending.strip('\r').encode("utf-8")) is not None
+                    for line in lines:
+                        line = line.rstrip('\r')
+                        if echo:
+                            echo = False
+                            continue
+                        if line.startswith('%'):
+                            errors.append(line)
+                        yield line
+            finally:
+                # the consumer stopped iteration: read out the rest of the output
+                while not done:
+                    data = self.tn.read_some()
+                    if not data:
+                        break
+                    self.bytes_in += len(data)
+                    pending = (pending + decoder.decode(data)).split('\n')[-1]
+                    done = prompt.search(pending.strip('\r').encode("utf-8")) is not None
+                self.io_time += time.monotonic() - start
+                self._observe(command_verb(command), start, len(command) + 1, self.bytes_in - bytes_in)
+
+            self._update_mode(pending)
+            device_log("RESPONCE STREAM END: %s", pending, device=self.name)
+            if errors and not self.ignore_exception_syntax:
+                raise ExceptionDevice("syntax error", '\n'.join(errors))
@@ -0,0 +1,457 @@
+# GNU GENERAL PUBLIC LICENSE
+# Autor: Aleksey Burger
+
+import asyncio
+import copy
+import time
+import re
+import logging
+from contextlib import contextmanager
+from exception_dev import ExceptionDevice
+from responce import Responce
+from router_recorder import record_objects
+from router_cisco import paraseResponce, PATTERN_ANY_PROMPT
+from router_cisco import NONE_MODE, EXEC_MODE, USER_MODE, CONFIG_MODE, CONFIG_DEEP_MODE
+from telnet_transport import TelnetFilter, IAC
+
+# The arguments are formatted only when the record is emitted: trace("RCV: %s", responce)
+logger = logging.getLogger("dtulibLog")
+def trace(format, *args):
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug('\n\x1b[1;94mAsyncCisco: ' + format + '\x1b[0m', *args)
+
+def error(format, *args):
+    logger.error('\n\x1b[1;31mAsyncCisco: ' + format + '\x1b[0m', *args)
+
+def info(format, *args):
+    if logger.isEnabledFor(logging.INFO):
+        logger.info('\n\x1b[1;92mAsyncCisco: ' + format + '\x1b[0m', *args)
+
+device_logger = logging.getLogger("deviceLog")
+def device_log(format, *args, device=None):
+    if device_logger.isEnabledFor(logging.INFO):
+        device_logger.info(format, *args, extra={"device": device})
+
+class AsyncRouterCisco:
+    '''
+    asyncio version of RouterCisco. It has the same surface (start, end, waitPrompt,
+    toExec, toConfig, enterWaitResponce, enterExecCommand, config_session, resp)
+    with coroutine methods, so one event loop drives many console sessions.
+    The config classes drive it through the synchronous bridge (see run_config)
+    or, without threads, through the offline recorded commands (see create_config).
+    '''
+
+    def __init__(self, ipAddress, port, user, password):
+        self.ipAddress = ipAddress
+        self.port = port
+        self.password = password
+        self.mode = NONE_MODE
+        self.repeat = 10
+        self.response = None
+
+        self.prompt_timeout = 10
+        self.probe_timeout = 1
+        self.last_probe_time = None
+        self.wait_prompt_time = 0.0
+        # prompts of the written <cr> probes which are not read yet (see RouterCisco.waitPrompt)
+        self.pending_prompts = 0
+        # read timeout of enterWaitResponce (None - wait forever as RouterCisco does)
+        self.timeout = None
+
+        self.trust_mode = False
+        self.mode_valid = False
+        self.pipeline_depth = 1
+        self.session_errors = []
+        self._batch = None
+
+        self.name = "<unknown>"
+        self.ignore_exception_connection = False
+        self.ignore_exception_syntax  = False
+
+        self._reader = None
+        self._writer = None
+        self._buffer = bytearray()
+        self._filter = TelnetFilter()
+        self._loop = None
+
+    def __repr__(self):
+        return f"AsyncRouterCisco {self.name} {self.ipAddress}:{self.port}"
+
+    @property
+    def resp(self):
+        if self.response is None:
+            return None
+        return self.response.text
+
+    @resp.setter
+    def resp(self, value):
+        self.response = Responce(value.encode("utf-8")) if value is not None else None
+
+    async def start(self):
+        try:
+            self._loop = asyncio.get_running_loop()
+            self._reader, self._writer = await asyncio.open_connection(self.ipAddress, self.port)
+            self.pending_prompts = 0
+            await self.waitPrompt()
+            await self.toExec()
+        except Exception as inst:
+            error_text = "start except " + str(type(inst))
+            if not self.ignore_exception_connection:
+                raise Exception(error_text)
+            error(error_text)    # the exception instance
+
+    async def end(self):
+        if self._writer:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except Exception:
+                pass
+            self._writer = None
+
+    def _write(self, data):
+        self._writer.write(data.replace(bytes([IAC]), bytes([IAC, IAC])))
+
+    async def _fill(self):
+        data = await self._reader.read(65536)
+        if not data:
+            raise EOFError("telnet connection closed")
+        data, replies = self._filter.feed(data)
+        if replies:
+            self._writer.write(replies)
+        self._buffer += data
+
+    def _drain(self, pattern):
+        ''' drop data which is received yet; the prompts in it are not pending any more '''
+        if self.pending_prompts:
+            found = len([line for line in bytes(self._buffer).splitlines() if pattern.search(line)])
+            self.pending_prompts = max(0, self.pending_prompts - found)
+        self._buffer.clear()
+
+    async def _read_until(self, expect, timeout=None):
+        ''' read until bytes 'expect' or the end of the regex match if 'expect' is compiled pattern '''
+        async def read():
+            pos = 0
+            while True:
+                if isinstance(expect, bytes):
+                    found = self._buffer.find(expect, max(pos - len(expect), 0))
+                    end = found + len(expect) if found >= 0 else -1
+                else:
+                    match = expect.search(self._buffer)
+                    end = match.end() if match else -1
+                if end >= 0:
+                    data = bytes(self._buffer[:end])
+                    del self._buffer[:end]
+                    return data
+                pos = len(self._buffer)
+                await self._fill()
+        if timeout is None:
+            return await read()
+        return await asyncio.wait_for(read(), timeout)
+
+    def _prompt_pattern(self):
+        if self.name in ("<unknown>", "<noname>", ""):
+            return PATTERN_ANY_PROMPT
+        name = re.escape(self.name.encode("utf-8"))
+        return re.compile(rb'(?:^|[\r\n])' + name + rb'(?:\([\w\-]+\))?[#>] ?$')
+
+    async def waitPrompt(self) -> bool:
+        '''
+        Probe the prompt with <cr>, define mode and name of router. The read returns
+        as soon as the prompt line arrives. The prompts of the late probes still in the
+        stream (pending_prompts) are read out up to self.prompt_timeout before return,
+        so they are not taken by the next command (see RouterCisco.waitPrompt).
+        '''
+        repeat = self.repeat
+        start = time.monotonic()
+        deadline = start + self.prompt_timeout
+        pattern = self._prompt_pattern()
+
+        while repeat != 0:
+            timeout = min(self.probe_timeout, deadline - time.monotonic())
+            if timeout <= 0:
+                break
+            try:
+                self._drain(pattern)
+                trace("%s waitPrompt send <cr>", self.name)
+                probe_start = time.monotonic()
+                self._write(b'\r')
+                self.pending_prompts += 1
+                try:
+                    respBin = await self._read_until(pattern, timeout)
+                except asyncio.TimeoutError:
+                    trace("%s waitPrompt no prompt. Try to repeat %s", self.name, repeat)
+                    pattern = PATTERN_ANY_PROMPT
+                    repeat -= 1
+                    continue
+                self.pending_prompts -= 1
+                # the prompt may belong to a late probe: read up to the last one
+                while self.pending_prompts > 0 and deadline > time.monotonic():
+                    try:
+                        respBin = await self._read_until(pattern, deadline - time.monotonic())
+                    except asyncio.TimeoutError:
+                        # the probes were swallowed (--More--, confirm dialog): not wait for them again
+                        self.pending_prompts = 0
+                        break
+                    self.pending_prompts -= 1
+                self.last_probe_time = time.monotonic() - probe_start
+
+                lines = respBin.decode("utf-8", "replace").splitlines()
+                resp = ''.join([ c for c in lines[-1] if c.isprintable() ]) if lines else ''
+                self.mode, self.name = paraseResponce(resp)
+                self.mode_valid = self.mode != NONE_MODE
+                if self.mode == NONE_MODE or not self.name.strip():
+                    trace("waitPrompt unexpected mode %s. Try to repeat %s", self.mode, repeat)
+                    repeat -= 1
+                    continue
+
+                trace("waitPrompt succ. name: `%s` mode %s in %.3fs", self.name, self.mode, self.last_probe_time)
+                self.wait_prompt_time += time.monotonic() - start
+                return True
+
+            except Exception as inst:
+                error_text = "waitPrompt Exception read: " + str(type(inst))
+                if repeat == 0 and not self.ignore_exception_connection:
+                    raise Exception(error_text)
+                error(error_text)    # the exception instance
+                repeat -= 1
+
+        self.mode_valid = False
+        self.pending_prompts = 0
+        self.wait_prompt_time += time.monotonic() - start
+        return False
+
+    def _update_mode(self, prompt_line):
+        mode, name = paraseResponce(prompt_line) if prompt_line else (NONE_MODE, "")
+        if mode == NONE_MODE or name != self.name:
+            self.mode_valid = False
+            return
+        self.mode = mode
+        self.mode_valid = True
+
+    def _is_mode_trusted(self, verify):
+        return self.trust_mode and self.mode_valid and not verify
+
+    async def toExec(self, verify=False):
+        repeat = self.repeat
+        while repeat:
+            if not self._is_mode_trusted(verify):
+                await self.waitPrompt()
+            verify = False
+            if self.mode == EXEC_MODE:
+                return
+            if self.mode == USER_MODE:
+                if len(self.password):
+                    await self._enterWaitResponce("ena", "assword:")
+                    await self._enterWaitResponce(self.password, self.name+"#")
+                else:
+                    await self._enterWaitResponce("ena", self.name+"#")
+                continue
+            if self.mode in [CONFIG_MODE, CONFIG_DEEP_MODE]:
+                await self._enterWaitResponce("end", self.name+"#")
+                continue
+            repeat -= 1
+        raise Exception(f"{self.name}:Can't get Exec mode")
+
+    async def toConfig(self, verify=False):
+        repeat = self.repeat
+        while repeat:
+            if not self._is_mode_trusted(verify):
+                await self.waitPrompt()
+            verify = False
+            if self.mode == CONFIG_MODE:
+                return
+            if self.mode == CONFIG_DEEP_MODE:
+                await self._enterWaitResponce("exit", ")#")
+                continue
+            if self.mode == USER_MODE:
+                await self.toExec()
+                continue
+            if self.mode == EXEC_MODE:
+                await self._enterWaitResponce("config term", "(config)#")
+                continue
+            repeat -= 1
+        raise Exception(f"{self.name}: Can't get Config mode")
+
+    def _default_expect(self):
+        if self.mode == USER_MODE:
+            return f'{self.name}>'
+        return f'{self.name}#'
+
+    async def enterWaitResponce(self, command, expect=None):
+        """ send command and wait expected respoce. Config commands are queued if a batch is active """
+        if self._batch is not None and self.mode in [CONFIG_MODE, CONFIG_DEEP_MODE]:
+            self._batch.append((command, expect))
+            return
+        return await self._enterWaitResponce(command, expect)
+
+    async def _enterWaitResponce(self, command, expect=None):
+        if not expect:
+            expect = self._default_expect()
+        device_log("%s ENTER: %s EXPECT: %s MODE: %s", self.name, command, expect, self.mode, device=self.name)
+        try:
+            trace("SEND: %s  EXPEXT:%s", command, expect)
+            self._write((command + "\n").encode("utf-8"))
+            self.response = Responce(await self._read_until(expect.encode("utf-8"), self.timeout), command)
+            trace("RCV: %s", self.response)
+            self._update_mode(self.response.last_line())
+        except Exception as inst:
+            error_text = "write error: " + str(type(inst))
+            if not self.ignore_exception_connection:
+                raise Exception(error_text)
+            error(error_text)    # the exception instance
+            return
+
+        device_log("RESPONCE: %s", self.response, device=self.name)
+        if self.response.has_error() and not self.ignore_exception_syntax:
+            raise ExceptionDevice("syntax error", self.resp)
+        return self.response
+
+    async def config_session(self, commands, depth=None, stop_on_error=False):
+        """ pipelined config commands (see RouterCisco.config_session) """
+        depth = max(depth or self.pipeline_depth, 1)
+        commands = [(command, expect or self._default_expect()) for command, expect in commands]
+        responces = []
+        self.session_errors = []
+        sent = 0
+        stop = False
+        try:
+            while len(responces) < sent or (not stop and sent < len(commands)):
+                while not stop and sent < len(commands) and sent - len(responces) < depth:
+                    command, expect = commands[sent]
+                    device_log("%s ENTER: %s EXPECT: %s MODE: %s", self.name, command, expect, self.mode,
+                               device=self.name)
+                    self._write((command + "\n").encode("utf-8"))
+                    sent += 1
+                command, expect = commands[len(responces)]
+                resp = Responce(await self._read_until(expect.encode("utf-8"), self.timeout), command)
+                device_log("RESPONCE: %s", resp, device=self.name)
+                if resp.has_error():
+                    self.session_errors.append((len(responces), command, resp))
+                    stop = stop_on_error
+                responces.append(resp)
+        except Exception as inst:
+            error_text = "write error: " + str(type(inst))
+            if not self.ignore_exception_connection:
+                raise Exception(error_text)
+            error(error_text)    # the exception instance
+            return responces
+
+        self.response = Responce(b''.join([resp.raw for resp in responces]))
+        if responces:
+            self._update_mode(responces[-1].last_line())
+        if self.session_errors and not self.ignore_exception_syntax:
+            index, command, resp = self.session_errors[0]
+            failed = ', '.join([f"'{error[1]}'" for error in self.session_errors])
+            raise ExceptionDevice(f"syntax error in {failed}", str(resp))
+        return responces
+
+    async def enterExecCommand(self, command):
+        """ execute an exec-mode command from any mode (see RouterCisco.enterExecCommand) """
+        if self.mode == EXEC_MODE:
+            return await self._enterWaitResponce(command, '#')
+        elif self.mode in [CONFIG_MODE, CONFIG_DEEP_MODE]:
+            return await self._enterWaitResponce(f"do {command}", ')#')
+        else:
+            await self.toExec()
+            return await self._enterWaitResponce(command, '#')
+
+    @property
+    def sync(self):
+        ''' synchronous RouterCisco surface of this router for the config classes '''
+        return RouterCiscoBridge(self, self._loop)
+
+    async def run_config(self, func, *args, executor=None, **kwargs):
+        '''
+        Run synchronous config code (e.g. CiscoInterface.create) in executor thread.
+        The code should use router.sync as router; the I/O is done in the event loop:
+            await router.run_config(L100.create, router.sync)
+        The default executor of the loop runs up to min(32, cpu + 4) calls at once: give
+        the executor sized for the sessions or use create_config, which needs no thread
+        '''
+        return await self._loop.run_in_executor(executor, lambda: func(*args, **kwargs))
+
+    async def create_config(self, objects):
+        '''
+        Send the commands of .create() of the config objects without a worker thread:
+        the commands of copies of the objects are recorded offline (see router_recorder,
+        the objects see a router without configuration) and sent by config_session.
+        The objects are not attached to the router. Returns the list of Responce
+        '''
+        if not isinstance(objects, (list, tuple)):
+            objects = [objects]
+        memo = {}
+        for obj in objects:
+            if getattr(obj, "router", None) is not None:
+                memo[id(obj.router)] = obj.router
+        recorder = record_objects(copy.deepcopy(list(objects), memo), self.name)
+        await self.toConfig()
+        responces = await self.config_session(recorder.commands())
+        await self.toConfig()
+        return responces
+
+
+class RouterCiscoBridge:
+    '''
+    Synchronous RouterCisco surface over AsyncRouterCisco. It is used by the config
+    classes (CiscoInterface, CiscoBgp, CiscoOspf, ...) which are executed in a worker
+    thread: every call runs the coroutine in the router's event loop and waits for it.
+    It must not be called from the event loop thread.
+    '''
+
+    def __init__(self, router, loop):
+        self.__dict__['router'] = router
+        self.__dict__['loop'] = loop
+
+    def __getattr__(self, name):
+        return getattr(self.router, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.router, name, value)
+
+    def __repr__(self):
+        return f"{self.router}"
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def waitPrompt(self):
+        return self._run(self.router.waitPrompt())
+
+    def toExec(self, verify=False):
+        return self._run(self.router.toExec(verify))
+
+    def toConfig(self, verify=False):
+        return self._run(self.router.toConfig(verify))
+
+    def enterWaitResponce(self, command, expect=None):
+        return self._run(self.router.enterWaitResponce(command, expect))
+
+    def enterExecCommand(self, command):
+        return self._run(self.router.enterExecCommand(command))
+
+    def iterExecCommand(self, command, skip_echo=True):
+        ''' lines of the exec command output; the output is read whole, not streamed '''
+        responce = self.enterExecCommand(command)
+        if not responce:
+            return iter([])
+        if not skip_echo:
+            return iter([responce.line(0)] + responce.body_lines())
+        return iter(responce.body_lines())
+
+    def config_session(self, commands, depth=None, stop_on_error=False):
+        return self._run(self.router.config_session(commands, depth, stop_on_error))
+
+    @contextmanager
+    def config_batch(self, stop_on_error=False):
+        router = self.router
+        if router._batch is not None or router.pipeline_depth < 2:
+            yield
+            return
+        router._batch = []
+        try:
+            yield
+            batch = router._batch
+        finally:
+            router._batch = None
+        self.config_session(batch, stop_on_error=stop_on_error)
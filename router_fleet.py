@@ -0,0 +1,105 @@
+# GNU GENERAL PUBLIC LICENSE
+# Autor: Aleksey Burger
+
+import time
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from exception_dev import ExceptionDevice
+
+logger = logging.getLogger("dtulibLog")
+def trace(format):
+    logger.debug(f'\n\x1b[1;94mFleet: {format}\x1b[0m')
+
+def error(format):
+    logger.error(f'\n\x1b[1;31mFleet: {format}\x1b[0m')
+
+def info(format):
+    logger.info(f'\n\x1b[1;92mFleet: {format}\x1b[0m')
+
+class FleetResult:
+    '''
+    Result of one fleet job:
+        router  - the router of the job
+        job     - config object or callable
+        result  - value returned by the job (None if it is failed)
+        error   - ExceptionDevice or other exception raised by the job
+        wait    - seconds spent waiting for the terminal server slot
+        seconds - execution time of the job
+    '''
+    def __init__(self, router, job):
+        self.router = router
+        self.job = job
+        self.result = None
+        self.error = None
+        self.wait = 0.0
+        self.seconds = 0.0
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    @property
+    def is_device_error(self):
+        return isinstance(self.error, ExceptionDevice)
+
+    def __repr__(self):
+        ret = f"{self.router.name} {self.router.ipAddress}:{self.router.port} {self.seconds:.2f}s"
+        if self.wait:
+            ret = ret + f" (wait {self.wait:.2f}s)"
+        if self.error is not None:
+            ret = ret + f" FAILED: {type(self.error).__name__}: {getattr(self.error, 'message', self.error)}"
+        return ret
+
+def _run_job(router, job):
+    if callable(job):
+        return job(router)
+    return job.create(router)
+
+def run_fleet(jobs, func=None, max_workers=16, per_server=4):
+    '''
+    Apply config jobs to many routers in parallel and return list of FleetResult
+    in the order of jobs.
+        jobs        - list of (router, config_object) or (router, callable) pairs.
+                      config_object.create(router) or callable(router) is called.
+                      If func is given, jobs is the list of routers and func(router)
+                      is called for every router.
+        max_workers - size of the thread pool
+        per_server  - maximum number of concurrent sessions through one terminal
+                      server (routers with the same ipAddress)
+    Jobs of the same router are executed one by one. Exceptions do not stop
+    the other jobs: they are stored in FleetResult.error.
+    '''
+    if func is not None:
+        jobs = [(router, func) for router in jobs]
+
+    server_slots = {}
+    router_locks = {}
+    for router, job in jobs:
+        server_slots.setdefault(router.ipAddress, threading.BoundedSemaphore(per_server))
+        router_locks.setdefault(id(router), threading.Lock())
+
+    def worker(router, job):
+        result = FleetResult(router, job)
+        queued = time.monotonic()
+        with router_locks[id(router)], server_slots[router.ipAddress]:
+            start = time.monotonic()
+            result.wait = start - queued
+            try:
+                result.result = _run_job(router, job)
+            except Exception as inst:
+                result.error = inst
+                error(f"{router.name} {router.ipAddress}:{router.port}: {type(inst).__name__}: {inst}")
+            result.seconds = time.monotonic() - start
+        trace(f"{result}")
+        return result
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fleet") as executor:
+        futures = [executor.submit(worker, router, job) for router, job in jobs]
+        results = [future.result() for future in futures]
+
+    total = time.monotonic() - start
+    failed = len([result for result in results if not result.ok])
+    info(f"{len(results)} jobs in {total:.2f}s (sum of jobs {sum([result.seconds for result in results]):.2f}s), failed {failed}")
+    return results
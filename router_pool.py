@@ -0,0 +1,182 @@
+# GNU GENERAL PUBLIC LICENSE
+# Autor: Aleksey Burger
+
+import time
+import threading
+import logging
+from contextlib import contextmanager
+from router_cisco import RouterCisco, NONE_MODE
+
+logger = logging.getLogger("dtulibLog")
+def trace(format):
+    logger.debug(f'\n\x1b[1;94mPool: {format}\x1b[0m')
+
+def error(format):
+    logger.error(f'\n\x1b[1;31mPool: {format}\x1b[0m')
+
+def info(format):
+    logger.info(f'\n\x1b[1;92mPool: {format}\x1b[0m')
+
+STAT_NAMES = ("leases", "connects", "reconnects", "health_checks", "keepalives", "failures",
+              "wait_time", "lease_time", "connect_time")
+
+class _Session:
+    def __init__(self, key, user, password):
+        self.key = key
+        self.user = user
+        self.password = password
+        self.router = None
+        self.lock = threading.Lock()
+        self.last_used = 0.0
+        self.stats = dict.fromkeys(STAT_NAMES, 0)
+
+class RouterPool:
+    '''
+    Pool of logged-in RouterCisco sessions keyed by (ipAddress, port).
+    lease() hands out the session exclusively. The session is checked with a prompt
+    probe before the lease (if it is idle longer than check_interval) and it is
+    reconnected transparently if the probe fails. The keepalive thread probes idle
+    sessions every 'keepalive' seconds, so exec-timeout of the console never logs out.
+    '''
+
+    def __init__(self, user, password, keepalive=60, check_interval=0, factory=RouterCisco):
+        self.user = user
+        self.password = password
+        self.keepalive = keepalive
+        self.check_interval = check_interval
+        self.factory = factory
+        self.sessions = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        if keepalive:
+            self._thread = threading.Thread(target=self._keepalive, name="router-pool", daemon=True)
+            self._thread.start()
+
+    def __repr__(self):
+        return f"RouterPool sessions:{len(self.sessions)}"
+
+    def _session(self, ipAddress, port, user, password):
+        key = (ipAddress, port)
+        with self._lock:
+            session = self.sessions.get(key)
+            if not session:
+                session = _Session(key, user or self.user, password or self.password)
+                self.sessions[key] = session
+            return session
+
+    def _connect(self, session):
+        if session.router:
+            session.stats["reconnects"] += 1
+            try:
+                session.router.end()
+            except Exception:
+                pass
+            session.router = None
+        start = time.monotonic()
+        router = self.factory(session.key[0], session.key[1], session.user, session.password)
+        router.start()
+        session.stats["connects"] += 1
+        session.stats["connect_time"] += time.monotonic() - start
+        session.router = router
+        info(f"{router.name} {session.key} connected")
+
+    def _check(self, session):
+        ''' cheap prompt probe, returns False if the session has to be reconnected '''
+        session.stats["health_checks"] += 1
+        try:
+            return session.router.waitPrompt() and session.router.mode != NONE_MODE
+        except Exception as inst:
+            error(f"{session.key} health check: {type(inst)}")
+            return False
+
+    @contextmanager
+    def lease(self, ipAddress, port, user=None, password=None):
+        '''
+        Lease logged-in router session:
+            with pool.lease(HOST, 30001) as router:
+                L100.create(router)
+        '''
+        session = self._session(ipAddress, port, user, password)
+        queued = time.monotonic()
+        with session.lock:
+            start = time.monotonic()
+            session.stats["wait_time"] += start - queued
+            session.stats["leases"] += 1
+            try:
+                if not session.router:
+                    self._connect(session)
+                elif start - session.last_used >= self.check_interval and not self._check(session):
+                    self._connect(session)
+            except Exception:
+                session.stats["failures"] += 1
+                session.router = None
+                raise
+            try:
+                yield session.router
+            finally:
+                session.last_used = time.monotonic()
+                session.stats["lease_time"] += session.last_used - start
+
+    def _keepalive(self):
+        while not self._stop.wait(min(self.keepalive, 5)):
+            now = time.monotonic()
+            with self._lock:
+                sessions = list(self.sessions.values())
+            for session in sessions:
+                if not session.router or now - session.last_used < self.keepalive:
+                    continue
+                # the session is leased now - it is alive
+                if not session.lock.acquire(blocking=False):
+                    continue
+                try:
+                    session.stats["keepalives"] += 1
+                    if not self._check(session):
+                        trace(f"{session.key} keepalive failed, reconnect")
+                        self._connect(session)
+                    session.last_used = time.monotonic()
+                except Exception as inst:
+                    session.stats["failures"] += 1
+                    session.router = None
+                    error(f"{session.key} keepalive: {type(inst)}")
+                finally:
+                    session.lock.release()
+
+    def stats(self):
+        '''
+        Returns dict {(ipAddress, port): stats} and 'total' item. The stats are:
+        leases, connects, reconnects, health_checks, keepalives, failures,
+        wait_time (waiting for the leased session), lease_time, connect_time
+        '''
+        with self._lock:
+            sessions = list(self.sessions.values())
+        ret = {session.key: dict(session.stats) for session in sessions}
+        total = dict.fromkeys(STAT_NAMES, 0)
+        for stats in ret.values():
+            for name in STAT_NAMES:
+                total[name] += stats[name]
+        ret["total"] = total
+        return ret
+
+    def close(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            sessions = list(self.sessions.values())
+            self.sessions = {}
+        for session in sessions:
+            with session.lock:
+                if session.router:
+                    try:
+                        session.router.end()
+                    except Exception:
+                        pass
+                    session.router = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
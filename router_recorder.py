@@ -0,0 +1,291 @@
+# GNU GENERAL PUBLIC LICENSE
+# Autor: Aleksey Burger
+
+import re
+import difflib
+import logging
+from contextlib import contextmanager
+from responce import Responce
+from router_cisco import NONE_MODE, EXEC_MODE, USER_MODE, CONFIG_MODE, CONFIG_DEEP_MODE
+
+logger = logging.getLogger("dtulibLog")
+def trace(format):
+    logger.debug(f'\n\x1b[1;94mRecorder: {format}\x1b[0m')
+
+def error(format):
+    logger.error(f'\n\x1b[1;31mRecorder: {format}\x1b[0m')
+
+def info(format):
+    logger.info(f'\n\x1b[1;92mRecorder: {format}\x1b[0m')
+
+# (parent submode, command pattern, submode entered by the command)
+SUBMODES = (
+    ("config", re.compile(r'^interface\s+\S+\.\d+\s*$', re.I), "config-subif"),
+    ("config", re.compile(r'^interface\s+\S+', re.I), "config-if"),
+    ("config", re.compile(r'^ip\s+vrf\s+\S+\s*$'), "config-vrf"),
+    ("config", re.compile(r'^vrf\s+definition\s+\S+\s*$'), "config-vrf"),
+    ("config", re.compile(r'^router\s+\S+'), "config-router"),
+    ("config-router", re.compile(r'^address-family\s+'), "config-router-af"),
+    ("config-vrf", re.compile(r'^address-family\s+'), "config-vrf-af"),
+)
+
+class RecordedCommand:
+    '''
+    Command recorded by RouterRecorder:
+        command - the command text
+        expect  - the prompt expected by the caller
+        prompt  - the prompt after the command in the modeled CLI
+        path    - headers of the config sections where the command is executed,
+                  e.g. ('router bgp 1', 'address-family ipv4 vrf A')
+        section - headers of the config sections after the command
+        config  - True if the command is executed in config modes
+    '''
+    def __init__(self, command, expect, prompt, path, section, config):
+        self.command = command
+        self.expect = expect
+        self.prompt = prompt
+        self.path = path
+        self.section = section
+        self.config = config
+
+    def __repr__(self):
+        return f"{self.prompt:<24} {self.command}"
+
+class RouterRecorder:
+    '''
+    Stand-in for RouterCisco which records the commands instead of sending them.
+    It models the IOS modes and submodes (interface, vrf, router, address-family,
+    'exit', 'end', a global command typed in a submode), so the expected prompts
+    and the section of every command are known. Show commands return empty output:
+    the config objects see a router without configuration.
+    '''
+
+    def __init__(self, name="Router", ipAddress="0.0.0.0", port=0):
+        self.name = name
+        self.ipAddress = ipAddress
+        self.port = port
+        self.mode = EXEC_MODE
+        self.response = None
+        self.records = []
+        self.trust_mode = True
+        self.mode_valid = True
+        self.pipeline_depth = 1
+        self.session_errors = []
+        self.ignore_exception_connection = False
+        self.ignore_exception_syntax = False
+        # stack of (submode, header) of the config sections
+        self._stack = []
+        self._capture = None
+
+    def __repr__(self):
+        return f"RouterRecorder {self.name} {len(self.records)} commands"
+
+    @property
+    def resp(self):
+        if self.response is None:
+            return None
+        return self.response.text
+
+    @property
+    def prompt(self):
+        if self.mode == USER_MODE:
+            return f"{self.name}>"
+        if self.mode == CONFIG_MODE:
+            return f"{self.name}(config)#"
+        if self.mode == CONFIG_DEEP_MODE:
+            return f"{self.name}({self._stack[-1][0]})#"
+        return f"{self.name}#"
+
+    @property
+    def path(self):
+        return tuple([header for submode, header in self._stack])
+
+    def _set_mode(self):
+        if self.mode in [CONFIG_MODE, CONFIG_DEEP_MODE]:
+            self.mode = CONFIG_DEEP_MODE if self._stack else CONFIG_MODE
+
+    def _model(self, command):
+        ''' change the modeled mode by the command '''
+        words = command.split()
+        if not words:
+            return
+        if self.mode in [USER_MODE, EXEC_MODE, NONE_MODE]:
+            if words[0] in ("conf", "config", "configure"):
+                self.mode = CONFIG_MODE
+                self._stack = []
+            elif words[0] in ("ena", "enable"):
+                self.mode = EXEC_MODE
+            return
+        if words[0] == "end":
+            self.mode = EXEC_MODE
+            self._stack = []
+            return
+        if words[0] == "exit":
+            if self._stack:
+                self._stack.pop()
+            else:
+                self.mode = EXEC_MODE
+            self._set_mode()
+            return
+        if words[0] in ("exit-address-family", "exit-vrf"):
+            if self._stack:
+                self._stack.pop()
+            self._set_mode()
+            return
+        if words[0] == "do":
+            return
+        # the submode command is looked up in the current mode and in the parent modes as IOS does
+        for level in range(len(self._stack), -1, -1):
+            parent = self._stack[level - 1][0] if level else "config"
+            for mode, pattern, submode in SUBMODES:
+                if mode == parent and pattern.match(command):
+                    self._stack = self._stack[:level] + [(submode, ' '.join(words))]
+                    self._set_mode()
+                    return
+
+    def _record(self, command, expect):
+        path = self.path
+        config = self.mode in [CONFIG_MODE, CONFIG_DEEP_MODE]
+        self._model(command)
+        record = RecordedCommand(command, expect, self.prompt, path, self.path, config)
+        self.records.append(record)
+        self.response = Responce(f"{command}\r\n{self.prompt}".encode("utf-8"), command)
+        trace(f"{record}")
+        return record
+
+    def start(self):
+        pass
+
+    def end(self):
+        pass
+
+    def waitPrompt(self):
+        return True
+
+    def toUser(self):
+        while self.mode in [CONFIG_MODE, CONFIG_DEEP_MODE]:
+            self._record("end", f"{self.name}#")
+        if self.mode == EXEC_MODE:
+            self._record("disable", f"{self.name}>")
+            self.mode = USER_MODE
+
+    def toExec(self, verify=False):
+        if self.mode in [CONFIG_MODE, CONFIG_DEEP_MODE]:
+            self._record("end", f"{self.name}#")
+        self.mode = EXEC_MODE
+
+    def toConfig(self, verify=False):
+        if self.mode in [USER_MODE, EXEC_MODE, NONE_MODE]:
+            self.mode = EXEC_MODE
+            self._record("config term", "(config)#")
+        while self.mode == CONFIG_DEEP_MODE:
+            self._record("exit", ")#")
+
+    def enterWaitResponce(self, command, expect=None):
+        if self._capture is not None and self.mode in [CONFIG_MODE, CONFIG_DEEP_MODE]:
+            self._capture.append((command, expect))
+        self._record(command, expect)
+        return self.response
+
+    def enterExecCommand(self, command):
+        if self.mode in [CONFIG_MODE, CONFIG_DEEP_MODE]:
+            command = f"do {command}"
+        self._record(command, '#')
+        return self.response
+
+    def iterExecCommand(self, command, skip_echo=True):
+        self.enterExecCommand(command)
+        return iter(())
+
+    def config_session(self, commands, depth=None, stop_on_error=False):
+        return [self.enterWaitResponce(command, expect) for command, expect in commands]
+
+    @contextmanager
+    def config_batch(self, stop_on_error=False):
+        yield
+
+    @contextmanager
+    def config_capture(self):
+        if self._capture is not None:
+            raise Exception(f"{self.name}: config batch is active yet")
+        self._capture = []
+        try:
+            yield self._capture
+        finally:
+            self._capture = None
+
+    def config_records(self):
+        ''' recorded commands executed in config modes '''
+        return [record for record in self.records if record.config]
+
+    def commands(self):
+        '''
+        (command, expect) of the config commands in the order of sending. The list
+        is accepted by config_session() and cisco_render_commands()
+        '''
+        return [(record.command, record.expect) for record in self.config_records()
+                if record.command.split()[:1] not in (["do"], ["end"])]
+
+    def render(self, indent=False):
+        '''
+        Configuration text of the recorded commands (exec and 'do' commands are
+        skipped, one 'end' is at the end). With indent=True the lines are indented
+        by the section depth as in the running config.
+        '''
+        lines = []
+        for record in self.config_records():
+            words = record.command.split()
+            if words[:1] in (["do"], ["end"]):
+                continue
+            if indent:
+                lines.append(' ' * min(len(record.path), len(record.section)) + ' '.join(words))
+            else:
+                lines.append(record.command)
+        return '\n'.join(lines + ['end']) + '\n'
+
+def record_objects(objects, name="Router"):
+    '''
+    Run .create() of the config objects (or callable(router)) against RouterRecorder
+    and return the recorder
+    '''
+    if not isinstance(objects, (list, tuple)):
+        objects = [objects]
+    recorder = RouterRecorder(name)
+    for obj in objects:
+        if callable(obj):
+            obj(recorder)
+        else:
+            obj.create(recorder)
+    recorder.toExec()
+    return recorder
+
+def render_objects(objects, name="Router", indent=False):
+    ''' Configuration text of the config objects rendered without a router '''
+    return record_objects(objects, name).render(indent)
+
+def render_routers(routers, indent=False):
+    '''
+    Render configs of many routers: routers is dict {name: objects} or list of
+    (name, objects) pairs, objects is the list of config objects or callables.
+    Returns dict {name: text}.
+    '''
+    if isinstance(routers, dict):
+        routers = routers.items()
+    ret = {}
+    for name, objects in routers:
+        ret[name] = render_objects(objects, name, indent)
+    return ret
+
+def diff_configs(old, new, name="", context=3):
+    '''
+    Unified diff of two rendered configs (text) or of two render_routers() results
+    (dict {name: text}; the routers which are present in one of them only are
+    compared with the empty config). Returns the diff text, empty if they are equal.
+    '''
+    if isinstance(old, dict) or isinstance(new, dict):
+        old = old or {}
+        new = new or {}
+        names = list(old.keys()) + [key for key in new.keys() if key not in old]
+        return ''.join([diff_configs(old.get(key, ''), new.get(key, ''), key, context) for key in names])
+    return ''.join(difflib.unified_diff(old.splitlines(True), new.splitlines(True),
+                                        f"{name} old", f"{name} new", n=context))
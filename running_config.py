@@ -0,0 +1,250 @@
+# GNU GENERAL PUBLIC LICENSE
+# Autor: Aleksey Burger
+
+import re
+import time
+import logging
+
+logger = logging.getLogger("dtulibLog")
+def trace(format):
+    logger.debug(f'\n\x1b[1;94mRunningConfig: {format}\x1b[0m')
+
+def error(format):
+    logger.error(f'\n\x1b[1;31mRunningConfig: {format}\x1b[0m')
+
+def info(format):
+    logger.info(f'\n\x1b[1;92mRunningConfig: {format}\x1b[0m')
+
+# indexed section types: the global ones and the nested ones (indexed in the parent)
+SECTION_TYPES = ("interface", "ip vrf", "vrf definition", "router bgp", "router ospf", "mpls ldp")
+NESTED_TYPES = ("address-family",)
+# the names of these types are case insensitive (stored in lower case)
+LOWER_NAME_TYPES = ("interface",)
+
+SKIP_LINES = re.compile(r'^(Building configuration|Current configuration|!|end\s*$)')
+IOS_REGEX_SPECIAL = set('.*+?^$[]()|\\_')
+
+# show cache key of the snapshot
+CACHE_RUNNING_CONFIG = "running-config"
+# dirty sections re-fetched by one 'show running-config | section' command
+SECTION_CHUNK = 16
+
+def split_header(line, types=SECTION_TYPES):
+    ''' returns (type, name) of the section header line or (None, None) '''
+    words = line.split()
+    for stype in types:
+        prefix = stype.split()
+        if words[:len(prefix)] == prefix and len(words) >= len(prefix):
+            name = ' '.join(words[len(prefix):])
+            if stype in LOWER_NAME_TYPES:
+                name = name.lower()
+            return stype, name
+    return None, None
+
+class ConfigSection:
+    '''
+    Line of the running config with its sub-lines. Nested sections of
+    NESTED_TYPES (e.g. address-family) are indexed by (type, name).
+    '''
+    def __init__(self, line, parent=None, indent=0):
+        self.line = line.strip()
+        self.parent = parent
+        self.indent = indent
+        self.children = []
+        self.type, self.name = split_header(self.line, NESTED_TYPES if parent and parent.parent else SECTION_TYPES)
+        self._index = {}
+
+    def __repr__(self):
+        return f"ConfigSection '{self.line}' {len(self.children)} lines"
+
+    def __contains__(self, line):
+        line = ' '.join(line.split())
+        return any(' '.join(child.line.split()) == line for child in self.children)
+
+    def add(self, child):
+        self.children.append(child)
+        if child.type:
+            self._index[(child.type, child.name)] = child
+
+    def remove(self, child):
+        self.children.remove(child)
+        if child.type:
+            self._index.pop((child.type, child.name), None)
+
+    def find(self, stype, name):
+        if stype in LOWER_NAME_TYPES:
+            name = name.lower()
+        return self._index.get((stype, ' '.join(name.split())))
+
+    def sections(self, stype):
+        return [child for child in self.children if child.type == stype]
+
+    @property
+    def commands(self):
+        ''' lines of the section (first level) '''
+        return [child.line for child in self.children]
+
+    def text(self):
+        lines = [' ' * self.indent + self.line] if self.parent else []
+        for child in self.children:
+            lines.append(child.text())
+        return '\n'.join(lines)
+
+def parse_running_config(lines):
+    ''' build ConfigSection tree (root without line) from the running config lines '''
+    root = ConfigSection("")
+    stack = [root]
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if not line.strip() or SKIP_LINES.match(line.strip()):
+            continue
+        indent = len(line) - len(line.lstrip(' '))
+        while len(stack) > 1 and indent <= stack[-1].indent:
+            stack.pop()
+        section = ConfigSection(line, stack[-1], indent)
+        stack[-1].add(section)
+        stack.append(section)
+    return root
+
+def _ios_regex(stype, name):
+    ''' IOS regex of the section header; the case insensitive names match any case '''
+    ret = [stype, ' ']
+    for char in name:
+        if stype in LOWER_NAME_TYPES and char.isalpha():
+            ret.append(f"[{char.upper()}{char.lower()}]")
+        elif char in IOS_REGEX_SPECIAL:
+            ret.append('\\' + char)
+        else:
+            ret.append(char)
+    return ''.join(ret)
+
+class RunningConfig:
+    '''
+    Snapshot of 'show running-config' parsed to ConfigSection tree and indexed by
+    section type and name. The snapshot is kept in the router show cache: config
+    commands mark their sections dirty (see RouterCisco.cache_invalidate) and the
+    dirty sections are re-fetched with 'show running-config | section' on the next
+    access instead of the whole config. Commands outside of the indexed sections
+    make the next access refresh the whole snapshot.
+    '''
+
+    def __init__(self, router=None, lines=None):
+        self.router = router
+        self.root = None
+        self.fetch_time = None
+        self.fetches = 0
+        self._dirty = set()
+        self._stale = False
+        if lines is not None:
+            self._load(lines)
+        elif router is not None:
+            self.refresh()
+
+    def __repr__(self):
+        count = len(self.root.children) if self.root else 0
+        return f"RunningConfig {getattr(self.router, 'name', '')} {count} lines dirty:{len(self._dirty)}"
+
+    def _show(self, command):
+        self.fetches += 1
+        if hasattr(self.router, "no_paging"):
+            self.router.no_paging()
+        if hasattr(self.router, "iterExecCommand"):
+            return list(self.router.iterExecCommand(command))
+        responce = self.router.enterExecCommand(command)
+        return responce.body_lines() if responce else []
+
+    def _load(self, lines):
+        self.root = parse_running_config(lines)
+        self.fetch_time = time.monotonic()
+        self._dirty = set()
+        self._stale = False
+
+    def refresh(self):
+        ''' fetch the whole running config '''
+        start = time.monotonic()
+        self._load(self._show("show running-config"))
+        trace(f"{self} fetched in {time.monotonic() - start:.2f}s")
+
+    def refresh_section(self, stype, name):
+        ''' re-fetch one section with 'show running-config | section' '''
+        self._dirty.add((stype, name.lower() if stype in LOWER_NAME_TYPES else name))
+        self._update()
+
+    def invalidate(self, section=None):
+        '''
+        Mark the section of the config command (e.g. 'interface loopback100') dirty.
+        Called by RouterCisco.cache_invalidate
+        '''
+        if section is None:
+            self._stale = True
+            return
+        stype, name = split_header(section)
+        if stype and name:
+            self._dirty.add((stype, name))
+        else:
+            self._stale = True
+
+    def _update(self):
+        if self._stale:
+            self.refresh()
+            return
+        dirty = sorted(self._dirty)
+        self._dirty = set()
+        for pos in range(0, len(dirty), SECTION_CHUNK):
+            chunk = dirty[pos:pos + SECTION_CHUNK]
+            regex = '|'.join([_ios_regex(stype, name) for stype, name in chunk])
+            fetched = parse_running_config(self._show(f"show running-config | section ^({regex})$"))
+            for stype, name in chunk:
+                self._replace(self.root.find(stype, name), fetched.find(stype, name))
+            trace(f"{self} re-fetched {chunk}")
+
+    def _replace(self, old, new):
+        children = self.root.children
+        if new:
+            new.parent = self.root
+        if old and new:
+            children[children.index(old)] = new
+        elif old:
+            children.remove(old)
+        elif new:
+            children.append(new)
+        if old:
+            del self.root._index[(old.type, old.name)]
+        if new:
+            self.root._index[(new.type, new.name)] = new
+
+    def _current(self):
+        if self.router is not None and (self._stale or self._dirty):
+            self._update()
+        return self.root
+
+    def tree(self):
+        ''' root ConfigSection of the current snapshot '''
+        return self._current()
+
+    def find(self, stype, name):
+        ''' ConfigSection of the type and name or None '''
+        return self._current().find(stype, name)
+
+    def sections(self, stype):
+        return self._current().sections(stype)
+
+    def names(self, stype):
+        return [section.name for section in self.sections(stype)]
+
+    def text(self):
+        return self._current().text()
+
+def cisco_running_config(router, refresh=False):
+    '''
+    Returns RunningConfig snapshot of the router. It is fetched once and kept
+    in the router show cache (show_cache_ttl)
+    '''
+    snapshot = None
+    if not refresh and hasattr(router, "cache_get"):
+        snapshot = router.cache_get(CACHE_RUNNING_CONFIG)
+    if snapshot is None:
+        snapshot = RunningConfig(router)
+        if hasattr(router, "cache_put"):
+            router.cache_put(CACHE_RUNNING_CONFIG, snapshot, None)
+    return snapshot
@@ -0,0 +1,145 @@
+# GNU GENERAL PUBLIC LICENSE
+# Autor: Aleksey Burger
+
+import os
+import re
+import queue
+import atexit
+import logging
+import logging.handlers
+
+# the loggers of loggin.conf which are moved to the queue
+QUEUE_LOGGERS = ("", "testLog", "dtulibLog", "deviceLog")
+DEVICE_LOGGER = "deviceLog"
+
+TRANSCRIPT_FORMAT = "%(asctime)s %(message)s"
+TRANSCRIPT_MAX_BYTES = 10 * 1024 * 1024
+TRANSCRIPT_BACKUP_COUNT = 5
+# records kept in memory per device before they are written to the file
+TRANSCRIPT_CAPACITY = 256
+
+_listener = None
+
+class _RouteQueueHandler(logging.handlers.QueueHandler):
+    '''
+    Puts (handlers, record) to the queue. The record is not formatted here: the message
+    and its arguments are formatted by the listener thread only if a handler emits it
+    '''
+
+    def __init__(self, log_queue, handlers):
+        logging.handlers.QueueHandler.__init__(self, log_queue)
+        self.handlers = handlers
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        self.queue.put_nowait((self.handlers, record))
+
+class _RouteQueueListener(logging.handlers.QueueListener):
+    ''' Passes every record to the handlers of the logger which has taken it '''
+
+    def handle(self, item):
+        handlers, record = item
+        for handler in handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+def _file_name(device):
+    return re.sub(r'[^\w\-.]', '_', device) or "unknown"
+
+class DeviceTranscriptHandler(logging.Handler):
+    '''
+    Writes the records of every device to its own rotating file directory/<device>.log.
+    The device is taken from the record attribute "device" (device_log(..., device=name)).
+    The records are buffered in memory up to capacity records (ERROR records and close()
+    flush them), so the files are written in large blocks.
+    '''
+
+    def __init__(self, directory, max_bytes=TRANSCRIPT_MAX_BYTES, backup_count=TRANSCRIPT_BACKUP_COUNT,
+                 capacity=TRANSCRIPT_CAPACITY):
+        logging.Handler.__init__(self)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.capacity = capacity
+        self.devices = {}
+        self.setFormatter(logging.Formatter(TRANSCRIPT_FORMAT))
+        os.makedirs(directory, exist_ok=True)
+
+    def _device_handler(self, device):
+        handler = self.devices.get(device)
+        if handler is None:
+            target = logging.handlers.RotatingFileHandler(os.path.join(self.directory, _file_name(device) + ".log"),
+                                                          maxBytes=self.max_bytes, backupCount=self.backup_count,
+                                                          encoding="utf-8")
+            target.setFormatter(self.formatter)
+            handler = logging.handlers.MemoryHandler(self.capacity, logging.ERROR, target)
+            self.devices[device] = handler
+        return handler
+
+    def emit(self, record):
+        self._device_handler(str(getattr(record, "device", None) or "unknown")).handle(record)
+
+    def flush(self):
+        for handler in self.devices.values():
+            handler.flush()
+
+    def close(self):
+        for handler in self.devices.values():
+            target = handler.target
+            handler.close()
+            target.close()
+        self.devices = {}
+        logging.Handler.close(self)
+
+def start_queue_logging(loggers=QUEUE_LOGGERS, transcripts=None, max_bytes=TRANSCRIPT_MAX_BYTES,
+                        backup_count=TRANSCRIPT_BACKUP_COUNT, capacity=TRANSCRIPT_CAPACITY):
+    '''
+    Move the handlers of the loggers (configured by loggin.conf) to the background
+    listener thread: the logger calls only put the record to the queue, the formatting
+    and the file/console I/O are done by the listener. If transcripts is the directory,
+    the device output is also written to the per device files (DeviceTranscriptHandler).
+    Returns the listener; stop_queue_logging() restores the handlers.
+    '''
+    global _listener
+    if _listener is not None:
+        return _listener
+    log_queue = queue.SimpleQueue()
+    listener = _RouteQueueListener(log_queue)
+    listener.routes = {}
+    for name in loggers:
+        logger = logging.getLogger(name)
+        handlers = list(logger.handlers)
+        if name == DEVICE_LOGGER and transcripts:
+            handlers.append(DeviceTranscriptHandler(transcripts, max_bytes, backup_count, capacity))
+        if not handlers:
+            continue
+        listener.routes[name] = handlers
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+        logger.addHandler(_RouteQueueHandler(log_queue, handlers))
+    listener.start()
+    _listener = listener
+    atexit.register(stop_queue_logging)
+    return listener
+
+def stop_queue_logging():
+    ''' Write out the queued records and give the handlers back to the loggers '''
+    global _listener
+    listener = _listener
+    if listener is None:
+        return
+    _listener = None
+    listener.stop()
+    for name, handlers in listener.routes.items():
+        logger = logging.getLogger(name)
+        for handler in list(logger.handlers):
+            if isinstance(handler, _RouteQueueHandler):
+                logger.removeHandler(handler)
+        for handler in handlers:
+            if isinstance(handler, DeviceTranscriptHandler):
+                handler.close()
+            else:
+                handler.flush()
+                logger.addHandler(handler)
@@ -0,0 +1,299 @@
+# GNU GENERAL PUBLIC LICENSE
+# Autor: Aleksey Burger
+
+import json
+import time
+import logging
+from telnet_transport import TelnetTransport
+
+logger = logging.getLogger("dtulibLog")
+def trace(format):
+    logger.debug(f'\n\x1b[1;94mTranscript: {format}\x1b[0m')
+
+def error(format):
+    logger.error(f'\n\x1b[1;31mTranscript: {format}\x1b[0m')
+
+def info(format):
+    logger.info(f'\n\x1b[1;92mTranscript: {format}\x1b[0m')
+
+# events of the byte stream; the other events ("command", "close") are annotations
+STREAM_EVENTS = ("send", "recv")
+
+class ReplayError(Exception):
+    pass
+
+def _to_bytes(data):
+    if isinstance(data, str):
+        return data.encode("utf-8")
+    return bytes(data)
+
+class TranscriptWriter:
+    '''
+    JSON lines transcript of one device session. The first line is the header
+    {"type": "session", "device", "host", "port", "kind", "time"}, the next ones
+    are the events {"t": seconds from the start, "type": ...}:
+        send    - "data" written to the device
+        recv    - "data" received from the device (telnet IAC sequences removed)
+        command - "command" and "expect" of the command sent by the session class
+        close   - end of the session
+    The data bytes are stored as latin-1 strings, so they are kept exactly.
+    '''
+
+    def __init__(self, path, device="", host="", port=0, kind="telnet"):
+        self.path = path
+        self.events = 0
+        self.start = time.monotonic()
+        self._file = open(path, "w", encoding="utf-8")
+        self._write({"type": "session", "device": device, "host": host, "port": port, "kind": kind,
+                     "time": time.strftime("%Y-%m-%dT%H:%M:%S")})
+
+    def __repr__(self):
+        return f"TranscriptWriter {self.path} {self.events} events"
+
+    def _write(self, record):
+        self._file.write(json.dumps(record) + "\n")
+
+    def _event(self, etype, **fields):
+        if self._file is None:
+            return
+        record = {"t": round(time.monotonic() - self.start, 6), "type": etype}
+        record.update(fields)
+        self._write(record)
+        self.events += 1
+
+    def send(self, data):
+        self._event("send", data=_to_bytes(data).decode("latin-1"))
+
+    def recv(self, data):
+        self._event("recv", data=_to_bytes(data).decode("latin-1"))
+
+    def command(self, command, expect=None):
+        self._event("command", command=command, expect=expect)
+
+    def close(self):
+        if self._file is None:
+            return
+        self._event("close")
+        self._file.close()
+        self._file = None
+        trace(f"{self} closed")
+
+def load_transcript(path):
+    '''
+    Returns (header, events) of the transcript file; the data of the
+    send/recv events is converted to bytes
+    '''
+    header = {}
+    events = []
+    with open(path, encoding="utf-8") as file:
+        for num, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as inst:
+                raise ReplayError(f"{path}:{num}: {inst}")
+            if record.get("type") == "session":
+                header = record
+                continue
+            if "data" in record:
+                record["data"] = record["data"].encode("latin-1")
+            events.append(record)
+    return header, events
+
+def transcript_commands(path):
+    ''' (command, expect) of the commands recorded in the transcript '''
+    header, events = load_transcript(path)
+    return [(event["command"], event.get("expect")) for event in events if event["type"] == "command"]
+
+class _ReplayStream:
+    '''
+    Recorded byte stream played as the device: after every write the data which
+    the device sent after the recorded write becomes available. speed=None plays
+    at full speed, speed=1.0 at the original timing (2.0 - twice faster).
+    The written data is compared with the recorded one: ReplayError is raised on
+    mismatch if strict is set, otherwise it is logged.
+    '''
+
+    def __init__(self, events, speed=None, strict=True, name=""):
+        self.events = [event for event in events if event["type"] in STREAM_EVENTS]
+        self.speed = speed
+        self.strict = strict
+        self.name = name
+        self.pos = 0
+        self.mismatches = 0
+        self._base = None
+
+    @property
+    def ended(self):
+        return self.pos >= len(self.events)
+
+    def _next(self, etype):
+        if self.ended or self.events[self.pos]["type"] != etype:
+            return None
+        return self.events[self.pos]
+
+    def _due(self, event):
+        ''' seconds to wait for the event at the original timing '''
+        if not self.speed:
+            return 0
+        if self._base is None:
+            self._base = time.monotonic() - event["t"] / self.speed
+        return max(0.0, self._base + event["t"] / self.speed - time.monotonic())
+
+    def send(self, data):
+        '''
+        Take the write; returns the device data which was received before the
+        write in the recorded session (it is available to the reader yet)
+        '''
+        data = _to_bytes(data)
+        pending = []
+        while self._next("recv"):
+            pending.append(self.events[self.pos]["data"])
+            self.pos += 1
+        event = self._next("send")
+        if event is None:
+            raise ReplayError(f"{self.name}: write {data!r} after the end of the transcript")
+        self.pos += 1
+        if event["data"] != data:
+            self.mismatches += 1
+            text = f"{self.name}: event {self.pos}: written {data!r}, recorded {event['data']!r}"
+            if self.strict:
+                raise ReplayError(text)
+            error(text)
+        if self.speed:
+            # the timing is synchronized on every write
+            self._base = time.monotonic() - event["t"] / self.speed
+        return b''.join(pending)
+
+    def recv(self, timeout=None):
+        '''
+        The next chunk of the device data or None if the device sends nothing more
+        before the next write (the reader waits for timeout as with the device)
+        '''
+        event = self._next("recv")
+        if event is None:
+            if timeout is None and not self.ended:
+                raise ReplayError(f"{self.name}: event {self.pos}: the read waits for data which is not recorded")
+            if timeout and not self.ended:
+                time.sleep(timeout)
+            return None
+        wait = self._due(event)
+        if timeout is not None and wait > timeout:
+            time.sleep(timeout)
+            return None
+        if wait:
+            time.sleep(wait)
+        self.pos += 1
+        return event["data"]
+
+    def ready(self):
+        event = self._next("recv")
+        return event is not None and self._due(event) == 0
+
+class ReplayTransport(TelnetTransport):
+    '''
+    TelnetTransport which plays the recorded transcript instead of a socket, so
+    RouterCisco and the config classes run against a recorded session without a
+    device (see RouterCisco.replay()).
+    '''
+
+    def __init__(self, path, speed=None, strict=True):
+        TelnetTransport.__init__(self)
+        self.path = path
+        self.header, events = load_transcript(path)
+        self.host = self.header.get("host")
+        self.port = self.header.get("port")
+        self.stream = _ReplayStream(events, speed, strict, path)
+
+    def __repr__(self):
+        return f"ReplayTransport {self.path} {self.stream.pos}/{len(self.stream.events)}"
+
+    def open(self, host, port=23, timeout=None):
+        pass
+
+    def fileno(self):
+        raise ReplayError("replay transport has no file descriptor")
+
+    def close(self):
+        self.eof = True
+
+    def write(self, buffer):
+        if self.transcript is not None:
+            self.transcript.send(buffer)
+        self.write_time = time.monotonic()
+        self.first_byte_time = None
+        self._buffer += self.stream.send(buffer)
+
+    def _fill(self, timeout):
+        if self.eof:
+            return False
+        data = self.stream.recv(timeout)
+        if data is None:
+            if self.stream.ended:
+                self.eof = True
+            return False
+        if self.first_byte_time is None:
+            self.first_byte_time = time.monotonic()
+        if self.transcript is not None:
+            self.transcript.recv(data)
+        self._buffer += data
+        return True
+
+class RecordingChannel:
+    '''
+    Wrapper of the paramiko channel which writes send/recv to the transcript.
+    The other attributes are taken from the channel.
+    '''
+
+    def __init__(self, channel, transcript):
+        self.channel = channel
+        self.transcript = transcript
+
+    def __getattr__(self, name):
+        return getattr(self.channel, name)
+
+    def send(self, data):
+        self.transcript.send(data)
+        return self.channel.send(data)
+
+    def recv(self, size):
+        data = self.channel.recv(size)
+        if data:
+            self.transcript.recv(data)
+        return data
+
+class ReplayChannel:
+    '''
+    Stand-in for the paramiko shell channel of LinuxCli which plays the recorded
+    transcript (see LinuxCli.replay())
+    '''
+
+    def __init__(self, path, speed=None, strict=True):
+        self.path = path
+        self.header, events = load_transcript(path)
+        self.stream = _ReplayStream(events, speed, strict, path)
+        self.closed = False
+        self._buffer = bytearray()
+
+    def __repr__(self):
+        return f"ReplayChannel {self.path} {self.stream.pos}/{len(self.stream.events)}"
+
+    def send(self, data):
+        self._buffer += self.stream.send(data)
+        return len(data)
+
+    def recv_ready(self):
+        return bool(self._buffer) or self.stream.ready()
+
+    def recv(self, size):
+        if not self._buffer:
+            data = self.stream.recv(0)
+            if data:
+                self._buffer += data
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def close(self):
+        self.closed = True
@@ -0,0 +1,351 @@
+# GNU GENERAL PUBLIC LICENSE
+# Autor: Aleksey Burger
+
+import re
+import logging
+
+logger = logging.getLogger("dtulibLog")
+def trace(format):
+    logger.debug(f'\n\x1b[1;94mShowParser: {format}\x1b[0m')
+
+def error(format):
+    logger.error(f'\n\x1b[1;31mShowParser: {format}\x1b[0m')
+
+def info(format):
+    logger.info(f'\n\x1b[1;92mShowParser: {format}\x1b[0m')
+
+VALUE_OPTIONS = ("Filldown", "Required", "List", "Int", "Lower")
+LINE_ACTIONS = ("Next", "Continue")
+RECORD_ACTIONS = ("Record", "NoRecord", "Clear", "Clearall")
+
+PATTERN_VALUE = re.compile(r'^Value\s+(?:([\w,]+)\s+)?(\w+)\s+(\(.*\))\s*$')
+PATTERN_RULE = re.compile(r'^\s+(\^.*?)(?:\s+->\s+(.*))?$')
+PATTERN_STATE = re.compile(r'^(\w+)\s*$')
+PATTERN_SUBST = re.compile(r'\$\{(\w+)\}')
+
+class ShowTemplateError(Exception):
+    pass
+
+class _Value:
+    def __init__(self, name, options, regex):
+        self.name = name
+        self.options = options
+        self.regex = regex
+        self.filldown = "Filldown" in options
+        self.required = "Required" in options
+        self.is_list = "List" in options
+        if "Int" in options:
+            self.convert = int
+        elif "Lower" in options:
+            self.convert = str.lower
+        else:
+            self.convert = None
+
+    def empty(self):
+        return [] if self.is_list else None
+
+class _Rule:
+    def __init__(self, regex, line_action, record_action, new_state):
+        self.regex = regex
+        self.line_action = line_action
+        self.record_action = record_action
+        self.new_state = new_state
+
+class ShowTable(list):
+    '''
+    Records parsed by ShowTemplate. 'header' keeps the last values of Filldown
+    fields, so the data printed once above the table (e.g. local AS number)
+    is available even if the table has no rows.
+    '''
+    def __init__(self, records=(), header=None):
+        list.__init__(self, records)
+        self.header = header or {}
+
+    def column(self, name):
+        return [record[name] for record in self]
+
+class ShowTemplate:
+    '''
+    Show output parser in the spirit of TextFSM. The template is compiled once:
+
+        Value [Filldown,Required,List,Int,Lower] NAME (regex)
+
+        Start
+          ^regex with ${NAME} -> [Next|Continue][.Record|.NoRecord|.Clear|.Clearall] [NewState]
+
+    The lines are matched in one pass against the rules of the current state
+    ('Start' at the beginning). A record is appended at the end of the input
+    unless the template defines an empty 'EOF' state. Records with an empty
+    Required value or without any value except Filldown ones are dropped.
+    Int values are converted to int, Lower values to lower case.
+    '''
+
+    def __init__(self, text, command=None):
+        self.command = command
+        self.values = []
+        self.states = {}
+        self._parse_template(text)
+
+    def __repr__(self):
+        return f"ShowTemplate '{self.command}' {[value.name for value in self.values]}"
+
+    def _parse_template(self, text):
+        values = {}
+        state = None
+        for num, line in enumerate(text.splitlines(), 1):
+            if not line.strip() or line.lstrip().startswith('#'):
+                continue
+            if line.startswith("Value"):
+                match = PATTERN_VALUE.match(line)
+                if not match or state is not None:
+                    raise ShowTemplateError(f"line {num}: bad value definition '{line}'")
+                options = match.group(1).split(',') if match.group(1) else []
+                for option in options:
+                    if option not in VALUE_OPTIONS:
+                        raise ShowTemplateError(f"line {num}: unknown option '{option}'")
+                value = _Value(match.group(2), options, match.group(3))
+                values[value.name] = value
+                self.values.append(value)
+                continue
+            match = PATTERN_STATE.match(line)
+            if match:
+                state = match.group(1)
+                self.states[state] = []
+                continue
+            match = PATTERN_RULE.match(line)
+            if not match or state is None:
+                raise ShowTemplateError(f"line {num}: bad rule '{line}'")
+            self.states[state].append(self._compile_rule(num, match.group(1), match.group(2), values))
+
+        if "Start" not in self.states:
+            raise ShowTemplateError("state 'Start' is not defined")
+        for rules in self.states.values():
+            for rule in rules:
+                if rule.new_state and rule.new_state not in self.states:
+                    raise ShowTemplateError(f"state '{rule.new_state}' is not defined")
+
+    def _compile_rule(self, num, regex, action, values):
+        def subst(match):
+            value = values.get(match.group(1))
+            if not value:
+                raise ShowTemplateError(f"line {num}: value '{match.group(1)}' is not defined")
+            return f"(?P<{value.name}>{value.regex[1:]}"
+        regex = PATTERN_SUBST.sub(subst, regex).replace('$$', '$')
+
+        line_action, record_action, new_state = "Next", None, None
+        for token in (action or "").split():
+            first, _, second = token.partition('.')
+            if first in LINE_ACTIONS:
+                line_action = first
+                if second:
+                    record_action = second
+            elif first in RECORD_ACTIONS and not second:
+                record_action = first
+            elif not second and new_state is None:
+                new_state = token
+            else:
+                raise ShowTemplateError(f"line {num}: bad action '{action}'")
+        if record_action and record_action not in RECORD_ACTIONS:
+            raise ShowTemplateError(f"line {num}: bad action '{action}'")
+        try:
+            return _Rule(re.compile(regex), line_action, record_action, new_state)
+        except re.error as inst:
+            raise ShowTemplateError(f"line {num}: {inst}")
+
+    def parse(self, output):
+        '''
+        Parse the show output: Responce, string or iterable of lines
+        (e.g. router.iterExecCommand()). Returns ShowTable of dict records.
+        '''
+        if hasattr(output, "body_lines"):
+            lines = output.body_lines()
+        elif isinstance(output, str):
+            lines = output.splitlines()
+        else:
+            lines = output
+
+        table = ShowTable()
+        current = {value.name: value.empty() for value in self.values}
+        by_name = {value.name: value for value in self.values}
+
+        def record():
+            for value in self.values:
+                if value.required and not current[value.name]:
+                    break
+            else:
+                if any(current[value.name] not in (None, []) for value in self.values if not value.filldown):
+                    table.append({name: (list(item) if isinstance(item, list) else item) for name, item in current.items()})
+            clear(False)
+
+        def clear(all_values):
+            for value in self.values:
+                if all_values or not value.filldown:
+                    current[value.name] = value.empty()
+
+        state = self.states["Start"]
+        for line in lines:
+            line = line.rstrip('\r\n')
+            for rule in state:
+                match = rule.regex.match(line)
+                if not match:
+                    continue
+                for name, item in match.groupdict().items():
+                    if item is None or name not in by_name:
+                        continue
+                    value = by_name[name]
+                    if value.convert:
+                        item = value.convert(item)
+                    if value.is_list:
+                        current[name].append(item)
+                    else:
+                        current[name] = item
+                    if value.filldown:
+                        table.header[name] = item
+                if rule.record_action == "Record":
+                    record()
+                elif rule.record_action == "Clear":
+                    clear(False)
+                elif rule.record_action == "Clearall":
+                    clear(True)
+                if rule.new_state:
+                    state = self.states[rule.new_state]
+                if rule.line_action != "Continue":
+                    break
+
+        if "EOF" not in self.states:
+            record()
+        return table
+
+TEMPLATE_IP_INTERFACE_BRIEF = r'''
+Value Lower Interface (\S+)
+Value IP (\S+)
+Value OK (\S+)
+Value Method (\S+)
+Value Status (up|down|administratively down|deleted)
+Value Protocol (\S+)
+
+Start
+  ^Interface\s+IP-Address.+Protocol -> Table
+
+Table
+  ^${Interface}\s+${IP}\s+${OK}\s+${Method}\s+${Status}\s+${Protocol}\s*$$ -> Record
+'''
+
+TEMPLATE_VRF = r'''
+Value Name (\S+)
+Value RD (<not set>|\S+)
+Value Protocols (\S+)
+Value List Interfaces (\S+)
+
+Start
+  ^\s*Name\s+Default RD\s+Protocols\s+Interfaces -> Table
+
+Table
+  ^\s{0,3}\S -> Continue.Record
+  ^\s{0,3}${Name}\s+${RD}\s+${Protocols}(\s+${Interfaces})?\s*$$
+  ^\s{4,}${Interfaces}\s*$$
+'''
+
+TEMPLATE_IP_BGP_SUMMARY = r'''
+Value Filldown RouterId (\S+)
+Value Filldown,Int LocalAS (\d+)
+Value Required Neighbor (\d+\.\d+\.\d+\.\d+)
+Value Int Version (\d+)
+Value Int RemoteAS (\d+)
+Value Int MsgRcvd (\d+)
+Value Int MsgSent (\d+)
+Value Int TblVer (\d+)
+Value Int InQ (\d+)
+Value Int OutQ (\d+)
+Value UpDown (\S+)
+Value StatePfxRcd (.+?)
+
+Start
+  ^BGP router identifier ${RouterId}, local AS number ${LocalAS}
+  ^Neighbor\s+V\s+AS -> Table
+
+Table
+  ^${Neighbor}\s+${Version}\s+${RemoteAS}\s+${MsgRcvd}\s+${MsgSent}\s+${TblVer}\s+${InQ}\s+${OutQ}\s+${UpDown}\s+${StatePfxRcd}\s*$$ -> Record
+'''
+
+TEMPLATE_IP_OSPF_NEIGHBOR = r'''
+Value NeighborId (\d+\.\d+\.\d+\.\d+)
+Value Int Priority (\d+)
+Value State (\S+/\s*\S+|\S+)
+Value DeadTime (\S+)
+Value Address (\d+\.\d+\.\d+\.\d+)
+Value Lower Interface (\S+)
+
+Start
+  ^Neighbor ID\s+Pri\s+State -> Table
+
+Table
+  ^${NeighborId}\s+${Priority}\s+${State}\s+${DeadTime}\s+${Address}\s+${Interface}\s*$$ -> Record
+'''
+
+TEMPLATE_MPLS_FORWARDING_TABLE = r'''
+Value Filldown LocalLabel (\d+|None)
+Value OutLabel (Pop Label|No Label|Untagged|Aggregate|implicit-null|\d+)
+Value Prefix (\S+)
+Value Int BytesSwitched (\d+)
+Value OutInterface (\S+)
+Value NextHop (\S+)
+
+Start
+  ^Local\s+Outgoing\s+Prefix -> Table
+
+Table
+  ^${LocalLabel}\s+${OutLabel}\s+${Prefix}\s+${BytesSwitched}\s+${OutInterface}(\s+${NextHop})?\s*$$ -> Record
+  ^\s+${OutLabel}\s+${Prefix}\s+${BytesSwitched}\s+${OutInterface}(\s+${NextHop})?\s*$$ -> Record
+'''
+
+TEMPLATES = {
+    "show ip interface brief":   ShowTemplate(TEMPLATE_IP_INTERFACE_BRIEF, "show ip interface brief"),
+    "show vrf":                  ShowTemplate(TEMPLATE_VRF, "show vrf"),
+    "show ip bgp summary":       ShowTemplate(TEMPLATE_IP_BGP_SUMMARY, "show ip bgp summary"),
+    "show ip ospf neighbor":     ShowTemplate(TEMPLATE_IP_OSPF_NEIGHBOR, "show ip ospf neighbor"),
+    "show mpls forwarding-table": ShowTemplate(TEMPLATE_MPLS_FORWARDING_TABLE, "show mpls forwarding-table"),
+}
+
+# cached show commands (the config derived listings) and the config sections which change
+# their output (None - any section). The neighbor and forwarding tables are not cached
+SHOW_SCOPES = {
+    "show ip interface brief":   ("interface",),
+    "show vrf":                  ("ip vrf", "vrf", "interface"),
+}
+
+def get_template(command):
+    template = TEMPLATES.get(' '.join(command.split()))
+    if not template:
+        raise ShowTemplateError(f"no template for '{command}'")
+    return template
+
+def parse_show(command, output):
+    '''
+    Parse output of the show command with the registered template.
+    The result for Responce is cached in it, so the output is parsed once
+    '''
+    template = get_template(command)
+    if hasattr(output, "cached"):
+        return output.cached(template.command, template.parse)
+    return template.parse(output)
+
+def cisco_show(router, command):
+    '''
+    Execute show command on the router and return parsed ShowTable.
+    The table of the config derived listings (SHOW_SCOPES) is taken from the
+    router show cache if it is valid; the operational tables are always executed
+    '''
+    template = get_template(command)
+    cached = hasattr(router, "cache_get") and template.command in SHOW_SCOPES
+    if cached:
+        table = router.cache_get(template.command)
+        if table is not None:
+            return table
+    responce = router.enterExecCommand(template.command)
+    if not responce:
+        return ShowTable()
+    table = parse_show(template.command, responce)
+    if cached:
+        router.cache_put(template.command, table, SHOW_SCOPES.get(template.command))
+    return table
@@ -0,0 +1,251 @@
+# GNU GENERAL PUBLIC LICENSE
+# Autor: Aleksey Burger
+
+import re
+import time
+import socket
+import selectors
+import logging
+
+logger = logging.getLogger("dtulibLog")
+def trace(format):
+    logger.debug(f'\n\x1b[1;94mTelnet: {format}\x1b[0m')
+
+def error(format):
+    logger.error(f'\n\x1b[1;31mTelnet: {format}\x1b[0m')
+
+def info(format):
+    logger.info(f'\n\x1b[1;92mTelnet: {format}\x1b[0m')
+
+IAC  = 255
+DONT = 254
+DO   = 253
+WONT = 252
+WILL = 251
+SB   = 250
+SE   = 240
+
+IAC_BYTE = bytes([IAC])
+
+RECV_SIZE = 65536
+
+class TelnetFilter:
+    '''
+    Minimal telnet option negotiation: every option is refused (as telnetlib does),
+    IAC sequences are removed from the data. Sequences split between reads are kept
+    until the next chunk.
+    '''
+    def __init__(self):
+        self.pending = b''
+        self.in_sb = False
+
+    def feed(self, data):
+        ''' returns (data without IAC sequences, negotiation replies) '''
+        if not self.pending and not self.in_sb and IAC not in data:
+            return bytes(data), b''
+        data = self.pending + data
+        self.pending = b''
+        out = bytearray()
+        replies = bytearray()
+        pos = 0
+        while pos < len(data):
+            if self.in_sb:
+                end = data.find(bytes([IAC, SE]), pos)
+                if end < 0:
+                    self.pending = data[-1:] if data[-1] == IAC else b''
+                    return bytes(out), bytes(replies)
+                self.in_sb = False
+                pos = end + 2
+                continue
+            iac = data.find(IAC_BYTE, pos)
+            if iac < 0:
+                out += data[pos:]
+                break
+            out += data[pos:iac]
+            if iac + 1 >= len(data):
+                self.pending = data[iac:]
+                break
+            cmd = data[iac + 1]
+            if cmd == IAC:
+                out.append(IAC)
+                pos = iac + 2
+            elif cmd in (DO, DONT, WILL, WONT):
+                if iac + 2 >= len(data):
+                    self.pending = data[iac:]
+                    break
+                option = data[iac + 2]
+                if cmd == DO:
+                    replies += bytes([IAC, WONT, option])
+                elif cmd == WILL:
+                    replies += bytes([IAC, DONT, option])
+                pos = iac + 3
+            elif cmd == SB:
+                self.in_sb = True
+                pos = iac + 2
+            else:
+                pos = iac + 2
+        return bytes(out), bytes(replies)
+
+class TelnetTransport:
+    '''
+    Telnet client on socket + selectors. It implements the subset of telnetlib.Telnet
+    used by RouterCisco (write, read_until, expect, read_very_eager, read_eager,
+    read_some, close), so it is a drop-in replacement on Python without telnetlib.
+    The socket is read with large recv() into one bytearray buffer; IAC sequences are
+    stripped per chunk by TelnetFilter (chunks without IAC are passed as is); read_until
+    and expect continue the search of every chunk from the end of the searched data
+    (expect from its last line break), so a large output is searched in linear time.
+    '''
+
+    def __init__(self, host=None, port=23, timeout=None):
+        self.host = host
+        self.port = port
+        self.sock = None
+        self.eof = False
+        self._buffer = bytearray()
+        self._filter = TelnetFilter()
+        self._selector = None
+        # TranscriptWriter of the session (see session_transcript) or None
+        self.transcript = None
+        # time of the last write and of the first data received after it (time to first byte)
+        self.write_time = None
+        self.first_byte_time = None
+        if host is not None:
+            self.open(host, port, timeout)
+
+    def __repr__(self):
+        return f"TelnetTransport {self.host}:{self.port}"
+
+    def open(self, host, port=23, timeout=None):
+        self.host = host
+        self.port = port
+        self.eof = False
+        self.sock = socket.create_connection((host, port), timeout)
+        self.sock.settimeout(None)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self.sock, selectors.EVENT_READ)
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def close(self):
+        self.eof = True
+        if self._selector:
+            self._selector.close()
+            self._selector = None
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+
+    def write(self, buffer):
+        ''' IAC in the data is doubled as telnetlib does '''
+        if self.transcript is not None:
+            self.transcript.send(buffer)
+        self.write_time = time.monotonic()
+        self.first_byte_time = None
+        if IAC_BYTE in buffer:
+            buffer = buffer.replace(IAC_BYTE, IAC_BYTE + IAC_BYTE)
+        self.sock.sendall(buffer)
+
+    def _fill(self, timeout):
+        '''
+        Wait up to timeout (None - forever) for socket data and append it to the buffer.
+        Returns False on timeout or EOF.
+        '''
+        if self.eof:
+            return False
+        if not self._selector.select(timeout):
+            return False
+        data = self.sock.recv(RECV_SIZE)
+        if not data:
+            self.eof = True
+            return False
+        data, replies = self._filter.feed(data)
+        if replies:
+            self.sock.sendall(replies)
+        if data:
+            if self.first_byte_time is None:
+                self.first_byte_time = time.monotonic()
+            if self.transcript is not None:
+                self.transcript.recv(data)
+        self._buffer += data
+        return True
+
+    def _fill_available(self):
+        while not self.eof and self._fill(0):
+            pass
+
+    def _take(self, size=None):
+        if size is None:
+            size = len(self._buffer)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def _remaining(self, deadline):
+        if deadline is None:
+            return None
+        return max(0, deadline - time.monotonic())
+
+    def read_until(self, match, timeout=None):
+        '''
+        Read until match is found or timeout. Returns the data up to and including match,
+        or the available data if the match is not found.
+        '''
+        deadline = None if timeout is None else time.monotonic() + timeout
+        start = 0
+        while True:
+            pos = self._buffer.find(match, start)
+            if pos >= 0:
+                return self._take(pos + len(match))
+            start = max(0, len(self._buffer) - len(match) + 1)
+            remaining = self._remaining(deadline)
+            if (remaining == 0 and timeout is not None) or not self._fill(remaining):
+                if self.eof and not self._buffer:
+                    raise EOFError("telnet connection closed")
+                if self.eof or (deadline is not None and time.monotonic() >= deadline):
+                    return self._take()
+
+    def expect(self, patterns, timeout=None):
+        '''
+        Read until one of the patterns (regular expressions, compiled or not) matches.
+        Returns (index, match, data) as telnetlib; (-1, None, data) on timeout.
+        The patterns match within a line (e.g. the prompt): after every chunk the
+        search is continued from the last line break of the searched data
+        '''
+        patterns = [re.compile(pattern) if not hasattr(pattern, "search") else pattern for pattern in patterns]
+        deadline = None if timeout is None else time.monotonic() + timeout
+        starts = [0] * len(patterns)
+        while True:
+            for index, pattern in enumerate(patterns):
+                match = pattern.search(self._buffer, starts[index])
+                if match:
+                    data = self._take(match.end())
+                    return index, match, data
+                # the line break is kept for the patterns which start with it (PATTERN_ANY_PROMPT)
+                starts[index] = max(starts[index], self._buffer.rfind(b'\n', starts[index]),
+                                    self._buffer.rfind(b'\r', starts[index]))
+            remaining = self._remaining(deadline)
+            if (remaining == 0 and timeout is not None) or not self._fill(remaining):
+                if self.eof and not self._buffer:
+                    raise EOFError("telnet connection closed")
+                if self.eof or (deadline is not None and time.monotonic() >= deadline):
+                    return -1, None, self._take()
+
+    def read_very_eager(self):
+        ''' Read everything available without blocking '''
+        self._fill_available()
+        if self.eof and not self._buffer:
+            raise EOFError("telnet connection closed")
+        return self._take()
+
+    def read_eager(self):
+        return self.read_very_eager()
+
+    def read_some(self):
+        ''' Read at least one byte of data unless EOF is hit; b'' on EOF '''
+        while not self._buffer and self._fill(None):
+            pass
+        self._fill_available()
+        return self._take()
@@ -0,0 +1,99 @@
+# GNU GENERAL PUBLIC LICENSE
+# Autor: Aleksey Burger
+
+import re
+import codecs
+
+# complete escape sequences (ECMA-48): CSI "ESC [ params intermediates final",
+# OSC "ESC ] text BEL|ESC \" and the short ones "ESC intermediates final" (ESC ( B, ESC =, ESC 7)
+PATTERN_ESCAPE = re.compile(r'\x1b(?:\[[0-?]*[ -/]*[@-~]|\][^\x07\x1b]*(?:\x07|\x1b\\)|[ -/]*[0-~])')
+# unfinished sequence at the end of the chunk
+PATTERN_OSC_TAIL = re.compile(r'\x1b\][^\x07\x1b]*\x1b?\Z')
+PATTERN_ESCAPE_TAIL = re.compile(r'\x1b(?:\[[0-?]*[ -/]*|[ -/]*)\Z')
+
+# unfinished sequence longer than this is not a terminal control: it is passed as text
+MAX_PENDING = 4096
+
+def strip_ansi(text):
+    ''' text without the escape sequences '''
+    if '\x1b' not in text:
+        return text
+    return PATTERN_ESCAPE.sub('', text)
+
+class TerminalNormalizer:
+    '''
+    Streaming cleaner of the terminal output: feed() takes the byte chunks as they are
+    read and returns the text without the escape sequences. The UTF-8 characters and
+    the escape sequences split between the chunks are kept until the next chunk:
+    the state is the unfinished character of the incremental decoder and the
+    unfinished sequence. Chunks without ESC are returned as decoded.
+    '''
+
+    def __init__(self, encoding="utf-8"):
+        self._decoder = codecs.getincrementaldecoder(encoding)("replace")
+        self._pending = ''
+
+    def _tail(self, text):
+        ''' position of the unfinished escape sequence at the end of text or -1 '''
+        pos = text.rfind('\x1b]')
+        if pos >= 0 and PATTERN_OSC_TAIL.match(text, pos):
+            return pos
+        pos = text.rfind('\x1b')
+        if pos >= 0 and PATTERN_ESCAPE_TAIL.match(text, pos):
+            return pos
+        return -1
+
+    def feed(self, data):
+        text = self._decoder.decode(data)
+        if self._pending:
+            text = self._pending + text
+            self._pending = ''
+        if '\x1b' not in text:
+            return text
+        pos = self._tail(text)
+        if pos >= 0 and len(text) - pos <= MAX_PENDING:
+            self._pending = text[pos:]
+            text = text[:pos]
+        return PATTERN_ESCAPE.sub('', text)
+
+    def flush(self):
+        ''' the rest: the unfinished character and sequence are returned as text '''
+        text = self._pending + self._decoder.decode(b'', True)
+        self._pending = ''
+        return text
+
+class ChunkBuffer:
+    '''
+    Text collected as the list of chunks and joined once by text(); tail() gives
+    the end of the text (e.g. for the prompt check) without joining all of it
+    '''
+
+    def __init__(self):
+        self.chunks = []
+        self.length = 0
+        self._text = None
+
+    def __len__(self):
+        return self.length
+
+    def append(self, text):
+        if text:
+            self.chunks.append(text)
+            self.length += len(text)
+            self._text = None
+
+    def tail(self, size):
+        ret = []
+        length = 0
+        for chunk in reversed(self.chunks):
+            ret.append(chunk)
+            length += len(chunk)
+            if length >= size:
+                break
+        return ''.join(reversed(ret))[-size:]
+
+    def text(self):
+        if self._text is None:
+            self._text = ''.join(self.chunks)
+            self.chunks = [self._text] if self._text else []
+        return self._text
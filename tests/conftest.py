@@ -0,0 +1,45 @@
+# GNU GENERAL PUBLIC LICENSE
+# Autor: Aleksey Burger
+
+# Fixtures of the test suite: the simulated router and RouterCisco connected to it.
+#   python -m pytest tests
+
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cisco_simulator import CiscoSimulator
+from router_cisco import RouterCisco
+
+@pytest.fixture
+def simulator():
+    sim = CiscoSimulator("R1", password="cisco")
+    sim.start()
+    yield sim
+    sim.stop()
+
+def _connect(simulator, length=True):
+    router = RouterCisco("127.0.0.1", simulator.port, "cisco", simulator.password)
+    router.start()
+    router.toExec()
+    if length:
+        router.enterWaitResponce("terminal length 0")
+    return router
+
+@pytest.fixture
+def connect():
+    ''' factory of RouterCisco logged in to the simulator in exec mode (with "terminal length 0" if length) '''
+    routers = []
+    def factory(simulator, length=True):
+        router = _connect(simulator, length)
+        routers.append(router)
+        return router
+    yield factory
+    for router in routers:
+        router.end()
+
+@pytest.fixture
+def router(simulator, connect):
+    return connect(simulator)
@@ -0,0 +1,122 @@
+# GNU GENERAL PUBLIC LICENSE
+# Autor: Aleksey Burger
+
+from cisco_interface import CiscoInterface
+from cisco_vrf import CiscoVrf, CiscoVrfAFamily, VRF_AFAMILY_IPV4_UNICAST
+from cisco_bgp import CiscoBgp, CiscoBgpVrf, CiscoBgpNeighbor
+from cisco_reconcile import cisco_reconcile, cisco_reconcile_plan
+from running_config import parse_running_config
+
+def make_objects():
+    vrf = CiscoVrf("CUST-A", "65000:1")
+    afamily = CiscoVrfAFamily(VRF_AFAMILY_IPV4_UNICAST)
+    afamily.add_import_target("65000:1")
+    afamily.add_export_target("65000:1")
+    vrf.add_afamily(afamily)
+    loopback = CiscoInterface("Loopback100")
+    loopback.modify(ipv4_address_mask="10.0.0.1/32", description="test", vrf=vrf)
+    bgp = CiscoBgp("65000")
+    bgp.add_vrf(CiscoBgpVrf("default"))
+    return [vrf, loopback, bgp]
+
+def config_commands(simulator):
+    ''' the received commands which are not show commands '''
+    return [command for command in simulator.commands if not command.startswith(("show", "do show"))]
+
+def test_dry_run(simulator, router):
+    before = simulator.running_config()
+    simulator.keep_commands = True
+    plan = cisco_reconcile(router, make_objects(), apply=False)
+    assert not plan.applied
+    assert plan.sections == ["ip vrf CUST-A", "interface loopback100", "router bgp 65000"]
+    assert plan.commands == [
+        ("ip vrf CUST-A", "(config-vrf)#"), ("rd 65000:1", "(config-vrf)#"),
+        ("route-target import 65000:1", "(config-vrf)#"), ("route-target export 65000:1", "(config-vrf)#"),
+        ("exit", "(config)#"),
+        ("interface loopback100", "(config-if)#"), ("ip vrf forwarding CUST-A", "(config-if)#"),
+        ("ip address 10.0.0.1 255.255.255.255", "(config-if)#"), ('description "test"', "(config-if)#"),
+        ("exit", "(config)#"),
+        ("router bgp 65000", "(config-router)#"), ("exit", "(config)#")]
+    assert plan.text().splitlines()[:2] == ["ip vrf CUST-A", "rd 65000:1"]
+    assert repr(plan) == "R1 reconcile: 12 commands in 3 sections"
+    # the plan is built from the running config only
+    assert config_commands(simulator) == []
+    assert simulator.running_config() == before
+
+def test_idempotent(simulator, router):
+    objects = make_objects()
+    plan = cisco_reconcile(router, objects)
+    assert plan.applied and len(plan) == 12
+    running = parse_running_config(simulator.running_config().splitlines())
+    assert "description \"test\"" in running.find("interface", "Loopback100")
+    assert "route-target export 65000:1" in running.find("ip vrf", "CUST-A")
+
+    simulator.keep_commands = True
+    plan = cisco_reconcile(router, objects)
+    assert len(plan) == 0 and plan.sections == [] and plan.text() == ""
+    assert config_commands(simulator) == []
+    assert len(objects[1].reconcile(router)) == 0
+
+class _UpInterface(CiscoInterface):
+    ''' interface object which brings the interface up after .create() '''
+    def create(self, router):
+        CiscoInterface.create(self, router)
+        self.up()
+        return True
+
+def test_drift(simulator, router):
+    loopback = CiscoInterface("Loopback100")
+    loopback.modify(ipv4_address_mask="10.0.0.1/32", description="test")
+    loopback.reconcile(router)
+    router.toConfig()
+    for command in ("interface Loopback100", "description drift", "mpls ip", "ip proxy-arp"):
+        router.enterWaitResponce(command, ")#")
+    router.toExec()
+
+    # the managed line which is not desired is removed, the single value line is replaced,
+    # the line which the interface class does not write (ip proxy-arp) is kept
+    plan = cisco_reconcile_plan(router, loopback)
+    assert plan.text().splitlines() == ["interface loopback100", "no mpls ip", 'description "test"', "exit"]
+    simulator.keep_commands = True
+    cisco_reconcile(router, loopback)
+    assert config_commands(simulator)[-4:] == ["interface loopback100", "no mpls ip", 'description "test"', "exit"]
+    assert len(loopback.reconcile(router, apply=False)) == 0
+    running = parse_running_config(simulator.running_config().splitlines())
+    assert "ip proxy-arp" in running.find("interface", "Loopback100")
+
+def test_shutdown_drift(simulator, router):
+    ''' the 'no ...' line of the object is compared inside of the section '''
+    loopback = _UpInterface("Loopback100")
+    loopback.modify(ipv4_address_mask="10.0.0.1/32")
+    loopback.reconcile(router)
+    assert len(loopback.reconcile(router, apply=False)) == 0
+    router.toConfig()
+    router.enterWaitResponce("interface Loopback100", ")#")
+    router.enterWaitResponce("shutdown", ")#")
+    router.toExec()
+
+    plan = loopback.reconcile(router)
+    assert plan.text().splitlines() == ["interface loopback100", "no shutdown", "exit"]
+    running = parse_running_config(simulator.running_config().splitlines())
+    assert "shutdown" not in running.find("interface", "Loopback100")
+    assert len(loopback.reconcile(router, apply=False)) == 0
+
+def test_unmanaged_lines_kept(simulator, router):
+    ''' the router-id, the defaults and the neighbors which the objects do not define are kept '''
+    router.toConfig()
+    for command in ("router bgp 65000", "bgp router-id 1.1.1.1", "bgp log-neighbor-changes",
+                    "neighbor 10.0.0.2 remote-as 65001", "neighbor 10.0.0.3 remote-as 65003"):
+        router.enterWaitResponce(command, ")#")
+    router.toExec()
+
+    bgp = CiscoBgp("65000")
+    bgp.add_vrf(CiscoBgpVrf("default"))
+    assert len(cisco_reconcile_plan(router, bgp)) == 0
+
+    # the lines of the neighbor defined by the objects are owned by them
+    default = CiscoBgpVrf("default")
+    default.add_neighbor(CiscoBgpNeighbor("10.0.0.3", "65000"))
+    bgp = CiscoBgp("65000")
+    bgp.add_vrf(default)
+    assert cisco_reconcile_plan(router, bgp).text().splitlines() == [
+        "router bgp 65000", "no neighbor 10.0.0.3 remote-as 65003", "neighbor 10.0.0.3 remote-as 65000", "exit"]
@@ -0,0 +1,63 @@
+# GNU GENERAL PUBLIC LICENSE
+# Autor: Aleksey Burger
+
+import os
+import io
+import pytest
+from linux_sftp import put_file, get_file, resume_offset, RESUME_CHECK_SIZE
+
+class _LocalFile(io.FileIO):
+    ''' local file with the methods of paramiko SFTPFile used by the transfers '''
+    def set_pipelined(self, pipelined=True):
+        pass
+
+    def prefetch(self, file_size=None):
+        pass
+
+class _LocalSftp:
+    ''' SFTPClient double on the local file system '''
+    def stat(self, path):
+        return os.stat(path)
+
+    def open(self, path, mode="r"):
+        return _LocalFile(path, mode)
+
+    def utime(self, path, times):
+        os.utime(path, times)
+
+def write(path, data, mtime):
+    with open(path, "wb") as f:
+        f.write(data)
+    os.utime(path, (mtime, mtime))
+
+def test_resume_offset():
+    assert resume_offset(100, 10.5, None, 0) == 0
+    assert resume_offset(100, 10.5, 100, 10.2) is None
+    assert resume_offset(100, 10, 40, 20) == 40
+    assert resume_offset(100, 10, 40, 20, resume=False) == 0
+    assert resume_offset(100, 10, 120, 20) == 0
+
+@pytest.mark.parametrize("copy", [put_file, get_file])
+def test_resume(tmp_path, copy):
+    data = os.urandom(3 * RESUME_CHECK_SIZE + 100)
+    source, target = str(tmp_path / "source"), str(tmp_path / "target")
+    write(source, data, 1000)
+    # interrupted copy of this source: the rest is appended
+    write(target, data[:RESUME_CHECK_SIZE + 7], 2000)
+    result = copy(_LocalSftp(), source, target)
+    assert result.offset == RESUME_CHECK_SIZE + 7 and result.bytes == len(data) - result.offset
+    assert open(target, "rb").read() == data
+    assert int(os.stat(target).st_mtime) == 1000
+    assert copy(_LocalSftp(), source, target).skipped
+
+@pytest.mark.parametrize("copy", [put_file, get_file])
+def test_stale_target_restarts(tmp_path, copy):
+    ''' a shorter target of the other version of the file is copied from the start '''
+    old, new = os.urandom(5000), os.urandom(9000)
+    source, target = str(tmp_path / "source"), str(tmp_path / "target")
+    write(source, new, 1000)
+    write(target, old, 500)
+    result = copy(_LocalSftp(), source, target)
+    assert result.offset == 0 and result.bytes == len(new)
+    assert open(target, "rb").read() == new
+    assert copy(_LocalSftp(), source, target).skipped
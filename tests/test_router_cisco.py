@@ -0,0 +1,75 @@
+# GNU GENERAL PUBLIC LICENSE
+# Autor: Aleksey Burger
+
+import time
+import pytest
+from cisco_simulator import CiscoSimulator
+from router_cisco import RouterCisco, CONFIG_MODE, EXEC_MODE
+
+@pytest.mark.parametrize("latency, probe_timeout", [(0.02, 1), (0.15, 0.1)])
+def test_mode_change_keeps_responces_in_step(connect, latency, probe_timeout):
+    ''' the late prompts of exit/Ctrl-Z and of the repeated probes do not shift the next responces '''
+    with CiscoSimulator("R1", password="cisco", latency=latency) as sim:
+        router = connect(sim)
+        router.probe_timeout = probe_timeout
+        router.toConfig()
+        router.enterWaitResponce("interface Loopback1", "(config-if)#")
+        router.toConfig()
+        assert router.mode == CONFIG_MODE
+        resp = router.enterWaitResponce("interface Loopback2", "(config-if)#")
+        assert resp.text == 'interface Loopback2\r\nR1(config-if)#'
+        router.toExec()
+        assert router.mode == EXEC_MODE
+        resp = router.enterWaitResponce("show ip interface brief")
+        assert resp.text.startswith("show ip interface brief\r\nInterface")
+        assert "Loopback2" in resp.text
+        assert router.pending_prompts == 0
+
+def test_swallowed_probes_are_not_awaited(connect):
+    ''' the probes taken by the --More-- pager are not read out by every next waitPrompt '''
+    with CiscoSimulator("R1", password="cisco") as sim:
+        router = connect(sim, length=False)
+        router.toConfig()
+        for i in range(6):
+            router.enterWaitResponce(f"interface Loopback{i}", ")#")
+            router.enterWaitResponce("exit", ")#")
+        router.toExec()
+        router.probe_timeout = 0.2
+        router.prompt_timeout = 1
+        router.tn.write(b"show running-config\n")
+        assert router.tn.expect([rb"--More-- $"], 2)[0] == 0
+        # every probe shows one more line, the prompt comes after the last one
+        assert router.waitPrompt()
+        assert router.pending_prompts == 0
+        start = time.monotonic()
+        assert router.waitPrompt()
+        assert time.monotonic() - start < router.probe_timeout
+        resp = router.enterWaitResponce("show ip interface brief")
+        assert resp.text.startswith("show ip interface brief\r\nInterface")
+
+class _ChunkTransport:
+    ''' transport which returns the output by the given chunks '''
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+        self.written = []
+        self.write_time = None
+        self.first_byte_time = None
+
+    def write(self, data):
+        self.written.append(data)
+        self.write_time = time.monotonic()
+
+    def read_some(self):
+        return self.chunks.pop(0) if self.chunks else b''
+
+def test_stream_prompt_is_line_start():
+    ''' an output line ending with the prompt text and split at the chunk end does not stop the stream '''
+    router = RouterCisco("127.0.0.1", 23, "cisco", "cisco")
+    router.name = "R1"
+    router.mode = EXEC_MODE
+    router.tn = _ChunkTransport([b"show running-config\r\n interface Loopback1\r\n description to R1#",
+                                 b" uplink\r\n end\r\nR1#"])
+    lines = list(router.iterExecCommand("show running-config"))
+    assert lines == [" interface Loopback1", " description to R1# uplink", " end"]
+    assert not router.tn.chunks
+    assert router.mode == EXEC_MODE
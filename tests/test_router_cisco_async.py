@@ -0,0 +1,53 @@
+# GNU GENERAL PUBLIC LICENSE
+# Autor: Aleksey Burger
+
+import asyncio
+from cisco_simulator import CiscoSimulator
+from cisco_interface import CiscoInterface, cisco_get_all_interfaces_params
+from router_cisco import EXEC_MODE
+from router_cisco_async import AsyncRouterCisco
+from running_config import parse_running_config
+
+async def _connect(simulator):
+    router = AsyncRouterCisco("127.0.0.1", simulator.port, "cisco", simulator.password)
+    await router.start()
+    await router.enterWaitResponce("terminal length 0")
+    return router
+
+def test_late_probes_keep_responces_in_step():
+    ''' the prompts of the probes answered after probe_timeout do not shift the next responces '''
+    async def run(sim):
+        router = await _connect(sim)
+        router.probe_timeout = 0.1
+        await router.toConfig()
+        resp = await router.enterWaitResponce("interface Loopback2", "(config-if)#")
+        assert resp.text == 'interface Loopback2\r\nR1(config-if)#'
+        await router.toExec()
+        assert router.mode == EXEC_MODE
+        resp = await router.enterWaitResponce("show ip interface brief")
+        assert resp.text.startswith("show ip interface brief\r\nInterface")
+        assert "Loopback2" in resp.text
+        assert router.pending_prompts == 0
+        await router.end()
+
+    with CiscoSimulator("R1", password="cisco", latency=0.15) as sim:
+        asyncio.run(run(sim))
+
+def test_create_config_and_bridge(simulator):
+    async def run():
+        router = await _connect(simulator)
+        router.pipeline_depth = 8
+        loopback = CiscoInterface("Loopback100")
+        loopback.modify(ipv4_address_mask="10.0.0.1/32", description="test")
+        responces = await router.create_config(loopback)
+        assert [resp.command for resp in responces][0] == "interface loopback100"
+        assert loopback.router is None
+        # the show helpers of the config classes work on the synchronous bridge
+        params = await router.run_config(cisco_get_all_interfaces_params, router.sync)
+        await router.end()
+        return params
+
+    params = asyncio.run(run())
+    assert {"Interface": "loopback100", "IP": "10.0.0.1", "Status": "up"} in params
+    running = parse_running_config(simulator.running_config().splitlines())
+    assert 'description "test"' in running.find("interface", "Loopback100")
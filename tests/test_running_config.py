@@ -0,0 +1,190 @@
+# GNU GENERAL PUBLIC LICENSE
+# Autor: Aleksey Burger
+
+from running_config import (parse_running_config, cisco_running_config, RunningConfig, SECTION_CHUNK,
+                            CACHE_RUNNING_CONFIG, _ios_regex)
+from show_parser import cisco_show
+
+RUNNING_CONFIG = '''\
+Building configuration...
+
+Current configuration : 1024 bytes
+!
+version 17.3
+hostname PE1
+!
+ip vrf CUST-A
+ rd 65000:1
+ route-target export 65000:1
+ route-target import 65000:1
+!
+interface Loopback0
+ ip address 10.255.0.1 255.255.255.255
+!
+interface GigabitEthernet1
+ description uplink
+ ip address 192.168.1.1  255.255.255.0
+ negotiation auto
+!
+router bgp 65000
+ bgp log-neighbor-changes
+ neighbor 10.255.0.2 remote-as 65000
+ !
+ address-family ipv4 vrf CUST-A
+  neighbor 172.16.0.1 remote-as 65001
+  neighbor 172.16.0.1 activate
+ exit-address-family
+!
+end
+'''
+
+def config(router, *commands):
+    ''' send the commands in config mode and go back to exec '''
+    router.toConfig()
+    for command in commands:
+        router.enterWaitResponce(command, ")#")
+    router.toExec()
+
+def test_parse_running_config():
+    root = parse_running_config(RUNNING_CONFIG.splitlines())
+    assert root.commands == ["version 17.3", "hostname PE1", "ip vrf CUST-A", "interface Loopback0",
+                             "interface GigabitEthernet1", "router bgp 65000"]
+    assert [section.name for section in root.sections("interface")] == ["loopback0", "gigabitethernet1"]
+    interface = root.find("interface", "GigabitEthernet1")
+    assert interface is root.find("interface", "gigabitethernet1")
+    assert interface.commands == ["description uplink", "ip address 192.168.1.1  255.255.255.0", "negotiation auto"]
+    # the lines are compared with the spaces normalized
+    assert "ip address 192.168.1.1 255.255.255.0" in interface
+    assert " ip  address 192.168.1.1  255.255.255.0" in interface
+    assert root.find("ip vrf", "CUST-A").commands[0] == "rd 65000:1"
+    bgp = root.find("router bgp", "65000")
+    assert bgp.commands[:2] == ["bgp log-neighbor-changes", "neighbor 10.255.0.2 remote-as 65000"]
+    # nested sections are indexed in their parent
+    afamily = bgp.find("address-family", "ipv4 vrf CUST-A")
+    assert afamily.parent is bgp
+    assert afamily.commands == ["neighbor 172.16.0.1 remote-as 65001", "neighbor 172.16.0.1 activate"]
+    assert bgp.commands[-1] == "exit-address-family"
+    assert root.find("interface", "Loopback1") is None
+    assert root.text().splitlines()[:4] == ["version 17.3", "hostname PE1", "ip vrf CUST-A", " rd 65000:1"]
+
+def test_ios_regex():
+    assert _ios_regex("interface", "loopback1.5") == "interface [Ll][Oo][Oo][Pp][Bb][Aa][Cc][Kk]1\\.5"
+    assert _ios_regex("ip vrf", "A_B(1)") == "ip vrf A\\_B\\(1\\)"
+
+def test_snapshot_from_lines():
+    snapshot = RunningConfig(lines=RUNNING_CONFIG.splitlines())
+    assert snapshot.names("ip vrf") == ["CUST-A"]
+    snapshot.invalidate("interface Loopback0")
+    # the snapshot without router is not re-fetched
+    assert snapshot.find("interface", "loopback0") is not None
+
+def test_show_cache(simulator, router):
+    config(router, "router bgp 65000")
+    simulator.keep_commands = True
+    # the cache is off by default
+    cisco_show(router, "show vrf")
+    cisco_show(router, "show vrf")
+    assert simulator.commands.count("show vrf") == 2
+
+    router.show_cache_ttl = 10
+    cisco_show(router, "show ip interface brief")
+    cisco_show(router, "show vrf")
+    assert cisco_show(router, "show ip interface brief").column("Interface")[0] == "gigabitethernet1"
+    assert router.cache_stats["hits"] == 1
+    assert simulator.commands.count("show ip interface brief") == 1
+    # the neighbor tables are not cached
+    cisco_show(router, "show ip bgp summary")
+    cisco_show(router, "show ip bgp summary")
+    assert simulator.commands.count("show ip bgp summary") == 2
+    assert "show ip bgp summary" not in router.show_cache
+
+    # a vrf command drops the vrf output only
+    config(router, "ip vrf CUST-A", "rd 65000:1")
+    assert set(router.show_cache) == {"show ip interface brief"}
+    assert cisco_show(router, "show vrf").column("Name") == ["CUST-A"]
+    config(router, "interface Loopback5")
+    assert router.show_cache == {}
+    assert "loopback5" in cisco_show(router, "show ip interface brief").column("Interface")
+    assert simulator.commands.count("show ip interface brief") == 2
+    cisco_show(router, "show vrf")
+
+    # the read-only exec commands keep the cache, the others drop it
+    router.enterExecCommand("sh ip bgp summary")
+    router.enterExecCommand("terminal length 0")
+    assert set(router.show_cache) == {"show ip interface brief", "show vrf"}
+    router.enterExecCommand("clear ip bgp *")
+    assert router.show_cache == {}
+
+def test_section_refetch(simulator, router):
+    router.show_cache_ttl = 10
+    config(router, "interface Loopback7", " description seven")
+    snapshot = cisco_running_config(router)
+    assert snapshot.fetches == 1
+    assert cisco_running_config(router) is snapshot
+    gigabit = snapshot.find("interface", "GigabitEthernet1")
+    assert "description seven" in snapshot.find("interface", "Loopback7")
+
+    simulator.keep_commands = True
+    config(router, "interface Loopback7", "description changed", "exit", "interface Loopback8", "exit",
+           "no interface Loopback7")
+    assert snapshot._dirty == {("interface", "loopback7"), ("interface", "loopback8")}
+    assert snapshot.find("interface", "Loopback7") is None
+    # one 'section' command for all dirty sections, the others are kept
+    assert snapshot.fetches == 2
+    assert [command for command in simulator.commands if command.startswith("show")] == [
+        "show running-config | section ^(interface [Ll][Oo][Oo][Pp][Bb][Aa][Cc][Kk]7|"
+        "interface [Ll][Oo][Oo][Pp][Bb][Aa][Cc][Kk]8)$"]
+    assert snapshot.find("interface", "GigabitEthernet1") is gigabit
+    assert snapshot.names("interface")[-1] == "loopback8"
+    assert snapshot.text() == parse_running_config(simulator.running_config().splitlines()).text()
+
+def test_section_chunks(simulator, router):
+    router.show_cache_ttl = 10
+    snapshot = cisco_running_config(router)
+    count = SECTION_CHUNK + 4
+    config(router, *[command for i in range(count) for command in (f"interface Loopback{i}", "exit")])
+    simulator.keep_commands = True
+    assert len(snapshot.names("interface")) == 3 + count
+    assert len([command for command in simulator.commands if "| section" in command]) == 2
+    assert snapshot.fetches == 3
+
+def test_section_switch(simulator, router):
+    ''' a global section command in a submode switches the section '''
+    router.show_cache_ttl = 10
+    snapshot = cisco_running_config(router)
+    config(router, "interface Loopback1", "description one", "interface Loopback2", "description two",
+           "router bgp 65000", "bgp log-neighbor-changes")
+    assert snapshot._dirty == {("interface", "loopback1"), ("interface", "loopback2"), ("router bgp", "65000")}
+    assert "description two" in snapshot.find("interface", "Loopback2")
+    assert snapshot.find("router bgp", "65000") is not None
+    assert snapshot.text() == parse_running_config(simulator.running_config().splitlines()).text()
+
+def test_stale_refresh(simulator, router):
+    router.show_cache_ttl = 10
+    snapshot = cisco_running_config(router)
+    simulator.keep_commands = True
+    # a command outside of the indexed sections makes the whole config stale
+    config(router, "ip domain-name example.com")
+    assert snapshot._stale
+    assert "ip domain-name example.com" in snapshot.tree().commands
+    assert simulator.commands[-1] == "show running-config"
+    assert snapshot.fetches == 2
+
+    router.cache_invalidate()
+    assert snapshot._stale
+    snapshot.names("interface")
+    assert snapshot.fetches == 3
+    assert router.cache_get(CACHE_RUNNING_CONFIG) is snapshot
+    assert cisco_running_config(router, refresh=True) is not snapshot
+
+def test_no_paging(simulator, connect):
+    ''' the config longer than the screen is fetched without 'terminal length 0' of the caller '''
+    router = connect(simulator, length=False)
+    config(router, *[command for i in range(20) for command in (f"interface Loopback{i}", "exit")])
+    assert router.terminal_length is None
+    simulator.keep_commands = True
+    snapshot = cisco_running_config(router)
+    assert len(snapshot.names("interface")) == 23
+    assert router.terminal_length == 0
+    cisco_running_config(router, refresh=True).names("interface")
+    assert simulator.commands.count("terminal length 0") == 1
@@ -0,0 +1,206 @@
+# GNU GENERAL PUBLIC LICENSE
+# Autor: Aleksey Burger
+
+import pytest
+from responce import Responce
+from show_parser import (ShowTemplate, ShowTemplateError, ShowTable, TEMPLATES, SHOW_SCOPES,
+                         get_template, parse_show, cisco_show)
+from cisco_interface import cisco_get_all_interfaces, cisco_get_all_interfaces_params
+from cisco_vrf import cisco_get_all_vrf
+from cisco_bgp import cisco_get_all_bgp
+
+# outputs recorded from IOS / IOS-XE routers
+IP_INTERFACE_BRIEF = '''\
+Interface              IP-Address      OK? Method Status                Protocol
+GigabitEthernet1       192.168.1.1     YES NVRAM  up                    up
+GigabitEthernet2       unassigned      YES NVRAM  administratively down down
+GigabitEthernet2.100   10.0.100.1      YES manual up                    up
+Loopback0              10.255.0.1      YES manual up                    up
+Tunnel10               unassigned      YES unset  up                    down
+'''
+
+VRF = '''\
+  Name                             Default RD            Protocols   Interfaces
+  CUST-A                           65000:1               ipv4        Gi2.100
+                                                                     Lo10
+  CUST-B                           65000:2               ipv4,ipv6
+  Mgmt-intf                        <not set>             ipv4,ipv6   Gi1
+'''
+
+IP_BGP_SUMMARY = '''\
+BGP router identifier 10.255.0.1, local AS number 65000
+BGP table version is 12, main routing table version 12
+4 network entries using 992 bytes of memory
+4 path entries using 544 bytes of memory
+
+Neighbor        V           AS MsgRcvd MsgSent   TblVer  InQ OutQ Up/Down  State/PfxRcd
+10.255.0.2      4        65000    1520    1518       12    0    0 22:58:03        3
+172.16.0.1      4        65001       0       0        1    0    0 never    Idle
+172.16.0.5      4        65002      12      10       12    0    0 00:05:41 Idle (Admin)
+'''
+
+IP_BGP_SUMMARY_NO_NEIGHBORS = '''\
+BGP router identifier 10.255.0.1, local AS number 4200000001
+BGP table version is 1, main routing table version 1
+'''
+
+IP_OSPF_NEIGHBOR = '''\
+
+Neighbor ID     Pri   State           Dead Time   Address         Interface
+10.255.0.2        1   FULL/DR         00:00:36    192.168.1.2     GigabitEthernet1
+10.255.0.3        0   FULL/  -        00:00:33    10.0.13.3       Tunnel10
+'''
+
+MPLS_FORWARDING_TABLE = '''\
+Local      Outgoing   Prefix           Bytes Label   Outgoing   Next Hop
+Label      Label      or Tunnel Id     Switched      interface
+16         Pop Label  10.255.0.2/32    0             Gi1        192.168.1.2
+17         18         10.255.0.3/32    1250          Gi1        192.168.1.2
+           20         10.255.0.3/32    0             Tu10       point2point
+'''
+
+def test_ip_interface_brief():
+    table = TEMPLATES["show ip interface brief"].parse(IP_INTERFACE_BRIEF)
+    assert table.column("Interface") == ["gigabitethernet1", "gigabitethernet2", "gigabitethernet2.100",
+                                         "loopback0", "tunnel10"]
+    assert table[0] == {"Interface": "gigabitethernet1", "IP": "192.168.1.1", "OK": "YES", "Method": "NVRAM",
+                        "Status": "up", "Protocol": "up"}
+    assert table[1]["Status"] == "administratively down"
+    assert table[1]["Protocol"] == "down"
+    assert table[4]["IP"] == "unassigned"
+    assert table.header == {}
+
+def test_vrf():
+    table = TEMPLATES["show vrf"].parse(VRF)
+    assert table.column("Name") == ["CUST-A", "CUST-B", "Mgmt-intf"]
+    assert table[0] == {"Name": "CUST-A", "RD": "65000:1", "Protocols": "ipv4", "Interfaces": ["Gi2.100", "Lo10"]}
+    assert table[1]["Interfaces"] == []
+    assert table[1]["Protocols"] == "ipv4,ipv6"
+    assert table[2]["RD"] == "<not set>"
+
+def test_ip_bgp_summary():
+    table = TEMPLATES["show ip bgp summary"].parse(IP_BGP_SUMMARY)
+    assert table.header == {"RouterId": "10.255.0.1", "LocalAS": 65000}
+    assert table.column("Neighbor") == ["10.255.0.2", "172.16.0.1", "172.16.0.5"]
+    assert table[0] == {"RouterId": "10.255.0.1", "LocalAS": 65000, "Neighbor": "10.255.0.2", "Version": 4,
+                        "RemoteAS": 65000, "MsgRcvd": 1520, "MsgSent": 1518, "TblVer": 12, "InQ": 0, "OutQ": 0,
+                        "UpDown": "22:58:03", "StatePfxRcd": "3"}
+    assert table[1]["StatePfxRcd"] == "Idle"
+    assert table[2]["StatePfxRcd"] == "Idle (Admin)"
+
+def test_ip_bgp_summary_without_neighbors():
+    ''' the Filldown values are kept in the header even if the table has no rows '''
+    table = TEMPLATES["show ip bgp summary"].parse(IP_BGP_SUMMARY_NO_NEIGHBORS)
+    assert table == []
+    assert table.header["LocalAS"] == 4200000001
+
+def test_ip_ospf_neighbor():
+    table = TEMPLATES["show ip ospf neighbor"].parse(IP_OSPF_NEIGHBOR)
+    assert table == [
+        {"NeighborId": "10.255.0.2", "Priority": 1, "State": "FULL/DR", "DeadTime": "00:00:36",
+         "Address": "192.168.1.2", "Interface": "gigabitethernet1"},
+        {"NeighborId": "10.255.0.3", "Priority": 0, "State": "FULL/  -", "DeadTime": "00:00:33",
+         "Address": "10.0.13.3", "Interface": "tunnel10"},
+    ]
+
+def test_mpls_forwarding_table():
+    table = TEMPLATES["show mpls forwarding-table"].parse(MPLS_FORWARDING_TABLE)
+    assert [(record["LocalLabel"], record["OutLabel"], record["Prefix"]) for record in table] == [
+        ("16", "Pop Label", "10.255.0.2/32"), ("17", "18", "10.255.0.3/32"), ("17", "20", "10.255.0.3/32")]
+    assert table[1]["BytesSwitched"] == 1250
+    assert table[2]["OutInterface"] == "Tu10"
+    assert table[2]["NextHop"] == "point2point"
+
+def test_templates():
+    # only the config derived listings are cached
+    assert set(SHOW_SCOPES) == {"show ip interface brief", "show vrf"}
+    for command, template in TEMPLATES.items():
+        assert template.command == command
+        assert get_template("  " + command.replace(" ", "   ")) is template
+
+def test_responce_body_and_cache():
+    ''' Responce is parsed without the echo and the prompt, once '''
+    raw = ("show vrf\r\n" + VRF.replace("\n", "\r\n") + "R1#").encode("utf-8")
+    responce = Responce(raw, "show vrf")
+    table = parse_show("show vrf", responce)
+    assert table.column("Name") == ["CUST-A", "CUST-B", "Mgmt-intf"]
+    assert parse_show("show vrf", responce) is table
+
+def test_engine_actions():
+    template = ShowTemplate(r'''
+Value Filldown Group (\S+)
+Value Required Name (\S+)
+Value List Tags (\S+)
+Value Int Count (\d+)
+
+Start
+  ^group ${Group}
+  ^item -> Continue.Record
+  ^item ${Name} ${Count}( ${Tags})?
+  ^tag ${Tags}
+  ^reset -> Continue.Record
+  ^reset -> Clearall
+  ^end -> Done
+
+Done
+  ^.*
+''')
+    table = template.parse(["group a", "item x 1 t1", "tag t2", "item y 2", "reset", "item z 3 t4", "tag",
+                            "end", "item w 4 t5"])
+    # the previous item is recorded when the next one starts; Clearall drops the Filldown group
+    assert table == [{"Group": "a", "Name": "x", "Tags": ["t1", "t2"], "Count": 1},
+                     {"Group": "a", "Name": "y", "Tags": [], "Count": 2},
+                     {"Group": None, "Name": "z", "Tags": ["t4"], "Count": 3}]
+    assert table.header == {"Group": "a"}
+
+def test_engine_eof_state():
+    ''' an empty EOF state disables the record at the end of the input '''
+    text = r'''
+Value Name (\S+)
+
+Start
+  ^name ${Name}
+'''
+    assert ShowTemplate(text).parse("name a") == [{"Name": "a"}]
+    assert ShowTemplate(text + "\nEOF\n").parse("name a") == []
+
+@pytest.mark.parametrize("text, message", [
+    ("Value Name (\\S+)\n\nOther\n  ^x\n", "Start"),
+    ("Value Bad Name (\\S+)\n\nStart\n  ^x\n", "unknown option"),
+    ("Start\n  ^${Name}\n", "not defined"),
+    ("Start\n  ^x -> Missing\n", "Missing"),
+    ("Start\n  ^x -> Next.Bad\n", "bad action"),
+    ("Start\n  ^(x\n", "line 2"),
+])
+def test_engine_errors(text, message):
+    with pytest.raises(ShowTemplateError, match=message):
+        ShowTemplate(text)
+    with pytest.raises(ShowTemplateError):
+        get_template("show clock")
+
+class _ShowRouter:
+    ''' router which answers the show commands with the recorded outputs '''
+    def __init__(self, outputs):
+        self.outputs = outputs
+        self.commands = []
+
+    def enterExecCommand(self, command):
+        self.commands.append(command)
+        text = command + "\r\n" + self.outputs[command].replace("\n", "\r\n") + "R1#"
+        return Responce(text.encode("utf-8"), command)
+
+    def iterExecCommand(self, command):
+        self.commands.append(command)
+        return iter(self.outputs[command].splitlines())
+
+def test_cisco_get_helpers():
+    router = _ShowRouter({"show ip interface brief": IP_INTERFACE_BRIEF, "show vrf": VRF,
+                          "show ip bgp summary": IP_BGP_SUMMARY})
+    assert cisco_get_all_interfaces(router)[:2] == ["gigabitethernet1", "gigabitethernet2"]
+    assert cisco_get_all_interfaces_params(router)[1] == {"Interface": "gigabitethernet2", "IP": "unassigned",
+                                                          "Status": "administratively down"}
+    assert cisco_get_all_vrf(router) == ["CUST-A", "CUST-B", "Mgmt-intf"]
+    assert cisco_get_all_bgp(router) == ["65000"]
+    assert isinstance(cisco_show(router, "show vrf"), ShowTable)
+    router.outputs["show ip bgp summary"] = ""
+    assert cisco_get_all_bgp(router) == []
@@ -0,0 +1,59 @@
+# GNU GENERAL PUBLIC LICENSE
+# Autor: Aleksey Burger
+
+import os
+import pytest
+from tftp_server import TftpServer, tftp_get, BLOCK_SIZE
+from cisco_bulk import cisco_bulk_deploy
+from cisco_interface import CiscoInterface, cisco_get_all_interfaces
+from cisco_simulator import CiscoSimulator
+
+@pytest.fixture
+def server():
+    server = TftpServer("127.0.0.1", port=0, timeout=0.5, retries=3)
+    server.start()
+    yield server
+    server.stop()
+
+@pytest.mark.parametrize("size, block_size", [
+    (1300, BLOCK_SIZE),             # default block size, short last block
+    (BLOCK_SIZE * 4, BLOCK_SIZE),   # exact multiple: the transfer ends by an empty block
+    (0, BLOCK_SIZE),
+    (20000, 1428),                  # negotiated blksize (OACK)
+    (1428 * 3, 1428),
+])
+def test_round_trip(server, size, block_size):
+    data = os.urandom(size)
+    server.add_file("test.cfg", data)
+    assert tftp_get("127.0.0.1", "test.cfg", port=server.port, block_size=block_size, timeout=1) == data
+
+def test_leading_slash(server):
+    server.add_file("/dir/test.cfg", "hostname R1\n")
+    assert tftp_get("127.0.0.1", "/dir/test.cfg", port=server.port, timeout=1) == b"hostname R1\n"
+
+def test_not_found(server):
+    server.add_file("test.cfg", "x")
+    server.remove_file("test.cfg")
+    with pytest.raises(Exception, match="file not found"):
+        tftp_get("127.0.0.1", "test.cfg", port=server.port, timeout=1)
+
+def test_bulk_deploy(server, connect):
+    with CiscoSimulator("R1", password="cisco", tftp_port=server.port) as sim:
+        router = connect(sim)
+        loopbacks = []
+        for i in range(3):
+            loopback = CiscoInterface(f"Loopback{i}")
+            loopback.modify(ipv4_address_mask=f"10.0.0.{i}/32")
+            loopbacks.append(loopback)
+        result = cisco_bulk_deploy(router, loopbacks, server, host="127.0.0.1")
+        assert result.commands == 6
+        assert not result.errors
+        assert result.device_rate
+        assert not server.files
+        assert len([name for name in cisco_get_all_interfaces(router) if name.startswith("loopback")]) == 3
+
+def test_bulk_deploy_wildcard_host(server, connect):
+    with CiscoSimulator("R1", password="cisco", tftp_port=server.port) as sim:
+        router = connect(sim)
+        with pytest.raises(Exception, match="host"):
+            cisco_bulk_deploy(router, "interface Loopback1\n", TftpServer())
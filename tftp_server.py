@@ -0,0 +1,264 @@
+# GNU GENERAL PUBLIC LICENSE
+# Autor: Aleksey Burger
+
+import socket
+import struct
+import threading
+import logging
+
+logger = logging.getLogger("dtulibLog")
+def trace(format):
+    logger.debug(f'\n\x1b[1;94mTftp: {format}\x1b[0m')
+
+def error(format):
+    logger.error(f'\n\x1b[1;31mTftp: {format}\x1b[0m')
+
+def info(format):
+    logger.info(f'\n\x1b[1;92mTftp: {format}\x1b[0m')
+
+TFTP_PORT = 69
+
+OP_RRQ = 1
+OP_WRQ = 2
+OP_DATA = 3
+OP_ACK = 4
+OP_ERROR = 5
+OP_OACK = 6
+
+ERR_NOT_DEFINED = 0
+ERR_NOT_FOUND = 1
+ERR_ACCESS = 2
+ERR_ILLEGAL_OP = 4
+ERR_OPTION = 8
+
+BLOCK_SIZE = 512
+BLOCK_SIZE_MAX = 65464
+
+def _error_packet(code, message):
+    return struct.pack('!HH', OP_ERROR, code) + message.encode('ascii') + b'\0'
+
+def _parse_request(packet):
+    '''
+    Parse RRQ/WRQ packet: returns (filename, mode, options)
+    '''
+    fields = packet[2:].split(b'\0')
+    if len(fields) < 3:
+        return None, None, {}
+    filename = fields[0].decode('ascii', 'replace')
+    mode = fields[1].decode('ascii', 'replace').lower()
+    options = {}
+    for i in range(2, len(fields) - 1, 2):
+        if fields[i]:
+            options[fields[i].decode('ascii', 'replace').lower()] = fields[i + 1].decode('ascii', 'replace')
+    return filename, mode, options
+
+class TftpServer:
+    '''
+    Read-only TFTP server (RFC 1350 with blksize/tsize options) which serves
+    files from memory. It is used to stage the configuration which a router
+    pulls with 'copy tftp: running-config'.
+    '''
+
+    def __init__(self, host="0.0.0.0", port=TFTP_PORT, timeout=2, retries=5):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.retries = retries
+        self.files = {}
+        self.sent_bytes = 0
+        self._lock = threading.Lock()
+        self._sock = None
+        self._thread = None
+        self._running = False
+
+    def __repr__(self):
+        return f"TftpServer {self.host}:{self.port} files:{len(self.files)}"
+
+    def add_file(self, name, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        with self._lock:
+            self.files[name.lstrip('/')] = bytes(data)
+
+    def remove_file(self, name):
+        with self._lock:
+            self.files.pop(name.lstrip('/'), None)
+
+    def start(self):
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((self.host, self.port))
+        # port 0 selects free port
+        self.port = self._sock.getsockname()[1]
+        self._sock.settimeout(0.5)
+        self._running = True
+        self._thread = threading.Thread(target=self._serve, name=f"tftp-{self.port}", daemon=True)
+        self._thread.start()
+        info(f"{self} started")
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        if self._sock:
+            self._sock.close()
+            self._sock = None
+        info(f"{self} stopped")
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _serve(self):
+        while self._running:
+            try:
+                packet, peer = self._sock.recvfrom(BLOCK_SIZE_MAX + 4)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            if len(packet) < 2:
+                continue
+            opcode = struct.unpack('!H', packet[:2])[0]
+            if opcode == OP_RRQ:
+                threading.Thread(target=self._send_file, args=(packet, peer), daemon=True).start()
+            elif opcode == OP_WRQ:
+                self._sock.sendto(_error_packet(ERR_ACCESS, "write is not supported"), peer)
+            else:
+                self._sock.sendto(_error_packet(ERR_ILLEGAL_OP, "illegal operation"), peer)
+
+    def _send_file(self, packet, peer):
+        filename, mode, options = _parse_request(packet)
+        # every transfer uses its own port (transfer ID)
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind((self.host, 0))
+        sock.settimeout(self.timeout)
+        try:
+            with self._lock:
+                data = self.files.get((filename or '').lstrip('/'))
+            if data is None:
+                error(f"{peer} RRQ {filename}: file not found")
+                sock.sendto(_error_packet(ERR_NOT_FOUND, "file not found"), peer)
+                return
+            if mode == 'netascii':
+                data = data.replace(b'\r\n', b'\n').replace(b'\n', b'\r\n')
+            trace(f"{peer} RRQ {filename} mode {mode} options {options}")
+
+            block_size = BLOCK_SIZE
+            oack = {}
+            if 'blksize' in options:
+                try:
+                    block_size = min(max(int(options['blksize']), 8), BLOCK_SIZE_MAX)
+                except ValueError:
+                    sock.sendto(_error_packet(ERR_OPTION, "bad blksize"), peer)
+                    return
+                oack['blksize'] = str(block_size)
+            if 'tsize' in options:
+                oack['tsize'] = str(len(data))
+            if oack:
+                payload = b''.join([k.encode('ascii') + b'\0' + v.encode('ascii') + b'\0' for k, v in oack.items()])
+                if not self._send_wait_ack(sock, peer, struct.pack('!H', OP_OACK) + payload, 0):
+                    return
+
+            block = 1
+            offset = 0
+            while True:
+                chunk = data[offset:offset + block_size]
+                if not self._send_wait_ack(sock, peer, struct.pack('!HH', OP_DATA, block & 0xFFFF) + chunk, block):
+                    return
+                offset += len(chunk)
+                with self._lock:
+                    self.sent_bytes += len(chunk)
+                # the last block is shorter than block size
+                if len(chunk) < block_size:
+                    break
+                block += 1
+            info(f"{peer} RRQ {filename}: {len(data)} bytes sent")
+        finally:
+            sock.close()
+
+    def _send_wait_ack(self, sock, peer, packet, block):
+        for repeat in range(self.retries):
+            sock.sendto(packet, peer)
+            while True:
+                try:
+                    reply, addr = sock.recvfrom(BLOCK_SIZE_MAX + 4)
+                except socket.timeout:
+                    trace(f"{peer} block {block} timeout. Try to repeat {repeat}")
+                    break
+                if addr != peer or len(reply) < 4:
+                    continue
+                opcode, ack_block = struct.unpack('!HH', reply[:4])
+                if opcode == OP_ACK and ack_block == (block & 0xFFFF):
+                    return True
+                if opcode == OP_ERROR:
+                    error(f"{peer} transfer is aborted by client: {reply[4:-1]}")
+                    return False
+                # duplicated ACK of the previous block is ignored
+        error(f"{peer} block {block} is not acknowledged")
+        return False
+
+
+def tftp_get(host, filename, port=TFTP_PORT, block_size=BLOCK_SIZE, timeout=2, retries=5):
+    '''
+    TFTP client: download the file and return its content as bytes.
+    Raises Exception on TFTP error or timeout.
+    '''
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.settimeout(timeout)
+    try:
+        request = struct.pack('!H', OP_RRQ) + filename.encode('ascii') + b'\0octet\0'
+        if block_size != BLOCK_SIZE:
+            request += b'blksize\0' + str(block_size).encode('ascii') + b'\0'
+        server = (host, port)
+        packet = request
+        expected = 1
+        chunks = []
+        for repeat in range(retries):
+            sock.sendto(packet, server)
+            try:
+                reply, peer = sock.recvfrom(BLOCK_SIZE_MAX + 4)
+            except socket.timeout:
+                continue
+            server = peer
+            break
+        else:
+            raise Exception(f"tftp_get {host}:{port} {filename}: timeout")
+
+        while True:
+            opcode = struct.unpack('!H', reply[:2])[0]
+            if opcode == OP_ERROR:
+                raise Exception(f"tftp_get {filename}: {reply[4:-1].decode('ascii', 'replace')}")
+            if opcode == OP_OACK:
+                fields = reply[2:].split(b'\0')
+                options = dict(zip(fields[0::2], fields[1::2]))
+                if b'blksize' in options:
+                    block_size = int(options[b'blksize'])
+                ack_block = 0
+            elif opcode == OP_DATA:
+                ack_block = struct.unpack('!H', reply[2:4])[0]
+                if ack_block == (expected & 0xFFFF):
+                    chunks.append(reply[4:])
+                    expected += 1
+                    if len(reply) - 4 < block_size:
+                        sock.sendto(struct.pack('!HH', OP_ACK, ack_block), server)
+                        return b''.join(chunks)
+            else:
+                raise Exception(f"tftp_get {filename}: unexpected opcode {opcode}")
+            packet = struct.pack('!HH', OP_ACK, ack_block)
+            for repeat in range(retries):
+                sock.sendto(packet, server)
+                try:
+                    reply, peer = sock.recvfrom(BLOCK_SIZE_MAX + 4)
+                except socket.timeout:
+                    continue
+                if peer == server:
+                    break
+            else:
+                raise Exception(f"tftp_get {filename}: timeout")
+    finally:
+        sock.close()